@@ -1,12 +1,66 @@
 from event import Event
-from config import GESTATION_MU, GESTATION_SIGMA, REPRODUCTION_LAMBDA, FERTILE_AGE,\
-    MEAN_MAX_AGE, SIGMA_MAX_AGE
+import bisect
 import math
-import plotly.express as px
+import numpy as np
 from rng import RNG
+from sink import DEATH, BIRTH, MOVE, WARNING
+
+DIRECTIONS = [[0, 1], [1, 0], [0, -1], [-1, 0]] # Cardinal directions of the field of view, as [x, y]
+FOV_TABLES = dict() # (vision, direction order) -> field of view offset table, see fov_table()
+
+
+def fov_offset(direction, dist):
+    """Get the offset from the Agent of the Cell at distance dist in direction of the field of view.
+    Note every distance currently looks at the adjacent Cell, the step isn't scaled by dist.
+    """
+    return direction[0], direction[1]
+
+
+def fov_steps(vision):
+    """Get how many steps along its direction the field of view looks at each distance, as a list by distance."""
+    return [sum(o * d for o, d in zip(fov_offset(DIRECTIONS[0], dist), DIRECTIONS[0])) for dist in range(vision)]
+
+
+def fov_table(vision, order):
+    """Get the field of view offset table for a vision distance and direction order, built once per pair.
+    Returns dx, dy, dist arrays of the Cells visited by field_of_view(), in visiting order.
+    An offset visited more than once only keeps its nearest, earliest visit, which never changes
+    the Cell chosen by max sugar, then nearest, then earliest.
+    """
+    key = (vision, order)
+    if key not in FOV_TABLES:
+        visits = dict() # Offset -> dist, position of its kept visit
+        for position, (direction, dist) in enumerate((DIRECTIONS[d], dist) for d in order for dist in range(vision)):
+            offset = fov_offset(direction, dist)
+            if offset not in visits or dist < visits[offset][0]:
+                visits[offset] = (dist, position)
+        kept = sorted(visits.items(), key=lambda visit: visit[1][1])
+        dx = np.array([offset[0] for offset, visit in kept], dtype=np.int64)
+        dy = np.array([offset[1] for offset, visit in kept], dtype=np.int64)
+        dists = np.array([visit[0] for offset, visit in kept], dtype=np.int64)
+        FOV_TABLES[key] = dx, dy, dists
+    return FOV_TABLES[key]
+
+
+class Context:
+    """What every Agent of a simulation shares, held once by the AgentList instead of by each Agent."""
+    __slots__ = ("landscape", "calendar", "rng", "agentList")
+
+    def __init__(self, landscape, calendar, rng, agentList):
+        self.landscape = landscape
+        self.calendar = calendar
+        self.rng = rng
+        self.agentList = agentList
 
 
 class Agent:
+    # No per-Agent __dict__: a simulation can hold many Agents, see benchmark.py memory
+    __slots__ = (
+        "id", "context", "listed", "_sugar", "t_lastNextSugar", "mate", "alive", "birthdate", "row", "col",
+        "metab", "vision", "mother", "max_age", "t_nextEventTime", "t_nextEventType", "nextCallback",
+        "t_move", "move_event", "t_die", "die_event", "t_reproduce", "reproduce_event", "t_birth", "birth_event", "period_g"
+    )
+
     def __init__(self, landscape, calendar, rng, aList, id=None, t=0, row=None, col=None, metab=None,
         vision=None, mother=None, max_age=None, initial_sugar=0):
         """
@@ -25,17 +79,17 @@ class Agent:
         initial_sugar - Initial sugar alotted (Agent still eats at Cell it is spawned in).
         """
         self.id = id
-        self.rng = rng
+        context = aList.context
+        if context.landscape is not landscape or context.calendar is not calendar or context.rng is not rng:
+            context = Context(landscape, calendar, rng, aList)
+        self.context = context
+        self.listed = False # In an AgentList, whose statistics then track this Agent's sugar
         self.sugar = initial_sugar
         self.t_lastNextSugar = t # Time when update_sugar() was last called
         self.mate = None # Who to combine genetics with
         self.alive = True
         self.birthdate = t # Time of birth, of course
 
-        self.landscape = landscape
-        self.calendar = calendar
-        self.agentList = aList
-
         self.row = row
         self.col = col
         if row == None or col == None:
@@ -43,11 +97,12 @@ class Agent:
         if self.row == None or self.row == None:
             raise Exception("No more open spots on landscape!")
 
+        config = aList.config
         # Genetic traits
         self.metab = metab if metab != None else rng.get("genetic").uniform(1, 4)
         self.vision = vision if vision != None else math.ceil(rng.get("genetic").uniform(1, 6))
         self.mother = mother if mother != None else rng.get("genetic").choice([True, False])
-        self.max_age = max_age if max_age != None else abs(rng.get("genetic").normal(MEAN_MAX_AGE, SIGMA_MAX_AGE))
+        self.max_age = max_age if max_age != None else abs(rng.get("genetic").normal(config.MEAN_MAX_AGE, config.SIGMA_MAX_AGE))
 
         # Time keep
         self.t_nextEventTime, self.t_nextEventType, self.nextCallback = math.inf, None, None
@@ -56,7 +111,7 @@ class Agent:
         self.t_die  = math.inf # When to die
         self.die_event = None
         if self.mother:
-            self.t_reproduce = t + FERTILE_AGE + rng.get("inter").exponential(REPRODUCTION_LAMBDA)
+            self.t_reproduce = t + config.FERTILE_AGE + rng.get("inter").exponential(config.REPRODUCTION_LAMBDA)
         else:
             self.t_reproduce = math.inf
         self.reproduce_event = None
@@ -70,6 +125,35 @@ class Agent:
             self.move_event = self._sched(Event(self.t_move, Event.MOVE, self, self.move))
             self.reproduce_event = self._sched(Event(self.t_reproduce, Event.REPRODUCE, self, self.reproduce))
 
+    @property
+    def landscape(self):
+        return self.context.landscape
+
+    @property
+    def calendar(self):
+        return self.context.calendar
+
+    @property
+    def rng(self):
+        return self.context.rng
+
+    @property
+    def agentList(self):
+        return self.context.agentList
+
+    @property
+    def sugar(self):
+        return self._sugar
+
+    @sugar.setter
+    def sugar(self, value):
+        if self.listed:
+            context = self.context
+            context.agentList.statistics[AgentList.SUGAR].change(self._sugar, value)
+            if context.landscape.watchers: # Health shows on the animation
+                context.landscape.touch(*context.landscape.convert_coords(self.col, self.row))
+        self._sugar = value
+
     def _sched(self, event):
         """Schedule an event. This also conveniently calls check_for_death().
         Returns scheduled event (value returned by EventList.add()). None if event time is inf.
@@ -77,19 +161,21 @@ class Agent:
         #print(f"_sched{event.time, event.type} by Agent {self.id}")
         self.check_for_death()
         if event.time != math.inf:
-            return self.calendar.add(event)
+            return self.context.calendar.add(event)
         return None
 
     def die(self):
-        print(f"Agent {self.id} is now DEAD!!!!!!!!!! RIP at {self.calendar.now()} w/ {self.sugar} sugar max_age = {self.max_age}")
+        log = self.context.landscape.log
+        if log.enabled:
+            log.log(DEATH, self.context.calendar.now(), agent=self.id, x=self.col, y=self.row, sugar=self.sugar, max_age=self.max_age)
         self.alive = False
         self.t_nextEventTime = math.inf
         self.t_nextEventType = None
         self.nextCallback = None
-        self.landscape.remove(self.col, self.row)
-        self.agentList.remove(self)
+        self.context.landscape.remove(self.col, self.row)
+        self.context.agentList.remove(self)
         # Hard-coded cancellation of scheduled events past death
-        self.calendar.cancels(
+        self.context.calendar.cancels(
             self.reproduce_event,
             self.move_event,
             self.birth_event
@@ -104,34 +190,89 @@ class Agent:
         """Iterate through the field of view.
         evaluate - Callable with current Cell parameter and distance from Agent parameter.
         """
-        landscape = self.landscape # TODO: refactor
+        landscape = self.context.landscape # TODO: refactor
 
         if not callable(evaluate):
             raise TypeError("field_of_view() requires a callable evaluate parameter")
         agentCell = landscape.get_cell(self.col, self.row)
-        directions = [[0, 1], [1, 0], [0, -1], [-1, 0]]
-        self.rng.get("shuffle").shuffle(directions)
+        directions = list(DIRECTIONS)
+        self.context.rng.get("shuffle").shuffle(directions)
         for direction in directions:
             for dist in range(self.vision):
-                x = self.col + direction[0]
-                y = self.row + direction[1]
+                dx, dy = fov_offset(direction, dist)
+                x = self.col + dx
+                y = self.row + dy
                 currentCell = landscape.get_cell(x, y)
                 # Cells that are too high are not part of the FOV
                 if currentCell.level <= self.vision + agentCell.level:
                     evaluate(currentCell, dist)
 
+    def best_visible_cell(self):
+        """Get the empty Cell in the field of view with the most sugar. Ties go to the nearest Cell,
+        then to the first in the shuffled direction order, same as scanning with field_of_view().
+        Computed over the Landscape arrays. Returns None if no empty Cell is visible.
+        """
+        landscape = self.context.landscape
+        order = list(range(len(DIRECTIONS)))
+        self.context.rng.get("shuffle").shuffle(order) # Same draws as shuffling DIRECTIONS itself
+        dx, dy, dists = fov_table(self.vision, tuple(order))
+        cols = landscape.cols
+        col, row = landscape.convert_coords(self.col, self.row)
+        cells = ((row + dy) % landscape.rows) * cols + (col + dx) % cols
+        level = landscape.level.ravel()
+        # Cells that are too high are not part of the FOV
+        candidates = level.take(cells) <= self.vision + level[row * cols + col]
+        candidates &= landscape.empty(cells)
+        if not candidates.any():
+            return None
+        cells, dists = cells[candidates], dists[candidates]
+        sugar = landscape.get_sugars(cells)
+        best = sugar == sugar.max()
+        best &= dists == dists[best].min()
+        y, x = divmod(int(cells[best.argmax()]), cols)
+        return landscape.get_cell(x, y)
+
+    def find_mate(self, t):
+        """Find the mate candidate in the field of view whose Cell has the most sugar, same as scanning
+        with field_of_view() but only visiting occupied Cells through the Landscape occupancy index.
+        Candidates are alive Agents not gestating at time t. Returns None if there is none.
+        """
+        landscape = self.context.landscape
+        directions = list(DIRECTIONS)
+        self.context.rng.get("shuffle").shuffle(directions)
+        steps = fov_steps(self.vision)
+        col, row = landscape.convert_coords(self.col, self.row)
+        maxLevel = self.vision + landscape.level[row, col]
+        wealthiest, maxSugar = None, -math.inf
+        for direction in directions:
+            occupied = landscape.occupied_along(col, row, direction[0], direction[1], max(steps))
+            if not occupied:
+                continue
+            for k in dict.fromkeys(steps): # Visit each step once, in distance order
+                if k not in occupied:
+                    continue
+                x, y = occupied[k]
+                # Cells that are too high are not part of the FOV
+                if landscape.level[y, x] <= maxLevel:
+                    cand = landscape.get_agent(x, y)
+                    sugar = landscape.get_sugar(x, y)
+                    if sugar > maxSugar and not cand.is_gestating(t) and cand.alive:
+                        wealthiest = cand
+                        maxSugar = sugar
+        return wealthiest
+
     def moore_neighborhood(self, evaluate):
         """Iterate through the Moore neighborhood.
         evaluate - Callable with current Cell parameter.
         """
-        landscape = self.landscape # TODO: refactor
+        landscape = self.context.landscape # TODO: refactor
 
         if not callable(evaluate):
             raise TypeError("moore_neighborhood() requires a callable evaluate parameter")
         yRange = [0, 1, 2]
         xRange = [0, 1, 2]
-        self.rng.get("shuffle").shuffle(yRange)
-        self.rng.get("shuffle").shuffle(xRange)
+        self.context.rng.get("shuffle").shuffle(yRange)
+        self.context.rng.get("shuffle").shuffle(xRange)
         for y in yRange:
             checkY = self.row - 1 + y
             for x in xRange:
@@ -149,33 +290,24 @@ class Agent:
             - If viable candidate chosen, schedule birth event.
         """
         self.update_sugar()
-        calendar = self.calendar # TODO: refactor so this block isn't necessary
-        landscape = self.landscape
+        calendar = self.context.calendar # TODO: refactor so this block isn't necessary
+        landscape = self.context.landscape
+        config = self.context.agentList.config
         t = calendar.now()
 
         if self.mother:
             # Find wealthiest non-mother Agent
-            wealthiest = None
-            maxSugar = -math.inf
-            def find_wealthiest(cell, dist):
-                nonlocal wealthiest
-                nonlocal maxSugar
-                if cell.agent != None:
-                    cand = cell.agent
-                    if cell.sugar > maxSugar and not cand.is_gestating(t) and cand.alive:
-                        wealthiest = cand
-                        maxSugar = cell.sugar
-            self.field_of_view(find_wealthiest)
+            wealthiest = self.find_mate(t)
 
             if wealthiest:
                 self.mate = wealthiest
-                self.period_g = abs(self.rng.get("inter").normal(GESTATION_MU, GESTATION_SIGMA))
+                self.period_g = abs(self.context.rng.get("inter").normal(config.GESTATION_MU, config.GESTATION_SIGMA))
                 self.t_birth = t + self.period_g
                 self.t_reproduce = math.inf
             else:
-                self.t_reproduce = t + self.rng.get("inter").exponential(REPRODUCTION_LAMBDA)
+                self.t_reproduce = t + self.context.rng.get("inter").exponential(config.REPRODUCTION_LAMBDA)
         else:
-            self.t_reproduce = t + self.rng.get("inter").exponential(REPRODUCTION_LAMBDA)
+            self.t_reproduce = t + self.context.rng.get("inter").exponential(config.REPRODUCTION_LAMBDA)
 
         if self.mate != None:
             self.birth_event = self._sched(Event(self.t_birth, Event.BIRTH, self, self.birth))
@@ -184,16 +316,17 @@ class Agent:
 
     def get_best_birth_cell(self, landscape):
         """Get an empty Cell with the most sugar in the Moore neighborhood, if there is one."""
+        yRange = [0, 1, 2]
+        xRange = [0, 1, 2]
+        self.context.rng.get("shuffle").shuffle(yRange)
+        self.context.rng.get("shuffle").shuffle(xRange)
         maxCell, maxSugar = None, -math.inf
-        def evaluate(cell):
-            nonlocal maxCell
-            nonlocal maxSugar
-            if cell.agent == None:
-                if cell.sugar > maxSugar:
-                    maxSugar = cell.sugar
-                    maxCell = cell
-        self.moore_neighborhood(evaluate)
-        return maxCell
+        for x, y in landscape.empty_moore(self.col, self.row, yRange, xRange):
+            sugar = landscape.get_sugar(x, y)
+            if sugar > maxSugar:
+                maxSugar = sugar
+                maxCell = (x, y)
+        return landscape.get_cell(*maxCell) if maxCell != None else None
 
     def birth(self):
         """Give birth, if an empty neighboring Cell is available. Only mother Agents give birth.
@@ -203,9 +336,9 @@ class Agent:
             - Offspring will have metabolism and vision traits randomly inherited from parents.
         """
         self.update_sugar()
-        calendar = self.calendar # TODO: refactor so this block isn't necessary
+        calendar = self.context.calendar # TODO: refactor so this block isn't necessary
         t = calendar.now()
-        landscape = self.landscape
+        landscape = self.context.landscape
 
         baby = None
         #if self.alive:
@@ -213,19 +346,19 @@ class Agent:
         if birthCell != None:
             # Randomly choose inherited traits
             # It's not necessarily Mendelian, but works for now
-            metab = self.rng.get("genetic").choice([self.metab, self.mate.metab])
-            vision = self.rng.get("genetic").choice([self.vision, self.mate.vision])
-            max_age = self.rng.get("genetic").choice([self.max_age, self.mate.max_age])
+            metab = self.context.rng.get("genetic").choice([self.metab, self.mate.metab])
+            vision = self.context.rng.get("genetic").choice([self.vision, self.mate.vision])
+            max_age = self.context.rng.get("genetic").choice([self.max_age, self.mate.max_age])
             # Inheritance
             selfInherit = self.sugar / 2
             mateInherit = self.mate.sugar / 2
             # Give birth
             baby = Agent(landscape, calendar,
-                aList=self.agentList,
+                aList=self.context.agentList,
                 row=birthCell.y,
                 col=birthCell.x,
                 t=t,
-                rng=self.rng,
+                rng=self.context.rng,
                 metab=metab,
                 vision=vision,
                 max_age=max_age,
@@ -233,12 +366,14 @@ class Agent:
             # Adjust for inheritance
             self.sugar -= selfInherit
             self.mate.sugar -= mateInherit
-            self.agentList.full_add(baby)
+            self.context.agentList.full_add(baby)
+            if landscape.log.enabled:
+                landscape.log.log(BIRTH, t, agent=baby.id, x=baby.col, y=baby.row, sugar=baby.sugar)
 
             self.mate = None
             self.t_birth = math.inf
             # Schedule next reproduction event
-            self.t_reproduce = t + self.rng.get("inter").exponential(REPRODUCTION_LAMBDA)
+            self.t_reproduce = t + self.context.rng.get("inter").exponential(self.context.agentList.config.REPRODUCTION_LAMBDA)
             self.reproduce_event = self._sched(Event(self.t_reproduce, Event.REPRODUCE, self, self.reproduce))
 
     def is_gestating(self, t):
@@ -250,35 +385,22 @@ class Agent:
     def move(self):
         """Move agent to best possible nearby spot."""
         self.update_sugar()
-        calendar = self.calendar # TODO: refactor so this block isn't necessary
+        calendar = self.context.calendar # TODO: refactor so this block isn't necessary
         t = calendar.now()
-        landscape = self.landscape
+        landscape = self.context.landscape
 
         # Scan in the cardinal directions & search for max visible sugar
         # If multiple max sugar values found, go to nearest
-        maxSugar, maxCell, minDist = -1, None, math.inf
-        def evaluate(cell, dist):
-            nonlocal maxSugar
-            nonlocal maxCell
-            nonlocal minDist
-            if not cell.agent: # Empty?
-                if cell.sugar > maxSugar:
-                    maxSugar = cell.sugar
-                    maxCell = cell
-                    minDist = dist
-                elif cell.sugar == maxSugar:
-                    # Choose nearest when there are equal contenders
-                    if dist < minDist:
-                        maxCell = currentCell
-
-        self.field_of_view(evaluate)
+        maxCell = self.best_visible_cell()
 
         if maxCell:
             # Move, then eat
             landscape.move(self.col, self.row, maxCell.x, maxCell.y)
             self.eat(maxCell)
+            if landscape.log.enabled:
+                landscape.log.log(MOVE, t, agent=self.id, x=self.col, y=self.row, sugar=self.sugar)
         # Schedule next move
-        self.t_move = t + abs(self.rng.get("inter").exponential(1.0))
+        self.t_move = t + abs(self.context.rng.get("inter").exponential(1.0))
         self.move_event = self._sched(Event(self.t_move, Event.MOVE, self, self.move))
 
     def _compute_sugar(self, ti, tf, si):
@@ -294,9 +416,9 @@ class Agent:
         #print(f"Agent {self.id} update_sugar() executed at t = {self.calendar.now()}")
         #print(f"Agent {self.id} {self.sugar} -= {self.metab} * ({self.calendar.now()} - {self.t_lastNextSugar})")
         #self.sugar = -self.metab * (self.t_lastNextSugar - self.calendar.now()) + self.sugar
-        self.sugar = self._compute_sugar(self.t_lastNextSugar, self.calendar.now(), self.sugar)
+        self.sugar = self._compute_sugar(self.t_lastNextSugar, self.context.calendar.now(), self.sugar)
         #print(f"Agent {self.id} sugar = {self.sugar}")
-        self.t_lastNextSugar = self.calendar.now()
+        self.t_lastNextSugar = self.context.calendar.now()
         #assert self.sugar > 0
 
     def _compute_death(self):
@@ -304,7 +426,7 @@ class Agent:
         # First, calculate time of death (y = mx + b, calculate when y = 0)
         # Note that we already know b = sugar, m = metab, y = 0, x = ?
         # Thus our equation will be -b/m = x
-        death = self.calendar.now() + (-self.sugar / -self.metab)
+        death = self.context.calendar.now() + (-self.sugar / -self.metab)
         #print(f"({self.id}) Calc'd death for {death}. sf = {(-self.metab * (death - self.calendar.now())) + self.sugar}")
         #assert 0 >= (-self.metab * (death - self.calendar.now())) + self.sugar
         #print(f"death = {self.calendar.now()} + (-{self.sugar} / -{self.metab})")
@@ -317,23 +439,123 @@ class Agent:
         """Check for death and appropriately schedule death time."""
         self._compute_death()
         if self.sugar <= 0:
-            self.t_die = self.calendar.now() # This is not good, TODO fix the negative sugar bug!
+            self.t_die = self.context.calendar.now() # This is not good, TODO fix the negative sugar bug!
         #print(f"Computed deathTime = {self.t_die} calc'd at t = {self.calendar.now()}")
         if self.die_event != None:
-            self.die_event = self.calendar.resched(self.die_event, self.t_die)
+            self.die_event = self.context.calendar.resched(self.die_event, self.t_die)
+        else:
+            self.die_event = self.context.calendar.add(Event(self.t_die, Event.DIE, self, self.die))
+
+
+class RunningStatistic:
+    """A stat of a population kept up to date as Agents come, go and change.
+    Keeps a compensated running sum for the average and the values in sorted order for order statistics.
+    The sorted values are split into buckets of up to 2 * LOAD, so an update only inserts into one short list
+    instead of shifting all of them.
+    """
+    LOAD = 512 # Values per bucket after a split
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.compensation = 0 # Rounding error lost from total (Neumaier summation)
+        self.ordered = []
+
+    @property
+    def ordered(self):
+        """List of the values in sorted order."""
+        return [value for bucket in self.buckets for value in bucket]
+
+    @ordered.setter
+    def ordered(self, values):
+        load = RunningStatistic.LOAD
+        self.buckets = [list(values[i:i + load]) for i in range(0, len(values), load)] # Sorted runs of the values
+        self.maxes = [bucket[-1] for bucket in self.buckets] # Largest value of each bucket
+
+    def _accumulate(self, value):
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    def add(self, value):
+        self.count += 1
+        self._accumulate(value)
+        buckets, maxes = self.buckets, self.maxes
+        if not buckets:
+            buckets.append([value])
+            maxes.append(value)
+            return
+        i = bisect.bisect_left(maxes, value)
+        if i == len(buckets):
+            i -= 1
+            buckets[i].append(value)
+            maxes[i] = value
         else:
-            self.die_event = self.calendar.add(Event(self.t_die, Event.DIE, self, self.die))
+            bisect.insort(buckets[i], value)
+        if len(buckets[i]) > 2 * RunningStatistic.LOAD:
+            bucket = buckets[i]
+            half = len(bucket) // 2
+            buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+
+    def remove(self, value):
+        self.count -= 1
+        if self.count == 0:
+            self.total, self.compensation = 0, 0
+        else:
+            self._accumulate(-value)
+        i = bisect.bisect_left(self.maxes, value)
+        bucket = self.buckets[i]
+        del bucket[bisect.bisect_left(bucket, value)]
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def change(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+    def average(self):
+        """Average value, 0 when empty."""
+        if self.count == 0:
+            return 0
+        return (self.total + self.compensation) / self.count
+
+    def kth(self, k):
+        """The k-th smallest value (0-based), negative k counts from the largest. Raises IndexError when out of range."""
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError(f"No value {k} of {self.count}")
+        for bucket in self.buckets:
+            if k < len(bucket):
+                return bucket[k]
+            k -= len(bucket)
 
 
 class AgentList:
-    """Store agents and compute statistics."""
+    """Store agents and compute statistics.
+    Agents are kept densely in agentList, with slots mapping an Agent's id to its index.
+    Removal swaps the last Agent into the vacated index, so agentList order is not birth order.
+    """
     SUGAR = lambda agent: agent.sugar
     METABOLISM = lambda agent: agent.metab
     VISION = lambda agent: agent.vision
 
     def __init__(self, initialAmt, landscape, calendar, rng):
+        self.config = landscape.config
+        self.log = landscape.log
         self.current_id = 0
         self.agentList = []
+        self.slots = dict() # Agent id -> index in agentList
+        # Stats kept up to date on add(), remove() and sugar changes
+        self.statistics = {stat: RunningStatistic() for stat in [AgentList.SUGAR, AgentList.METABOLISM, AgentList.VISION]}
+        self.context = Context(landscape, calendar, rng, self) # Shared by its Agents
         for i in range(initialAmt):
             newAgent = Agent(landscape, calendar, aList=self, rng=rng)
             self.full_add(newAgent)
@@ -342,8 +564,12 @@ class AgentList:
         """Add agent to Agent list."""
         if isinstance(agent, Agent):
             agent.id = self.current_id
+            self.slots[agent.id] = len(self.agentList)
             self.agentList.append(agent)
             self.current_id += 1
+            for stat, statistic in self.statistics.items():
+                statistic.add(stat(agent))
+            agent.listed = True
         else:
             raise TypeError("add() requires Agent as parameter")
 
@@ -356,19 +582,28 @@ class AgentList:
             raise Exception(f"Cannot put Agent {agent.id} at {agent.col, agent.row}, occupied by {occ}")
 
     def get_by_id(self, id):
-        """Search for and return an Agent by id.
+        """Get an Agent by id.
         Returns None if not found.
         """
-        for agent in self.agentList:
-            if agent.id == id:
-                return agent
-        return None
+        slot = self.slots.get(id)
+        return self.agentList[slot] if slot != None else None
 
     def remove(self, agent):
-        try:
-            self.agentList.remove(agent)
-        except:
-            print(f"WARNING: Tried to remove agent {agent.id} who is not in the Agent list")
+        slot = self.slots.get(agent.id)
+        if slot == None or self.agentList[slot] is not agent:
+            if self.log.enabled:
+                self.log.log(WARNING, agent.calendar.now(), agent=agent.id,
+                    message=f"Tried to remove agent {agent.id} who is not in the Agent list")
+            return
+        # Swap with the last Agent, then drop the last slot
+        del self.slots[agent.id]
+        last = self.agentList.pop()
+        if last is not agent:
+            self.agentList[slot] = last
+            self.slots[last.id] = slot
+        agent.listed = False
+        for stat, statistic in self.statistics.items():
+            statistic.remove(stat(agent))
 
     def average(self, stat):
         """Get the average given stat of the agent population.
@@ -378,6 +613,8 @@ class AgentList:
         - VISION
         Empty population will return 0.
         """
+        if stat in self.statistics:
+            return self.statistics[stat].average()
         if len(self.agentList) == 0:
             return 0
         aSum = 0
@@ -408,13 +645,30 @@ class AgentList:
         l = len(self.agentList)
         if l == 0:
             return 0
-        ordered = self.ordered_by(stat)
-        if ordered == None:
-            return None
         lowMid = math.floor(l / 2)
         hiMid = math.ceil((l + 1) / 2)
         try:
+            if stat in self.statistics:
+                statistic = self.statistics[stat]
+                return (statistic.kth(lowMid) + statistic.kth(hiMid)) / 2
+            ordered = self.ordered_by(stat)
             compMed = (stat(ordered[lowMid]) + stat(ordered[hiMid])) / 2
         except IndexError as inerr:
             return None
         return compMed
+
+    def quantile(self, stat, q):
+        """Get the q-quantile (0 <= q <= 1) of the given stat of the agent population, lower value when between two.
+        Possible stat options:
+        - SUGAR
+        - METABOLISM
+        - VISION
+        Empty population returns 0.
+        """
+        l = len(self.agentList)
+        if l == 0:
+            return 0
+        k = math.floor(q * (l - 1))
+        if stat in self.statistics:
+            return self.statistics[stat].kth(k)
+        return stat(self.ordered_by(stat)[k])
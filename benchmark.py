@@ -0,0 +1,636 @@
+# Benchmarks of the simulation hot paths
+# Usage: python benchmark.py [benchmark name ...] [--json results.json]
+#        python benchmark.py --compare old.json new.json [--threshold 0.1]
+# Runs every benchmark when no names are given. "import_time", "memory", "micro" and "scenarios" also save their results with --json,
+# and --compare reports the change of every result between two such files, e.g. from two commits.
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from agent import AgentList
+from config import Config
+from event import Event, EventCalendar
+from landscape import Landscape
+from rng import RNG
+from simulation import Simulation
+from visual import str_map
+import numpy as np
+
+SEED = 1234567890
+
+
+def build(rows, cols, agents, lazy=True, backend="heap", seed=SEED, batch=0):
+    """Build a fresh simulation ready to run.
+    Returns EventCalendar, Landscape, AgentList.
+    """
+    config = Config(ROWS=rows, COLUMNS=cols, AGENTS=agents, LAZY_SUGAR=lazy, CALENDAR=backend, SEED=seed,
+        SHOW_ANIMATION=False, PAUSE=False, LOG="null", RNG_BATCH=batch)
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation = Simulation(config)
+    return simulation.calendar, simulation.landscape, simulation.agentList
+
+
+def time_events(calendar, until):
+    """Run the calendar until the given time.
+    Returns number of events executed and elapsed wall time in seconds.
+    """
+    count = 0
+    def counter():
+        nonlocal count
+        count += 1
+    calendar.set_postevent(counter)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        calendar.run(until)
+    return count, time.perf_counter() - start
+
+
+def sugar_regrowth(sizes=(10, 50, 100, 200, 500), agents=200, until=2):
+    """Per-event cost of eager vs lazy sugar regrowth as the landscape grows, same population.
+    Grids too small for the population get half as many Agents as Cells.
+    """
+    print(f"{'grid':>9} {'agents':>7} {'mode':>6} {'events':>7} {'us/event':>10}")
+    for size in sizes:
+        count = min(agents, size * size // 2)
+        for lazy in (False, True):
+            calendar, landscape, agentList = build(size, size, count, lazy=lazy)
+            events, elapsed = time_events(calendar, until)
+            mode = "lazy" if lazy else "eager"
+            print(f"{size:>4}x{size:<4} {count:>7} {mode:>6} {events:>7} {1e6 * elapsed / max(events, 1):>10.1f}")
+
+
+def landscape_startup(sizes=(100, 500, 1000)):
+    """Time to generate a Landscape."""
+    print(f"{'grid':>11} {'seconds':>8}")
+    for size in sizes:
+        start = time.perf_counter()
+        Landscape(size, size, rng=RNG(SEED), config=Config())
+        print(f"{size:>5}x{size:<5} {time.perf_counter() - start:>8.3f}")
+
+
+def shared_terrain(sizes=(500, 1000, 2000)):
+    """Time and memory a replication's Landscape takes to start: generating its terrain, attaching to a
+    SharedTerrain published once (as sweep.py --share-terrain does), or memory-mapping .npy terrain files
+    (TERRAIN_CAPACITY and TERRAIN_LEVEL). Attaching is timed as a worker does it, unpickling the SharedTerrain
+    it is passed. The files are freshly written, so they are in the page cache like a map many runs use.
+    """
+    import pickle
+    import tracemalloc
+    from terrain import Terrain
+    print(f"{'grid':>11} {'terrain':>9} {'seconds':>8} {'MB':>8}")
+    for size in sizes:
+        generated = Terrain.generate(size, size, Config(ROWS=size, COLUMNS=size))
+        shared = generated.share()
+        message = pickle.dumps(shared)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, "capacity.npy"), os.path.join(directory, "level.npy")]
+            generated.save(*paths)
+            for mode in ("generated", "shared", "mapped"):
+                config = Config(ROWS=size, COLUMNS=size)
+                if mode == "mapped":
+                    config.update(TERRAIN_CAPACITY=paths[0], TERRAIN_LEVEL=paths[1])
+                tracemalloc.start()
+                start = time.perf_counter()
+                terrain = pickle.loads(message) if mode == "shared" else None
+                landscape = Landscape(size, size, rng=RNG(SEED), config=config, terrain=terrain)
+                elapsed = time.perf_counter() - start
+                allocated = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                print(f"{size:>5}x{size:<5} {mode:>9} {elapsed:>8.3f} {allocated / 2**20:>8.1f}")
+                landscape = terrain = None
+        shared.unlink()
+
+
+def calendar_backends(size=50, agents=400, until=10, actors=1000, steps=100000):
+    """Event throughput of each EventCalendar backend on the same run,
+    and on the calendar alone with agents' move + death reschedule pattern.
+    """
+    print(f"{'backend':>8} {'events':>7} {'events/s':>10} {'calendar only/s':>16}")
+    for backend in EventCalendar.BACKENDS:
+        calendar, landscape, agentList = build(size, size, agents, backend=backend)
+        count, elapsed = time_events(calendar, until)
+
+        calendar = EventCalendar(backend)
+        rng = RNG(SEED).get("inter")
+        deaths = []
+        def act(i):
+            # Schedule the next action and push back the death, like Agent._sched()
+            t = calendar.now()
+            calendar.add(Event(t + rng.exponential(1.0), Event.MOVE, None, lambda: act(i)))
+            tDie = t + 10 + rng.exponential(1.0)
+            if deaths[i] != None:
+                deaths[i] = calendar.resched(deaths[i], tDie)
+            if deaths[i] == None:
+                deaths[i] = calendar.add(Event(tDie, Event.DIE, None, lambda: None))
+        for i in range(actors):
+            calendar.add(Event(rng.exponential(1.0), Event.MOVE, None, lambda i=i: act(i)))
+            deaths.append(calendar.add(Event(10 + rng.exponential(1.0), Event.DIE, None, lambda: None)))
+        start = time.perf_counter()
+        for i in range(steps):
+            calendar.sim.step()
+        synthetic = steps / (time.perf_counter() - start)
+        print(f"{backend:>8} {count:>7} {count / elapsed:>10.0f} {synthetic:>16.0f}")
+
+
+def population_statistics(populations=(400, 4000, 20000, 100000), queries=20, updates=20000):
+    """Cost of average + median of every stat, incrementally tracked vs full rescans and sorts, and of keeping the
+    tracked sugar up to date: an update is one Agent's sugar changing, a query follows every 1000 of them.
+    """
+    print(f"{'agents':>7} {'tracked ms':>11} {'rescan ms':>10} {'update us':>10}")
+    for agents in populations:
+        size = int((4 * agents) ** 0.5)
+        calendar, landscape, agentList = build(size, size, agents)
+        tracked = [AgentList.SUGAR, AgentList.METABOLISM, AgentList.VISION]
+        untracked = [lambda agent: agent.sugar, lambda agent: agent.metab, lambda agent: agent.vision]
+        timings = []
+        for stats in (tracked, untracked):
+            start = time.perf_counter()
+            for i in range(queries):
+                for stat in stats:
+                    agentList.average(stat)
+                    agentList.median(stat)
+            timings.append(1e3 * (time.perf_counter() - start) / queries)
+        statistic = agentList.statistics[AgentList.SUGAR]
+        changes = landscape.rng.get("benchmark").random(updates) * 20
+        olds = [agent.sugar for agent in agentList.agentList]
+        start = time.perf_counter()
+        for i, new in enumerate(changes.tolist()):
+            statistic.change(olds[i % agents], new)
+            olds[i % agents] = new
+            if i % 1000 == 999:
+                statistic.kth(agents // 2)
+        update = 1e6 * (time.perf_counter() - start) / updates
+        print(f"{agents:>7} {timings[0]:>11.3f} {timings[1]:>10.3f} {update:>10.2f}")
+
+
+def move_target(size=50, agents=400, repeats=20):
+    """Cost of choosing a move target: field_of_view() scan vs the vectorized best_visible_cell()."""
+    calendar, landscape, agentList = build(size, size, agents)
+    def scan(agent):
+        maxSugar, maxCell, minDist = -1, None, math.inf
+        def evaluate(cell, dist):
+            nonlocal maxSugar, maxCell, minDist
+            if not cell.agent:
+                if cell.sugar > maxSugar or (cell.sugar == maxSugar and dist < minDist):
+                    maxSugar, maxCell, minDist = cell.sugar, cell, dist
+        agent.field_of_view(evaluate)
+        return maxCell
+    print(f"{'method':>18} {'us/agent':>9}")
+    for name, choose in [("field_of_view", scan), ("best_visible_cell", lambda agent: agent.best_visible_cell())]:
+        start = time.perf_counter()
+        for i in range(repeats):
+            for agent in agentList.agentList:
+                choose(agent)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18} {1e6 * elapsed / (repeats * len(agentList.agentList)):>9.1f}")
+
+
+def mate_search(sizes=(50, 200), agents=400, repeats=20):
+    """Cost of finding a mate: field_of_view() scan of every Cell vs find_mate() over the occupancy index."""
+    print(f"{'grid':>9} {'method':>14} {'us/agent':>9}")
+    for size in sizes:
+        calendar, landscape, agentList = build(size, size, agents)
+        def scan(agent):
+            wealthiest, maxSugar = None, -math.inf
+            def evaluate(cell, dist):
+                nonlocal wealthiest, maxSugar
+                if cell.agent != None:
+                    cand = cell.agent
+                    if cell.sugar > maxSugar and not cand.is_gestating(0) and cand.alive:
+                        wealthiest, maxSugar = cand, cell.sugar
+            agent.field_of_view(evaluate)
+            return wealthiest
+        for name, find in [("field_of_view", scan), ("find_mate", lambda agent: agent.find_mate(0))]:
+            start = time.perf_counter()
+            for i in range(repeats):
+                for agent in agentList.agentList:
+                    find(agent)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>4}x{size:<4} {name:>14} {1e6 * elapsed / (repeats * len(agentList.agentList)):>9.1f}")
+
+
+def checkpoint_roundtrip(sizes=((50, 400), (200, 4000), (500, 20000)), until=1):
+    """Time to save and restore a checkpoint, and its size."""
+    print(f"{'grid':>9} {'agents':>7} {'save ms':>8} {'load ms':>8} {'KiB':>8}")
+    for size, agents in sizes:
+        config = Config(ROWS=size, COLUMNS=size, AGENTS=agents, SEED=SEED, LOG="null")
+        simulation = Simulation(config)
+        simulation.run(until)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "benchmark.ckpt")
+        start = time.perf_counter()
+        simulation.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        Simulation.load(path)
+        loaded = time.perf_counter() - start
+        print(f"{size:>4}x{size:<4} {agents:>7} {1e3 * saved:>8.1f} {1e3 * loaded:>8.1f} {os.path.getsize(path) / 1024:>8.0f}")
+        os.remove(path)
+        os.rmdir(directory)
+
+
+def fork_branches(size=50, agents=400, warmup=20, branch=2, variants=4):
+    """Wall time of what-if variants that re-simulate the warm-up each vs forking them after one warm-up."""
+    config = Config(ROWS=size, COLUMNS=size, AGENTS=agents, SEED=SEED, LOG="null")
+    alphas = [{"ALPHA": 0.2 + 0.1 * i} for i in range(variants)]
+    start = time.perf_counter()
+    for params in alphas:
+        simulation = Simulation(config.copy())
+        simulation.run(warmup)
+        simulation.config.update(**params)
+        simulation.run(warmup + branch)
+    replayed = time.perf_counter() - start
+    start = time.perf_counter()
+    simulation = Simulation(config.copy())
+    simulation.run(warmup)
+    simulation.fork(alphas, until=warmup + branch)
+    forked = time.perf_counter() - start
+    print(f"{'variants':>8} {'replay s':>9} {'fork s':>7}")
+    print(f"{variants:>8} {replayed:>9.2f} {forked:>7.2f}")
+
+
+def profiling_overhead(size=50, agents=400, until=5):
+    """Event throughput with profiling off, on, and on with a trace kept."""
+    print(f"{'profiling':>10} {'events/s':>9}")
+    for name, profile, trace in [("off", False, ""), ("on", True, ""), ("trace", True, "unused.json")]:
+        config = Config(ROWS=size, COLUMNS=size, AGENTS=agents, SEED=SEED, LOG="null", PROFILE=profile, PROFILE_TRACE=trace)
+        simulation = Simulation(config)
+        count, elapsed = time_events(simulation.calendar, until)
+        print(f"{name:>10} {count / elapsed:>9.0f}")
+
+
+def import_time(repeats=5, modules=("numpy", "numpy.random", "simulation", "sugarscape")):
+    """Import time of the headless entry points in fresh interpreters, and which optional modules they load."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    def fresh(code):
+        # Best of repeats, each in a new interpreter so nothing is cached in sys.modules
+        outputs = [subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=here).stdout
+            for i in range(repeats)]
+        return min(outputs, key=lambda output: float(output.split()[0]))
+    print(f"{'import':>14} {'ms':>7}")
+    results = dict()
+    for module in modules:
+        ms = float(fresh(f"import time; t = time.perf_counter(); import {module}; print(1e3 * (time.perf_counter() - t))"))
+        results[module] = ms
+        print(f"{module:>14} {ms:>7.1f}")
+    optional = ["plotly", "simulus", "distutils", "pause", "visual", "checkpoint", "branch"]
+    loaded = fresh("import time; t = time.perf_counter(); import sys; from config import Config; "
+        "from simulation import Simulation; Simulation(Config(ROWS=10, COLUMNS=10, AGENTS=10, LOG='null')).run(1); "
+        f"print(1e3 * (time.perf_counter() - t), *[m for m in {optional!r} if m in sys.modules])").split()
+    results["minimal_run"] = float(loaded[0])
+    print(f"Minimal headless run incl. imports: {float(loaded[0]):.1f} ms, optional modules loaded: {loaded[1:] or 'none'}")
+    return {name: {"ms": ms} for name, ms in results.items()}
+
+
+def animation(sizes=(50, 100), agents=400, until=1):
+    """Per-event cost of SHOW_ANIMATION: full str_map frames vs the incremental ANSI renderer, written to memory."""
+    from terminal import TerminalRenderer
+    print(f"{'grid':>9} {'renderer':>9} {'events':>7} {'us/event':>9} {'bytes/event':>12}")
+    for size in sizes:
+        for name in ("frames", "ansi"):
+            calendar, landscape, agentList = build(size, size, agents)
+            out = io.StringIO()
+            renderer = TerminalRenderer(landscape, agentList, showSugar=True, stream=out) if name == "ansi" else None
+            count = 0
+            def post():
+                nonlocal count
+                count += 1
+                if renderer != None:
+                    renderer.frame(calendar.now())
+                else:
+                    out.write(f"t = {calendar.now():4.32}, alive = {len(agentList.agentList)}\n{str_map(landscape)}\n")
+            calendar.set_postevent(post)
+            start = time.perf_counter()
+            calendar.run(until)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>4}x{size:<4} {name:>9} {count:>7} {1e6 * elapsed / count:>9.0f} {out.tell() / count:>12.0f}")
+
+
+def rng_batching(size=50, agents=400, batches=(0, 1024), draws=20000):
+    """Cost of the scalar random draws agents make, one Generator call each vs handed out from pre-drawn blocks,
+    and of the Agent methods that make them.
+    """
+    print(f"{'draw':>12} " + " ".join(f"{f'batch {batch} us':>14}" for batch in batches))
+    calls = {
+        "exponential": lambda rng: rng.get("inter").exponential(0.175),
+        "normal": lambda rng: rng.get("inter").normal(1, .5),
+        "uniform": lambda rng: rng.get("genetic").uniform(1, 4),
+        "choice": lambda rng: rng.get("genetic").choice([True, False]),
+        "shuffle": lambda rng: rng.get("shuffle").shuffle([0, 1, 2, 3])
+    }
+    for name, call in calls.items():
+        costs = [per_call(lambda rng: call(rng), draws, setup=lambda: RNG(SEED, batch=batch)) for batch in batches]
+        print(f"{name:>12} " + " ".join(f"{us:>14.3f}" for us in costs))
+    def agent_calls(method, batch):
+        def setup():
+            return list(build(size, size, agents, batch=batch)[2].agentList)
+        def call(fresh):
+            for agent in fresh:
+                if agent.alive:
+                    getattr(agent, method)()
+        return per_call(call, 1, repeats=3, setup=setup) / agents
+    def init(batch):
+        def setup():
+            calendar, landscape, agentList = build(size, size, 0, batch=batch)
+            return landscape, calendar, landscape.rng
+        return per_call(lambda state: AgentList(agents, *state), 1, repeats=3, setup=setup) / agents
+    print(f"{'method':>12} " + " ".join(f"{f'batch {batch} us':>14}" for batch in batches))
+    print(f"{'__init__':>12} " + " ".join(f"{init(batch):>14.2f}" for batch in batches))
+    for method in ("move", "reproduce"):
+        print(f"{method:>12} " + " ".join(f"{agent_calls(method, batch):>14.2f}" for batch in batches))
+
+
+def engines(sizes=((50, 400), (200, 4000)), until=10, seeds=3, tick=0.2):
+    """Wall time and end statistics of the events and ticks engines on the same parameters, averaged over seeds.
+    Sugar is compared as of the end time: the events engine only metabolizes an Agent's sugar at its own events,
+    so its AgentList statistics run ahead of what the Agents have left. The gini coefficient compares the spread.
+    """
+    from metrics import gini
+    names = ["population", "average_sugar", "median_sugar", "average_metabolism", "average_vision", "gini"]
+    seedList = RNG(SEED).spawn_seeds(seeds)
+    print(f"{'grid':>9} {'agents':>7} {'engine':>7} {'wall s':>7} " + " ".join(f"{name:>18}" for name in names))
+    for size, agents in sizes:
+        means = dict()
+        for engine in ("events", "ticks"):
+            totals = dict((name, 0.0) for name in names)
+            elapsed = 0
+            for seed in seedList:
+                config = Config(ROWS=size, COLUMNS=size, AGENTS=agents, SEED=seed, LOG="null", ENGINE=engine, TICK=tick)
+                simulation = Simulation(config)
+                start = time.perf_counter()
+                simulation.run(until)
+                elapsed += time.perf_counter() - start
+                now = simulation.now()
+                population = simulation.agentList.agentList
+                sugar = np.sort([agent.sugar - agent.metab * (now - agent.t_lastNextSugar) for agent in population])
+                values = {
+                    "population": len(population),
+                    "average_sugar": sugar.mean() if len(sugar) else 0.0,
+                    "median_sugar": float(np.median(sugar)) if len(sugar) else 0.0,
+                    "average_metabolism": simulation.agentList.average(AgentList.METABOLISM),
+                    "average_vision": simulation.agentList.average(AgentList.VISION),
+                    "gini": gini(sugar) or 0.0
+                }
+                for name in names:
+                    totals[name] += values[name] / seeds
+            means[engine] = totals
+            print(f"{size:>4}x{size:<4} {agents:>7} {engine:>7} {elapsed / seeds:>7.2f} " + " ".join(f"{totals[name]:>18.4f}" for name in names))
+        differences = [(means["ticks"][name] - means["events"][name]) / means["events"][name] if means["events"][name] else math.nan
+            for name in names]
+        print(f"{'':>9} {'':>7} {'diff':>7} {'':>7} " + " ".join(f"{100 * difference:>17.1f}%" for difference in differences))
+
+
+def tiles(sizes=((200, 4000), (400, 16000)), workers=(1, 2, 4), until=10, tick=0.2):
+    """Wall time and end statistics of the ticks engine and of the tiles engine with several workers on the same
+    parameters. The speedup is bounded by the cores of the machine; with fewer cores than workers it shows the cost
+    of the barriers and of publishing the state to shared memory.
+    """
+    print(f"{'grid':>9} {'agents':>7} {'engine':>7} {'workers':>7} {'wall s':>7} {'population':>10} {'average_sugar':>14}")
+    for size, agents in sizes:
+        for engine, count in [("ticks", 1)] + [("tiles", count) for count in workers]:
+            config = Config(ROWS=size, COLUMNS=size, AGENTS=agents, SEED=SEED, LOG="null", ENGINE=engine, TICK=tick,
+                TILE_WORKERS=count)
+            simulation = Simulation(config)
+            start = time.perf_counter()
+            results = simulation.run(until)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>4}x{size:<4} {agents:>7} {engine:>7} {getattr(simulation.engine, 'workers', 1):>7} {elapsed:>7.2f} "
+                f"{results.population:>10} {results.averages['sugar']:>14.4f}")
+
+
+def object_size(obj):
+    """Bytes of an object itself plus its instance __dict__, if it has one."""
+    return sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, "__dict__") else 0)
+
+
+def memory(size=300, agents=20000):
+    """Memory per Agent and per Cell. Compare saved results of two commits with --compare to see a change.
+    agent_total is everything allocated while creating the Agents: the Agents, their events, heap entries and
+    statistics; agent_object and event_object only count the object (and its __dict__).
+    """
+    import tracemalloc
+    calendar, landscape, agentList = build(size, size, 0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    population = AgentList(agents, landscape, calendar, landscape.rng)
+    total = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    agent = population.agentList[0]
+    arrays = sum(getattr(landscape, name).nbytes for name in ("capacity", "level", "sugar", "occupant"))
+    results = {
+        "agent_total": total / agents,
+        "agent_object": object_size(agent),
+        "event_object": object_size(agent.move_event) if agent.move_event != None else None,
+        "cell_object": object_size(landscape.get_cell(0, 0)),
+        "cell_arrays": arrays / (size * size)
+    }
+    print(f"{'measure':>14} {'bytes':>9}")
+    for name, value in results.items():
+        print(f"{name:>14} {value:>9.1f}")
+    return {name: {"bytes": value} for name, value in results.items()}
+
+
+def per_call(func, calls, repeats=5, setup=None):
+    """Time func.
+    func - Callable run calls times per repeat, given setup's return value if setup is given.
+    setup - Callable run untimed before every repeat, e.g. to build fresh state for a call that changes it.
+    Returns microseconds per call of the fastest repeat.
+    """
+    best = math.inf
+    for i in range(repeats):
+        state = setup() if setup != None else None
+        start = time.perf_counter()
+        for j in range(calls):
+            func(state) if setup != None else func()
+        best = min(best, time.perf_counter() - start)
+    return 1e6 * best / calls
+
+
+def micro(size=50, agents=400):
+    """Micro-benchmarks of the functions every event goes through, microseconds per call."""
+    calendar, landscape, agentList = build(size, size, agents)
+    population = agentList.agentList
+    ignore = lambda cell, dist: None
+    def agent_calls(method):
+        # Call method once on every Agent of a fresh simulation, since it changes the state
+        def setup():
+            return list(build(size, size, agents)[2].agentList)
+        def call(fresh):
+            with contextlib.redirect_stdout(io.StringIO()):
+                for agent in fresh:
+                    if agent.alive:
+                        getattr(agent, method)()
+        return setup, call
+    eager = build(size, size, agents, lazy=False)[1]
+    results = dict()
+    results["update_sugar_eager"] = per_call(lambda: eager.update_sugar(1.0), 2000)
+    results["update_sugar_lazy"] = per_call(lambda: landscape.update_sugar(1.0), 2000)
+    results["field_of_view"] = per_call(lambda: [agent.field_of_view(ignore) for agent in population], 5) / len(population)
+    for method in ("move", "reproduce"):
+        setup, call = agent_calls(method)
+        results[method] = per_call(call, 1, repeats=3, setup=setup) / agents
+    results["median"] = per_call(lambda: agentList.median(AgentList.SUGAR), 1000)
+    results["str_map"] = per_call(lambda: str_map(landscape), 5)
+    events, elapsed = 0, 0
+    for i in range(3):
+        count, seconds = time_events(build(size, size, agents)[0], 1)
+        events += count
+        elapsed += seconds
+    results["calendar_step"] = 1e6 * elapsed / max(events, 1)
+    print(f"{'function':>20} {'us/call':>9}")
+    for name, us in results.items():
+        print(f"{name:>20} {us:>9.2f}")
+    return {name: {"us_per_call": us} for name, us in results.items()}
+
+
+def run_scenario(rows, cols, agents, until):
+    """Run one end-to-end scenario, meant for a fresh worker process so the peak RSS is its own.
+    Returns dict of measurements.
+    """
+    calendar, landscape, agentList = build(rows, cols, agents)
+    blocks = sys.getallocatedblocks()
+    count, elapsed = time_events(calendar, until)
+    blocks = sys.getallocatedblocks() - blocks
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin": # Bytes on macOS, KiB elsewhere
+        rss //= 1024
+    return {
+        "grid": f"{rows}x{cols}", "agents": agents, "max_t": until, "events": count,
+        "wall_s": elapsed, "events_per_s": count / elapsed if elapsed > 0 else None,
+        "peak_rss_kib": rss, "net_blocks_per_event": blocks / max(count, 1)
+    }
+
+
+def scenarios(sizes=(25, 50, 100), populations=(100, 400), max_ts=(5, 10)):
+    """End-to-end runs over a grid size x population x MAX_T matrix, each in its own process.
+    net_blocks_per_event is the growth of CPython's allocated memory blocks per event.
+    """
+    results = []
+    print(f"{'grid':>9} {'agents':>7} {'MAX_T':>6} {'events':>7} {'wall s':>7} {'events/s':>9} {'RSS MiB':>8} {'blocks/ev':>9}")
+    for size, agents, until in itertools.product(sizes, populations, max_ts):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_scenario, size, size, agents, until).result()
+        results.append(result)
+        print(f"{result['grid']:>9} {agents:>7} {until:>6} {result['events']:>7} {result['wall_s']:>7.2f} "
+            f"{result['events_per_s']:>9.0f} {result['peak_rss_kib'] / 1024:>8.1f} {result['net_blocks_per_event']:>9.2f}")
+    return results
+
+
+def describe():
+    """Get what the results were measured on: commit, versions, machine and time."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds")
+    }
+
+
+def flatten(results, prefix=""):
+    """Flatten saved results to a dict of metric path -> number."""
+    flat = dict()
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(flatten(value, f"{prefix}{key}/"))
+    elif isinstance(results, list):
+        for item in results:
+            # Scenarios are matched on their parameters rather than their position
+            key = f"{item['grid']} agents={item['agents']} max_t={item['max_t']}"
+            flat.update(flatten({k: v for k, v in item.items() if k not in ("grid", "agents", "max_t")}, f"{prefix}{key}/"))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        flat[prefix.rstrip("/")] = results
+    return flat
+
+
+HIGHER_IS_BETTER = ("events_per_s",)
+
+
+def compare(old, new, threshold=0.1):
+    """Print the relative change of every metric saved in both JSON result files.
+    threshold - Relative change past which a metric counts as a regression (or improvement).
+    Returns number of regressions.
+    """
+    with open(old) as f:
+        before = json.load(f)
+    with open(new) as f:
+        after = json.load(f)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    a, b = flatten(before["results"]), flatten(after["results"])
+    regressions = 0
+    for metric in sorted(a.keys() & b.keys()):
+        if a[metric] == 0:
+            continue
+        change = (b[metric] - a[metric]) / a[metric]
+        if metric.rsplit("/", 1)[-1] in HIGHER_IS_BETTER:
+            change = -change
+        verdict = ""
+        if change > threshold:
+            verdict = "REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            verdict = "improved"
+        print(f"{metric:<60} {a[metric]:>12.4g} {b[metric]:>12.4g} {100 * change:>+7.1f}% {verdict}")
+    return regressions
+
+
+BENCHMARKS = {
+    "sugar_regrowth": sugar_regrowth,
+    "landscape_startup": landscape_startup,
+    "shared_terrain": shared_terrain,
+    "calendar_backends": calendar_backends,
+    "population_statistics": population_statistics,
+    "move_target": move_target,
+    "mate_search": mate_search,
+    "checkpoint_roundtrip": checkpoint_roundtrip,
+    "fork_branches": fork_branches,
+    "profiling_overhead": profiling_overhead,
+    "rng_batching": rng_batching,
+    "animation": animation,
+    "import_time": import_time,
+    "memory": memory,
+    "engines": engines,
+    "tiles": tiles,
+    "micro": micro,
+    "scenarios": scenarios,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sugarscape simulation.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run, default all of {list(BENCHMARKS.keys())}")
+    parser.add_argument("--json", help="File to save the results of micro and scenarios to")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown counted as a regression")
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+    results = dict()
+    for name in args.names or list(BENCHMARKS.keys()):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'; choose from {list(BENCHMARKS.keys())}")
+            continue
+        print(f"== {name} ==")
+        result = BENCHMARKS[name]()
+        if result != None:
+            results[name] = result
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": describe(), "results": results}, f, indent=2)
@@ -0,0 +1,130 @@
+# What-if branches of a running Simulation
+# Every branch continues from the same state with its own parameters and re-seeded RNG streams,
+# so a shared warm-up is simulated once. Branches are forked processes, the state is shared copy-on-write.
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+from sink import NullSink
+import checkpoint
+import math
+import os
+import pickle
+import sys
+import traceback
+
+QUIET = dict(LOG="null", METRICS="", SHOW_PLOTS=False, RECORD="", TRACE="", PROFILE_TRACE="", SHOW_ANIMATION=False,
+    PAUSE=False, CHECKPOINT_EVERY=0) # Outputs of the parent that branches do not write to or show
+
+
+def summarize(simulation):
+    """Default result of a branch: the run's summary dict."""
+    return simulation.results().summary()
+
+
+def run_branch(simulation, params, seed, until, collect):
+    """Continue simulation as a branch. Changes simulation in place, it stops writing the outputs of QUIET.
+    params - Config parameters of the branch.
+    seed - Seed the RNG streams restart from.
+    until - Time to run until, if None the branch's MAX_T.
+    collect - Callable taking the finished Simulation and returning the branch's result.
+    """
+    simulation.config.update(SEED=seed, **params)
+    simulation.config.update(**QUIET)
+    simulation.rng.reseed(seed)
+    # Branches do not write to the parent's log, metrics, recording, trace or checkpoint, nor draw its animation
+    simulation.log = simulation.calendar.log = simulation.landscape.log = simulation.agentList.log = NullSink()
+    if simulation.tracer != None:
+        simulation.tracer.detach()
+    simulation.metrics = simulation.recorder = simulation.renderer = None
+    simulation.t_nextCheckpoint = math.inf
+    simulation.run(until)
+    return collect(simulation)
+
+
+def run_restored(cls, state, params, seed, until, collect):
+    """Restore a snapshot and run it as a branch, for platforms without os.fork."""
+    simulation = cls(Config(**state["config"]).copy(**QUIET), populate=False)
+    checkpoint.restore(simulation, state)
+    return run_branch(simulation, params, seed, until, collect)
+
+
+def _start(simulation, params, seed, until, collect):
+    """Fork a child that runs one branch and pickles its result (or error) to a pipe.
+    Returns pid, read end of the pipe.
+    """
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        status = 0
+        try:
+            try:
+                message = ("ok", run_branch(simulation, params, seed, until, collect))
+            except BaseException:
+                message, status = ("error", traceback.format_exc()), 1
+            with os.fdopen(write, "wb") as pipe:
+                pickle.dump(message, pipe, protocol=pickle.HIGHEST_PROTOCOL)
+            sys.stdout.flush()
+        finally:
+            os._exit(status)
+    os.close(write)
+    return pid, read
+
+
+def _finish(pid, read):
+    """Read a forked branch's result and reap it. Raises RuntimeError if the branch failed."""
+    with os.fdopen(read, "rb") as pipe:
+        data = pipe.read()
+    os.waitpid(pid, 0)
+    if not data:
+        raise RuntimeError(f"Branch process {pid} exited without a result")
+    status, value = pickle.loads(data)
+    if status == "error":
+        raise RuntimeError(f"Branch process {pid} failed:\n{value}")
+    return value
+
+
+def branch(simulation, variants, until=None, workers=None, collect=None):
+    """Run every variant as a branch of simulation's current state, which is left untouched.
+    variants - List of dicts of Config parameters, one per branch. A variant without SEED gets a derived seed.
+    until - Time to run the branches until, if None each branch's MAX_T.
+    workers - Number of branches run at once, if None one per core.
+    collect - Callable taking a finished branch Simulation and returning its (picklable) result, if None summarize.
+    Returns list of results in the order of variants.
+    """
+    collect = collect if collect != None else summarize
+    workers = workers or os.cpu_count()
+    seeds = simulation.rng.spawn_seeds(len(variants))
+    seeds = [params.get("SEED", seed) for params, seed in zip(variants, seeds)]
+    branches = [({name: value for name, value in params.items() if name != "SEED"}, seed)
+        for params, seed in zip(variants, seeds)]
+    # Nothing buffered may be written twice by the children
+    simulation.log.flush()
+    for output in (simulation.metrics, simulation.tracer):
+        if output != None:
+            output.flush()
+    if simulation.recorder != None:
+        simulation.recorder.file.flush() # Its current block is only written once complete
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    if not hasattr(os, "fork"):
+        state = checkpoint.snapshot(simulation)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_restored, type(simulation), state, params, seed, until, collect)
+                for params, seed in branches]
+            return [future.result() for future in futures]
+
+    results = []
+    running = [] # (pid, read end) in start order
+    try:
+        for params, seed in branches:
+            if len(running) >= workers:
+                results.append(_finish(*running.pop(0)))
+            running.append(_start(simulation, params, seed, until, collect))
+        while running:
+            results.append(_finish(*running.pop(0)))
+    finally:
+        for pid, read in running: # Only left over when a branch failed
+            os.close(read)
+            os.waitpid(pid, 0)
+    return results
@@ -0,0 +1,223 @@
+# Snapshots of a whole Simulation that restore bit-exactly
+# A snapshot is a dict of plain values and numpy arrays: the Landscape arrays, one row per Agent,
+# one row per pending event and the state of every RNG stream. Objects are referenced by Agent id.
+from agent import Agent
+from event import Event, HeapSimulator, ScheduledEvent
+from landscape import EMPTY
+import math
+import numpy as np
+import os
+import pickle
+
+MAGIC = b"SUGARSCAPE-CHECKPOINT"
+VERSION = 1
+HANDLES = ["move_event", "die_event", "reproduce_event", "birth_event"] # Agent attributes holding event handles
+CALLBACKS = ["move", "die", "reproduce", "birth"] # Agent method each handle calls
+NONE, DONE, PENDING = 0, 1, 2 # Handle states: no handle, happened or cancelled, scheduled
+AGENT_DTYPE = np.dtype([
+    ("id", "i8"), ("listed", "?"), ("alive", "?"), ("mate", "i8"), ("row", "i8"), ("col", "i8"),
+    ("sugar", "f8"), ("t_lastNextSugar", "f8"), ("birthdate", "f8"),
+    ("metab", "f8"), ("vision", "i8"), ("mother", "?"), ("max_age", "f8"),
+    ("t_move", "f8"), ("t_die", "f8"), ("t_reproduce", "f8"), ("t_birth", "f8"), ("period_g", "f8"),
+    ("handles", "u1", (len(HANDLES),))
+])
+EVENT_DTYPE = np.dtype([("agent", "i8"), ("handle", "u1"), ("time", "f8"), ("t_queued", "f8"), ("seq", "i8")])
+NO_MATE = -1
+
+
+def _agents(agentList):
+    """Every Agent the state refers to: the listed ones, then mates that already left the list."""
+    agents = dict((agent.id, agent) for agent in agentList.agentList)
+    pending = list(agents.values())
+    while pending:
+        mate = pending.pop().mate
+        if mate != None and mate.id not in agents:
+            agents[mate.id] = mate
+            pending.append(mate)
+    return list(agents.values())
+
+
+def snapshot(simulation):
+    """Get the complete state of simulation between two events.
+    Only the "heap" calendar backend can be snapshot. Raises ValueError for others.
+    """
+    calendar = simulation.calendar
+    sim = calendar.sim
+    if not isinstance(sim, HeapSimulator):
+        raise ValueError("Checkpoints require the \"heap\" calendar backend")
+    landscape = simulation.landscape
+    agentList = simulation.agentList
+    rng = simulation.rng
+
+    # Agents and their handles
+    agents = _agents(agentList)
+    table = np.zeros(len(agents), dtype=AGENT_DTYPE)
+    owners = dict() # id(ScheduledEvent) -> (Agent id, handle index)
+    for i, agent in enumerate(agents):
+        states = []
+        for h, name in enumerate(HANDLES):
+            e = getattr(agent, name)
+            if e == None:
+                states.append(NONE)
+            elif e.active:
+                states.append(PENDING)
+                owners[id(e)] = (agent.id, h)
+            else:
+                states.append(DONE)
+        table[i] = (agent.id, agent.listed, agent.alive, agent.mate.id if agent.mate != None else NO_MATE,
+            agent.row, agent.col, agent.sugar, agent.t_lastNextSugar, agent.birthdate,
+            agent.metab, agent.vision, agent.mother, agent.max_age,
+            agent.t_move, agent.t_die, agent.t_reproduce, agent.t_birth, agent.period_g, states)
+
+    # Live heap entries, the handles' positions in the event order are kept through their seq
+    live = [(time, seq, e) for time, seq, e in sim._heap if e.active and seq == e.seq]
+    events = np.zeros(len(live), dtype=EVENT_DTYPE)
+    for i, (time, seq, e) in enumerate(live):
+        if id(e) not in owners:
+            raise ValueError(f"Pending {e.name} event at {e.time} does not belong to an Agent")
+        events[i] = owners[id(e)] + (e.time, time, seq)
+
+    return {
+        "config": simulation.config.as_dict(),
+        "rng": {
+            "seed": rng.seed,
+            "big_gen": rng.big_gen.state,
+            "generators": [(name, gen.bit_generator.state) for name, gen in rng.generators.items()],
+            "buffered": [(name, stream.state()) for name, stream in rng.streams.items()]
+        },
+        "landscape": {
+            "capacity": landscape.capacity,
+            "level": landscape.level,
+            "sugar": landscape.sugar,
+            "occupant": landscape.occupant,
+            "t_lastSugarUpdate": landscape.t_lastSugarUpdate
+        },
+        "agents": table,
+        "agentList": {
+            "current_id": agentList.current_id,
+            "order": np.array([agent.id for agent in agentList.agentList], dtype=np.int64),
+            "statistics": [(s.count, s.total, s.compensation, np.array(s.ordered))
+                for s in agentList.statistics.values()]
+        },
+        "calendar": {"now": sim.now, "seq": sim._seq, "events": events}
+    }
+
+
+def restore(simulation, state):
+    """Put state into simulation, built from the state's config without Agents (see Simulation.load())."""
+    landscape = simulation.landscape
+    agentList = simulation.agentList
+    calendar = simulation.calendar
+    rng = simulation.rng
+
+    # RNG streams, recreated in their original order
+    rng.generators = dict()
+    for name, bitState in state["rng"]["generators"]:
+        rng.expand(name)
+        rng.generators[name].bit_generator.state = bitState
+    rng.big_gen.state = state["rng"]["big_gen"]
+    rng.streams = dict()
+    for name, buffered in state["rng"].get("buffered", []):
+        rng.get(name).set_state(buffered)
+
+    # Landscape
+    cells = state["landscape"]
+    landscape.capacity = cells["capacity"].copy()
+    landscape.level = cells["level"].copy()
+    landscape.sugar = cells["sugar"].copy()
+    landscape.t_lastSugarUpdate = cells["t_lastSugarUpdate"]
+    landscape.track_growing()
+    landscape.occupant[:] = EMPTY
+    for y in range(landscape.rows):
+        landscape.rowOccupied[y].clear()
+    for x in range(landscape.cols):
+        landscape.colOccupied[x].clear()
+    landscape.agents = dict()
+
+    # Agents, bypassing __init__ which would draw traits and schedule events
+    agents = dict()
+    for row in state["agents"]:
+        agent = Agent.__new__(Agent)
+        agent.id = int(row["id"])
+        agent.context = agentList.context
+        agent.listed = bool(row["listed"])
+        agent._sugar = float(row["sugar"])
+        agent.t_lastNextSugar = float(row["t_lastNextSugar"])
+        agent.alive = bool(row["alive"])
+        agent.birthdate = float(row["birthdate"])
+        agent.row = int(row["row"])
+        agent.col = int(row["col"])
+        agent.metab = float(row["metab"])
+        agent.vision = int(row["vision"])
+        agent.mother = bool(row["mother"])
+        agent.max_age = float(row["max_age"])
+        agent.t_nextEventTime, agent.t_nextEventType, agent.nextCallback = math.inf, None, None
+        agent.t_move = float(row["t_move"])
+        agent.t_die = float(row["t_die"])
+        agent.t_reproduce = float(row["t_reproduce"])
+        agent.t_birth = float(row["t_birth"])
+        agent.period_g = float(row["period_g"])
+        for name, callback, handle in zip(HANDLES, CALLBACKS, row["handles"]):
+            e = None
+            if handle != NONE:
+                e = ScheduledEvent(calendar.wrap(Event(math.inf, callback, agent, getattr(agent, callback))), math.inf, callback)
+                e.active = False
+            setattr(agent, name, e)
+        agents[agent.id] = agent
+    for row in state["agents"]:
+        mate = int(row["mate"])
+        agents[int(row["id"])].mate = agents[mate] if mate != NO_MATE else None
+
+    # AgentList and the Agents on the Landscape
+    lists = state["agentList"]
+    agentList.current_id = lists["current_id"]
+    agentList.agentList = [agents[int(id)] for id in lists["order"]]
+    agentList.slots = dict((agent.id, i) for i, agent in enumerate(agentList.agentList))
+    for statistic, (count, total, compensation, ordered) in zip(agentList.statistics.values(), lists["statistics"]):
+        statistic.count = count
+        statistic.total = total
+        statistic.compensation = compensation
+        statistic.ordered = ordered.tolist()
+    ys, xs = np.nonzero(cells["occupant"] != EMPTY)
+    for y, x in zip(ys.tolist(), xs.tolist()):
+        id = int(cells["occupant"][y, x])
+        landscape._occupy(x, y, id)
+        landscape.agents[id] = agents[id]
+
+    # Pending events, with their original sequence numbers so ties keep their order
+    sim = calendar.sim
+    queued = state["calendar"]
+    sim.now = queued["now"]
+    sim._seq = queued["seq"]
+    sim._heap = []
+    sim._stale = 0
+    for row in queued["events"]:
+        e = getattr(agents[int(row["agent"])], HANDLES[row["handle"]])
+        e.active = True
+        e.time = float(row["time"])
+        e.seq = int(row["seq"])
+        e.t_queued = float(row["t_queued"])
+        sim._heap.append((e.t_queued, e.seq, e))
+    sim._heap.sort(key=lambda entry: entry[:2])
+    return simulation
+
+
+def write(state, path):
+    """Write a snapshot to path. The file is replaced in one step, so a crash never leaves half a checkpoint."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(VERSION.to_bytes(2, "little"))
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def read(path):
+    """Read a snapshot written by write(). Raises ValueError if path is not a checkpoint of this version."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a sugarscape checkpoint")
+        version = int.from_bytes(f.read(2), "little")
+        if version != VERSION:
+            raise ValueError(f"{path} is checkpoint version {version}, expected {VERSION}")
+        return pickle.load(f)
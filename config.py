@@ -1,40 +1,103 @@
 from os import environ
-from distutils import util
-sbool = util.strtobool
 get = environ.get
 
-# Important general config
-MAX_T = float(get("MAX_T", 200)) # Maximum simulation time
-SEED = int(get("SEED", 1234567890)) # Random seed
-ALPHA = float(get("ALPHA", .33)) # How many units of sugar regrow per timestep (1.0 unit of time)
-ROWS = int(get("ROWS", 50)) # Landscape rows
-COLUMNS = int(get("COLUMNS", 50)) # Landscape columns
-AGENTS = int(get("AGENTS", 400)) # Initial agent population size
-MAX_POSSIBLE_SUGAR = int(get("MAX_POSSIBLE_SUGAR", 5)) # Maximum possible sugar capacity per cell
-MAX_HEIGHT = int(get("MAX_HEIGHT", 4)) # Maximum cell height
-PAUSE = sbool(get("PAUSE",  "False")) # Pause after every event
-REPRODUCTION_LAMBDA = float(get("REPRODUCTION_LAMBDA", 0.175)) # Random expovariate lambda value when deciding reproduction event time
-FERTILE_AGE = float(get("FERTILE_AGE", 1.6)) # Minimum time age mothering Agents can reproduce
-GESTATION_MU = float(get("GESTATION_MU", 1)) # Mean gestation period length (normal distribution)
-GESTATION_SIGMA = float(get("GESTATION_SIGMA", .5)) # Std Deviation of gestation period length distribution
-MEAN_MAX_AGE = float(get("MEAN_MAX_AGE", 30)) # Mean maximum age, max age is randomly chosen from a gaussian distribution
-SIGMA_MAX_AGE = float(get("SIGMA_MAX_AGE", 10)) # Maximum age gaussian distribution standard distribution
-# Visual general config
-SHOW_ANIMATION = sbool(get("SHOW_ANIMATION", "False")) # Show visual of every event -- slower simulation
-SHOW_FINAL_COMPARISON = sbool(get("SHOW_FINAL_COMPARISON", "False")) # Show visual comparison of initial state vs final state
-SHOW_SUGAR = sbool(get("SHOW_SUGAR", "False")) # Show sugar in visual
-SHOW_TERRAIN = sbool(get("SHOW_TERRAIN", "False")) # Show cell heights in a separate visual
-# Plot general config
-SHOW_PLOTS = sbool(get("SHOW_PLOTS", "False")) # Show the plot of various statistics at the end
-PLOTS = get("PLOTS", "wealth,population") # Comma-separated list of plots to show
-# Specific visual chars config
-AGENT_HEALTHY_CHAR = get("AGENT_HEALTHY_CHAR", "O") # Agent with sugar > metabolic rate
-AGENT_CRITICAL_CHAR = get("AGENT_CRITICAL_CHAR", "o") # Agent with sugar <= metabolic rate
-SUGAR_0_CHAR = get("SUGAR_0_CHAR", "․") # Sugar at (0, 25)% max height
-SUGAR_1_CHAR = get("SUGAR_1_CHAR", "⁚") # Sugar at [25, 50)% max height
-SUGAR_2_CHAR = get("SUGAR_2_CHAR", "⁝") # Sugar at [50, 75)% max height
-SUGAR_3_CHAR = get("SUGAR_3_CHAR", "⁞") # Sugar at [75, 100]% max height
-TERR_0_CHAR = get("TERR_0_CHAR", "▁") # Cell at [0, 25)% max height
-TERR_1_CHAR = get("TERR_1_CHAR", "▃") # Cell at [25, 50)% max height
-TERR_2_CHAR = get("TERR_2_CHAR", "▅") # Cell at [50, 75)% max height
-TERR_3_CHAR = get("TERR_3_CHAR", "▇") # Cell at [75, 100%] max height
+
+def sbool(text):
+    """Parse a boolean the way distutils.util.strtobool did: y, yes, t, true, on, 1 or n, no, f, false, off, 0.
+    Raises ValueError for anything else.
+    """
+    text = text.lower()
+    if text in ("y", "yes", "t", "true", "on", "1"):
+        return True
+    if text in ("n", "no", "f", "false", "off", "0"):
+        return False
+    raise ValueError(f"invalid truth value {text!r}")
+
+
+class Config:
+    """Simulation parameters. Every parameter defaults to the environment variable of the same name."""
+    def __init__(self, **params):
+        """
+        params - Parameters to use instead of the defaults, e.g. Config(ALPHA=0.5, SEED=42).
+        """
+        # Important general config
+        self.MAX_T = float(get("MAX_T", 200)) # Maximum simulation time
+        self.SEED = int(get("SEED", 1234567890)) # Random seed
+        self.TERRAIN_SEED = int(get("TERRAIN_SEED", 0)) # Seed of the sugar capacity and level of the Cells, 0 for SEED; fixes the terrain while SEED varies the Agents
+        self.TERRAIN_CAPACITY = get("TERRAIN_CAPACITY", "") # File of the sugar capacity of every Cell (.npy, or raw values of TERRAIN_DTYPE), ROWS x COLUMNS; "" generates it
+        self.TERRAIN_LEVEL = get("TERRAIN_LEVEL", "") # File of the level of every Cell, as TERRAIN_CAPACITY; "" generates it
+        self.TERRAIN_DTYPE = get("TERRAIN_DTYPE", "<i4") # Value type of raw TERRAIN_CAPACITY and TERRAIN_LEVEL files, e.g. <i4, <f8, u1
+        self.RNG_BATCH = int(get("RNG_BATCH", 0)) # Random variates drawn ahead per stream and distribution, 0 draws one at a time; a batched run is reproducible but differs from an unbuffered one
+        self.ALPHA = float(get("ALPHA", .33)) # How many units of sugar regrow per timestep (1.0 unit of time)
+        self.ROWS = int(get("ROWS", 50)) # Landscape rows
+        self.COLUMNS = int(get("COLUMNS", 50)) # Landscape columns
+        self.AGENTS = int(get("AGENTS", 400)) # Initial agent population size
+        self.MAX_POSSIBLE_SUGAR = int(get("MAX_POSSIBLE_SUGAR", 5)) # Maximum possible sugar capacity per cell
+        self.MAX_HEIGHT = int(get("MAX_HEIGHT", 4)) # Maximum cell height
+        self.LAZY_SUGAR = sbool(get("LAZY_SUGAR", "True")) # Regrow only the cells below capacity instead of the whole landscape every event
+        self.CALENDAR = get("CALENDAR", "heap") # Event list backend: "heap" or "simulus", whose queue depth is not profiled
+        self.ENGINE = get("ENGINE", "events") # "events" runs every Agent action on the EventCalendar, "ticks" advances all Agents at once in fixed ticks (see ticks.py), "tiles" splits the ticks over worker processes (see tiles.py)
+        self.TICK = float(get("TICK", 0.2)) # Simulation time per tick of the "ticks" and "tiles" engines, shorter than the mean time between reproduction attempts to track the events engine
+        self.TILE_WORKERS = int(get("TILE_WORKERS", 0)) # Worker processes of the "tiles" engine, each owning 2 bands of rows of the Landscape; 0 for one per core
+        self.LOG = get("LOG", "stdout") # Where deaths, births, moves and warnings go: "null", "stdout", "ring", or a .ndjson/.csv file path
+        self.LOG_FLUSH = int(get("LOG_FLUSH", 1000)) # Records a log file buffers before writing them
+        self.LOG_RING = int(get("LOG_RING", 10000)) # Records the "ring" log keeps in memory
+        self.CHECKPOINT_EVERY = float(get("CHECKPOINT_EVERY", 0)) # Simulation time between automatic checkpoints, 0 for none
+        self.CHECKPOINT_PATH = get("CHECKPOINT_PATH", "sugarscape.ckpt") # File the automatic checkpoints are written to
+        self.RESUME = get("RESUME", "") # Checkpoint file to continue a run from (until MAX_T) instead of starting a new one
+        self.PROFILE = sbool(get("PROFILE", "False")) # Time every event type and the pre/post-event operations, printed at the end
+        self.PROFILE_TRACE = get("PROFILE_TRACE", "") # File to write the profile trace to (Chrome trace JSON), "" for none
+        self.TRACE = get("TRACE", "") # File to write a record of every executed event to, compare two with eventtrace.py; "" for none
+        self.PAUSE = sbool(get("PAUSE",  "False")) # Pause after every event
+        self.REPRODUCTION_LAMBDA = float(get("REPRODUCTION_LAMBDA", 0.175)) # Random expovariate lambda value when deciding reproduction event time
+        self.FERTILE_AGE = float(get("FERTILE_AGE", 1.6)) # Minimum time age mothering Agents can reproduce
+        self.GESTATION_MU = float(get("GESTATION_MU", 1)) # Mean gestation period length (normal distribution)
+        self.GESTATION_SIGMA = float(get("GESTATION_SIGMA", .5)) # Std Deviation of gestation period length distribution
+        self.MEAN_MAX_AGE = float(get("MEAN_MAX_AGE", 30)) # Mean maximum age, max age is randomly chosen from a gaussian distribution
+        self.SIGMA_MAX_AGE = float(get("SIGMA_MAX_AGE", 10)) # Maximum age gaussian distribution standard distribution
+        # Visual general config
+        self.SHOW_ANIMATION = sbool(get("SHOW_ANIMATION", "False")) # Show visual of every event -- slower simulation
+        self.ANIMATION = get("ANIMATION", "auto") # "ansi" redraws changed cells in place, "frames" prints every map in full, "auto" is ansi on a terminal
+        self.ANIMATION_FPS = float(get("ANIMATION_FPS", 0)) # Most ansi frames per second of wall time, 0 draws every event
+        self.SHOW_FINAL_COMPARISON = sbool(get("SHOW_FINAL_COMPARISON", "False")) # Show visual comparison of initial state vs final state
+        self.SHOW_SUGAR = sbool(get("SHOW_SUGAR", "False")) # Show sugar in visual
+        self.SHOW_TERRAIN = sbool(get("SHOW_TERRAIN", "False")) # Show cell heights in a separate visual
+        self.RECORD = get("RECORD", "") # File to record the Cells of every event to for replay with recording.py, "" for none
+        self.RECORD_KEYFRAME = int(get("RECORD_KEYFRAME", 500)) # Events between full keyframes of the recording
+        # Plot general config
+        self.SHOW_PLOTS = sbool(get("SHOW_PLOTS", "False")) # Show the plot of various statistics at the end
+        self.PLOTS = get("PLOTS", "wealth,population") # Comma-separated list of plots to show
+        self.METRICS = get("METRICS", "") # CSV file to stream the metrics time series to, "" for none (SHOW_PLOTS defaults it to metrics.csv)
+        self.METRICS_EVERY = float(get("METRICS_EVERY", 1.0)) # Simulation time between metrics samples
+        self.METRICS_CHUNK = int(get("METRICS_CHUNK", 100)) # Metrics samples buffered before they are written
+        self.WEALTH_BINS = get("WEALTH_BINS", "0,5,10,20,50,100") # Comma-separated sugar edges of the wealth histogram
+        # Specific visual chars config
+        self.AGENT_HEALTHY_CHAR = get("AGENT_HEALTHY_CHAR", "O") # Agent with sugar > metabolic rate
+        self.AGENT_CRITICAL_CHAR = get("AGENT_CRITICAL_CHAR", "o") # Agent with sugar <= metabolic rate
+        self.SUGAR_0_CHAR = get("SUGAR_0_CHAR", "․") # Sugar at (0, 25)% max height
+        self.SUGAR_1_CHAR = get("SUGAR_1_CHAR", "⁚") # Sugar at [25, 50)% max height
+        self.SUGAR_2_CHAR = get("SUGAR_2_CHAR", "⁝") # Sugar at [50, 75)% max height
+        self.SUGAR_3_CHAR = get("SUGAR_3_CHAR", "⁞") # Sugar at [75, 100]% max height
+        self.TERR_0_CHAR = get("TERR_0_CHAR", "▁") # Cell at [0, 25)% max height
+        self.TERR_1_CHAR = get("TERR_1_CHAR", "▃") # Cell at [25, 50)% max height
+        self.TERR_2_CHAR = get("TERR_2_CHAR", "▅") # Cell at [50, 75)% max height
+        self.TERR_3_CHAR = get("TERR_3_CHAR", "▇") # Cell at [75, 100%] max height
+        self.update(**params)
+
+    def update(self, **params):
+        """Set the given parameters. Raises AttributeError for unknown parameter names."""
+        for name, value in params.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"Unknown config parameter '{name}'")
+            setattr(self, name, value)
+
+    def copy(self, **params):
+        """Get a copy of this Config with the given parameters changed."""
+        copied = Config.__new__(Config)
+        copied.__dict__.update(self.__dict__)
+        copied.update(**params)
+        return copied
+
+    def as_dict(self):
+        """Get all parameters as a dict of name -> value."""
+        return dict(self.__dict__)
@@ -1,5 +1,7 @@
+from profiler import HOOK_PRE, HOOK_POST, STEP
+from sink import NullSink, END
+import heapq
 import math
-import simulus
 
 
 class Event:
@@ -7,6 +9,7 @@ class Event:
     DIE = "die"
     REPRODUCE = "reproduce"
     BIRTH = "birth"
+    __slots__ = ("time", "type", "agent", "callback")
 
     def __init__(self, time, type, agent, callback):
         self.time = time
@@ -15,9 +18,128 @@ class Event:
         self.callback = callback
 
 
-class EventCalendar:
+class ScheduledEvent:
+    """Handle of an event scheduled on a HeapSimulator."""
+    __slots__ = ("func", "time", "name", "active", "seq", "t_queued")
+
+    def __init__(self, func, time, name=None):
+        self.func = func
+        self.time = time # When the event will happen, can be later than its heap entry
+        self.name = name
+        self.active = True # Not yet happened or cancelled
+        self.seq = None # Sequence number of the event's heap entry, older entries are tombstones
+        self.t_queued = None # Time of the event's heap entry
+
+
+class HeapSimulator:
+    """Minimal binary heap event list, a drop-in for the parts of simulus.simulator EventCalendar uses.
+    Cancelling leaves a tombstone in the heap that is skipped when it reaches the top.
+    Rescheduling to a later time only updates the handle, the entry is moved when it reaches the top.
+    Rescheduling to an earlier time pushes a new entry and turns the old one into a tombstone.
+    Events at the same time happen in the order they were (re)queued.
+    """
     def __init__(self):
-        self.sim = simulus.simulator()
+        self.now = 0
+        self._heap = [] # (time, seq, ScheduledEvent)
+        self._seq = 0
+        self._stale = 0 # Tombstones in the heap
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+    def _push(self, e, time):
+        e.seq = self._seq
+        e.t_queued = time
+        heapq.heappush(self._heap, (time, self._seq, e))
+        self._seq += 1
+
+    def _settle(self):
+        """Drop tombstones and move postponed events until the top entry is the next event to happen."""
+        heap = self._heap
+        while heap:
+            time, seq, e = heap[0]
+            if not e.active or seq != e.seq:
+                heapq.heappop(heap)
+                self._stale -= 1
+            elif time < e.time:
+                heapq.heappop(heap)
+                self._push(e, e.time)
+            else:
+                return
+
+    def _compact(self):
+        """Rebuild the heap without tombstones once they make up most of it."""
+        if self._stale > 1024 and self._stale > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2].active and entry[1] == entry[2].seq]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def sched(self, func, until, name=None):
+        """Schedule func to be called at time until. Returns the ScheduledEvent."""
+        if until < self.now:
+            raise ValueError(f"sched(until={until}) earlier than now ({self.now})")
+        e = ScheduledEvent(func, until, name)
+        self._push(e, until)
+        return e
+
+    def resched(self, e, until):
+        """Reschedule e to time until. Returns e, None if e already happened or was cancelled."""
+        if not e.active:
+            return None
+        if until < self.now:
+            raise ValueError(f"resched(until={until}) earlier than now ({self.now})")
+        e.time = until
+        if until < e.t_queued:
+            self._stale += 1
+            self._push(e, until)
+            self._compact()
+        return e
+
+    def cancel(self, e):
+        """Cancel e. Does nothing if e already happened or was cancelled."""
+        if e.active:
+            e.active = False
+            self._stale += 1
+            self._compact()
+
+    def peek(self):
+        """Time of the next event, inf if there is none."""
+        self._settle()
+        return self._heap[0][0] if self._heap else math.inf
+
+    def step(self):
+        """Execute the next event, if there is one."""
+        self._settle()
+        if self._heap:
+            time, seq, e = heapq.heappop(self._heap)
+            e.active = False
+            self.now = time
+            e.func()
+
+
+def simulus_simulator():
+    """Make a simulus.simulator, importing simulus only when that backend is used."""
+    import simulus
+    return simulus.simulator()
+
+
+class EventCalendar:
+    BACKENDS = {
+        "heap": HeapSimulator,
+        "simulus": simulus_simulator
+    }
+
+    def __init__(self, backend="heap", log=None):
+        """
+        backend - Event list implementation, one of BACKENDS.
+        log - Sink told when the events run out, if None it is discarded.
+        """
+        if backend not in EventCalendar.BACKENDS:
+            raise ValueError(f"Unknown calendar backend '{backend}', choose from {list(EventCalendar.BACKENDS.keys())}")
+        self.sim = EventCalendar.BACKENDS[backend]()
+        self.log = log if log != None else NullSink()
+        self.profiler = None # Profiler, if any
+        self.tracer = None # eventtrace.TraceWriter, if any
         self.pre = None # Pre-event function
         self.pre_args = None
         self.post = None # Post-event function
@@ -47,24 +169,74 @@ class EventCalendar:
         self.post = callback
         self.post_args = args
 
+    def set_profiler(self, profiler):
+        """Time every event by type, the pre/post-event operations and the queue depth with profiler.
+        Only events added afterwards are timed by type. None switches profiling off.
+        """
+        self.profiler = profiler
+        if profiler != None:
+            profiler.now = self.now
+
+    def set_tracer(self, tracer):
+        """Record every event with tracer, an eventtrace.TraceWriter. Only events added afterwards are recorded.
+        None switches tracing off.
+        """
+        self.tracer = tracer
+        if tracer != None:
+            tracer.now = self.now
+
+    def depth(self):
+        """Get the number of pending events, None with the simulus backend, which has no public way to count them.
+        Profiles of simulus runs have no queue depth.
+        """
+        if isinstance(self.sim, HeapSimulator):
+            return len(self.sim)
+        return None
+
+    def wrap(self, event):
+        """Get the callback of event as it is scheduled, traced and timed if tracing or profiling."""
+        callback = event.callback
+        if self.tracer != None:
+            callback = self.tracer.wrap(event, callback)
+        if self.profiler != None:
+            callback = self.profiler.wrap(event.type, callback)
+        return callback
+
     def add(self, event):
-        return self.sim.sched(event.callback, until=event.time, name=event.type)
+        return self.sim.sched(self.wrap(event), until=event.time, name=event.type)
 
     def run(self, until):
         """Run the simulation until given time."""
+        if self.profiler != None:
+            self._run_profiled(until)
+            return
         while self.sim.now <= until:
             self.pre(*self.pre_args)
             self.sim.step()
             self.post(*self.post_args)
             if self.sim.peek() == math.inf:
-                print("No more events to execute. Simulation completed before max time.")
+                self.log.log(END, self.now(), message="No more events to execute. Simulation completed before max time.")
+                break
+
+    def _run_profiled(self, until):
+        """run() with every step and pre/post-event operation timed."""
+        profiler = self.profiler
+        while self.sim.now <= until:
+            profiler.call(HOOK_PRE, self.pre, *self.pre_args)
+            depth = self.depth()
+            if depth != None:
+                profiler.sample_depth(self.now(), depth)
+            profiler.call(STEP, self.sim.step)
+            profiler.call(HOOK_POST, self.post, *self.post_args)
+            if self.sim.peek() == math.inf:
+                self.log.log(END, self.now(), message="No more events to execute. Simulation completed before max time.")
                 break
 
     def resched(self, e, newTime):
         """Reschedule event to newTime.
-        e - The return value from add() (More specifically the return value of simulus.simulator.sched()).
+        e - The return value from add() (More specifically the return value of the backend's sched()).
         newTime - The new time to reschedule, should be >= now().
-        Returns rescheduled event (from simulus.simulator.resched()), None if could not reschedule.
+        Returns rescheduled event (from the backend's resched()), None if could not reschedule.
         """
         return self.sim.resched(e, until=newTime)
 
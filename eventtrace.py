@@ -0,0 +1,150 @@
+# Binary trace of every executed event, for finding where two runs diverge
+# Usage: python eventtrace.py diff <a.trace> <b.trace> [--context N]
+#        python eventtrace.py show <trace> [--start I] [--count N]
+# A trace is a fixed-size header followed by one fixed-width record per event, so it can be memory-mapped
+# (see open_records()) and two traces can be compared chunk by chunk without loading either.
+from event import Event
+import argparse
+import numpy as np
+import os
+import struct
+import sys
+
+MAGIC = b"SUGARSCAPE-TRACE"
+VERSION = 1
+HEADER = struct.Struct("<16sHHQ") # Magic, version, record size, seed
+HEADER_SIZE = 64
+TYPES = [Event.MOVE, Event.DIE, Event.REPRODUCE, Event.BIRTH]
+RECORD = np.dtype([
+    ("t", "<f8"), ("type", "u1"), ("agent", "<i8"),
+    ("x0", "<i4"), ("y0", "<i4"), ("x1", "<i4"), ("y1", "<i4"), ("sugar", "<f8")
+]) # Position before and after the event, the Agent's sugar after it
+NO_AGENT = -1
+
+
+class TraceWriter:
+    """Appends a record for every event it wraps to a trace file, writing in batches."""
+    def __init__(self, path, seed=0, batch=4096):
+        """
+        path - File to write.
+        seed - Seed of the traced run, kept in the header.
+        batch - Records buffered before they are written.
+        """
+        self.file = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, RECORD.itemsize, seed % 2 ** 64)
+        self.file.write(header + bytes(HEADER_SIZE - len(header)))
+        self.buffer = np.zeros(batch, dtype=RECORD)
+        self.count = 0 # Records in buffer
+        self.now = lambda: 0 # Simulation clock, set by EventCalendar.set_tracer()
+
+    def wrap(self, event, callback):
+        """Get callback recording event when it is called."""
+        code = TYPES.index(event.type)
+        agent = event.agent
+        def traced():
+            if agent != None:
+                x0, y0 = agent.col, agent.row
+            callback()
+            if agent != None:
+                self.record(code, agent.id, x0, y0, agent.col, agent.row, agent.sugar)
+            else:
+                self.record(code, NO_AGENT, 0, 0, 0, 0, 0)
+        return traced
+
+    def record(self, code, id, x0, y0, x1, y1, sugar):
+        self.buffer[self.count] = (self.now(), code, id, x0, y0, x1, y1, sugar)
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.file != None:
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.file.flush()
+        self.count = 0
+
+    def detach(self):
+        """Stop writing without closing the file, e.g. in a forked branch that shares it with its parent."""
+        self.file = None
+        self.count = 0
+
+    def close(self):
+        if self.file != None and not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_header(path):
+    """Get the seed of a trace. Raises ValueError if path is not a trace of this version."""
+    with open(path, "rb") as f:
+        magic, version, size, seed = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a sugarscape trace")
+    if version != VERSION or size != RECORD.itemsize:
+        raise ValueError(f"{path} is trace version {version} with {size} byte records, expected {VERSION} with {RECORD.itemsize}")
+    return seed
+
+
+def open_records(path):
+    """Memory-map the records of a trace as a read-only RECORD array.
+    A partly written last record, e.g. of a run that crashed, is left out.
+    """
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD) # Empty files cannot be mapped
+    return np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def diff(pathA, pathB, chunk=1 << 16):
+    """Walk two traces in lockstep, one chunk at a time.
+    Returns index of the first event that differs, None if the traces are identical.
+    When one trace is a prefix of the other, that is the index of the first extra event.
+    """
+    a, b = open_records(pathA), open_records(pathB)
+    common = min(len(a), len(b))
+    for start in range(0, common, chunk):
+        end = min(start + chunk, common)
+        # Compare the bytes, so nan == nan and -0.0 != 0.0 like the runs themselves would
+        same = (a[start:end].view(np.uint8).reshape(end - start, -1) == b[start:end].view(np.uint8).reshape(end - start, -1)).all(axis=1)
+        if not same.all():
+            return start + int(np.argmin(same))
+    return None if len(a) == len(b) else common
+
+
+def str_record(i, record):
+    """Get a readable line of a trace record."""
+    return (f"#{i} t = {float(record['t'])!r} {TYPES[record['type']]:>9} agent {record['agent']} "
+        f"({record['x0']}, {record['y0']}) -> ({record['x1']}, {record['y1']}) sugar = {float(record['sugar'])!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and compare sugarscape event traces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diffParser = commands.add_parser("diff", help="Report the first event where two traces diverge")
+    diffParser.add_argument("a")
+    diffParser.add_argument("b")
+    diffParser.add_argument("--context", type=int, default=3, help="Events shown before the divergence")
+    showParser = commands.add_parser("show", help="Print trace records")
+    showParser.add_argument("trace")
+    showParser.add_argument("--start", type=int, default=0)
+    showParser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        records = open_records(args.trace)
+        print(f"{len(records)} events, seed {read_header(args.trace)}")
+        for i in range(args.start, min(args.start + args.count, len(records))):
+            print(str_record(i, records[i]))
+    else:
+        first = diff(args.a, args.b)
+        if first == None:
+            print("Traces are identical")
+            sys.exit(0)
+        a, b = open_records(args.a), open_records(args.b)
+        print(f"Traces diverge at event #{first}")
+        for i in range(max(first - args.context, 0), first):
+            print(f"  {str_record(i, a[i])}")
+        for name, records in [(args.a, a), (args.b, b)]:
+            print(f"{name}: " + (str_record(first, records[first]) if first < len(records) else "(ended)"))
+        sys.exit(1)
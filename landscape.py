@@ -1,40 +1,95 @@
 from agent import Agent
-from config import MAX_HEIGHT, MAX_POSSIBLE_SUGAR, ALPHA
+from sink import NullSink, WARNING
+from terrain import Terrain, reserve
+import numpy as np
+
+EMPTY = -1 # Occupant id of a Cell without an Agent
+DENSE = 0.2 # Share of Cells below capacity above which lazy regrowth updates the whole Landscape like eager mode
+PRUNE = 32 # Whole Landscape updates between dropping the Cells back at capacity from the regrowing ones
 
 
 class Cell:
-    """The bones of the Landscape: every coordinate is an individual Cell."""
-    def __init__(self, x, y, rng):
+    """The bones of the Landscape: a view of an individual coordinate.
+    Reading and writing attributes goes straight through to the Landscape arrays.
+    """
+    __slots__ = ("landscape", "x", "y")
+
+    def __init__(self, landscape, x, y):
+        self.landscape = landscape
         self.x = x
         self.y = y
-        self.capacity = rng.get("cell").integers(0, MAX_POSSIBLE_SUGAR + 1)
-        self.sugar = self.capacity
-        self.level = rng.get("cell").integers(1, MAX_HEIGHT + 1) # Synonymous with height
-        self.agent = None
 
-    def update_sugar(self, tLast, tNow):
-        """Update the sugar count. tLast is the last time the count was updated, tNow is current time."""
-        self.sugar = self.compute_sugar(tLast, tNow)
+    @property
+    def sugar(self):
+        return self.landscape.get_sugar(self.x, self.y)
+
+    @sugar.setter
+    def sugar(self, value):
+        self.landscape.set_sugar(self.x, self.y, value)
+
+    @property
+    def capacity(self):
+        return self.landscape.capacity[self.y, self.x]
+
+    @property
+    def level(self):
+        """Synonymous with height."""
+        return self.landscape.level[self.y, self.x]
 
-    def compute_sugar(self, tNow, tFuture):
-        """Compute the amount of sugar the cell is expected to have by tFuture."""
-        diff = tFuture - tNow
-        computed = diff * ALPHA
-        total = self.sugar + computed
-        if total > self.capacity:
-            return self.capacity
-        return total
+    @property
+    def agent(self):
+        return self.landscape.get_agent(self.x, self.y)
 
 
 class Landscape:
-    """The world that hosts Cells that hold Agents and sugar."""
-    def __init__(self, rows, cols, rng):
+    """The world that hosts Cells that hold Agents and sugar.
+    Every Cell attribute is stored in a rows x cols array, indexed [y, x].
+    """
+    def __init__(self, rows, cols, rng, config, log=None, terrain=None):
+        """
+        rows - Number of rows.
+        cols - Number of columns.
+        rng - RNG.
+        config - Config. With LAZY_SUGAR update_sugar() only regrows the Cells below capacity instead of all of them.
+            With TERRAIN_SEED the capacity and level are generated from that seed instead of rng, and
+            TERRAIN_CAPACITY and TERRAIN_LEVEL memory-map them from files instead.
+        log - Sink that receives warnings and the Agents' records, if None they are discarded.
+        terrain - Terrain whose capacity and level arrays to use as they are, e.g. a SharedTerrain, instead of
+            generating them. They are only read.
+        """
         self.rows = rows
         self.cols = cols
         self.rng = rng
-        self.landscape = [[Cell(x, y, rng) for x in range(self.cols)] for y in range(self.rows)]
+        self.config = config
+        self.log = log if log != None else NullSink()
+        self.lazy = config.LAZY_SUGAR
         self.t_lastSugarUpdate = 0
 
+        shape = (rows, cols)
+        if terrain != None and terrain.shape != shape:
+            raise ValueError(f"Terrain of shape {terrain.shape} does not fit a {rows} x {cols} Landscape")
+        if terrain == None and not (config.TERRAIN_SEED or config.TERRAIN_CAPACITY or config.TERRAIN_LEVEL):
+            terrain = Terrain.generate(rows, cols, config, rng=rng)
+        else:
+            # Made elsewhere, the streams made from now on stay those of a run that generates its own
+            terrain = terrain if terrain != None else Terrain.from_config(rows, cols, config)
+            reserve(rng)
+        self.capacity = terrain.capacity
+        self.level = terrain.level
+        self.sugar = self.capacity.astype(np.float64)
+        # Lazy regrowth: flat indexes of the Cells below capacity, whether each Cell is one of them or of those
+        # set below capacity since the last update_sugar()
+        self.growing = np.zeros(0, dtype=np.int64)
+        self.isGrowing = np.zeros(rows * cols, dtype=bool)
+        self.harvested = []
+        self.denseUpdates = 0
+        self.occupant = np.full(shape, EMPTY, dtype=np.int64) # Id of the Agent in each Cell, doubles as occupancy bitmap
+        self.agents = dict() # Agent id -> Agent on the landscape
+        # Occupancy index, to find occupied Cells without visiting empty ones
+        self.rowOccupied = [set() for y in range(rows)] # x of every occupied Cell in each row
+        self.colOccupied = [set() for x in range(cols)] # y of every occupied Cell in each column
+        self.watchers = [] # Sets collecting the (x, y) of changed Cells, one per watcher, see watch()
+
     def convert_coords(self, x, y):
         """Convert the given coordinates to list-usable indexes."""
         return x % self.cols, y % self.rows
@@ -46,22 +101,102 @@ class Landscape:
         if isinstance(obj, Agent) and self.is_empty(x, y):
             obj.col = x
             obj.row = y
-            self.get_cell(x, y).agent = obj
+            x, y = self.convert_coords(x, y)
+            self._occupy(x, y, obj.id)
+            self.agents[obj.id] = obj
             return True
-        else:
-            print(f"WARNING: Could not put given {obj} at {x, y}!")
+        elif self.log.enabled:
+            self.log.log(WARNING, self.t_lastSugarUpdate, x=x, y=y, message=f"Could not put given {obj} at {x, y}!")
         return False
 
     def remove(self, x, y):
         """Remove the agent at (x, y) from the landscape. Does nothing when no agent is present."""
         if not self.is_empty(x, y):
-            self.get_cell(x, y).agent = None
+            x, y = self.convert_coords(x, y)
+            del self.agents[self.occupant[y, x]]
+            self._vacate(x, y)
+        elif self.log.enabled:
+            self.log.log(WARNING, self.t_lastSugarUpdate, x=x, y=y, message=f"Tried to remove nonexistent Agent at {x, y}")
+
+    def _occupy(self, x, y, id):
+        """Mark the Cell at list indexes (x, y) occupied by Agent id."""
+        self.occupant[y, x] = id
+        self.rowOccupied[y].add(x)
+        self.colOccupied[x].add(y)
+        if self.watchers:
+            self.touch(x, y)
+
+    def _vacate(self, x, y):
+        """Mark the Cell at list indexes (x, y) empty."""
+        self.occupant[y, x] = EMPTY
+        self.rowOccupied[y].discard(x)
+        self.colOccupied[x].discard(y)
+        if self.watchers:
+            self.touch(x, y)
+
+    def occupied_along(self, x, y, dx, dy, reach):
+        """Get the occupied Cells along the ray from (x, y) in cardinal direction (dx, dy), up to reach steps away.
+        Only the occupied Cells of the row/column are visited when there are fewer of them than steps.
+        Returns dict of step (1 to reach) -> (x, y) list indexes of the occupied Cell.
+        """
+        x, y = self.convert_coords(x, y)
+        if dy == 0:
+            line, start, size, step = self.rowOccupied[y], x, self.cols, dx
+        else:
+            line, start, size, step = self.colOccupied[x], y, self.rows, dy
+        found = dict()
+        if len(line) < reach and reach < size:
+            for other in line:
+                k = ((other - start) * step) % size
+                if 0 < k <= reach:
+                    found[k] = other
         else:
-            print(f"WARNING: Tried to remove nonexistent Agent at {x, y}")
+            for k in range(1, reach + 1):
+                other = (start + k * step) % size
+                if other in line:
+                    found[k] = other
+        if dy == 0:
+            return {k: (other, y) for k, other in found.items()}
+        return {k: (x, other) for k, other in found.items()}
+
+    def empty_moore(self, x, y, yOrder, xOrder):
+        """Get the empty Cells of the Moore neighborhood of (x, y).
+        yOrder, xOrder - Order of the rows and columns to visit, permutations of [0, 1, 2] for -1, 0, +1.
+        Returns list of (x, y) list indexes in visiting order.
+        """
+        empty = []
+        for j in yOrder:
+            checkY = (y - 1 + j) % self.rows
+            occupied = self.rowOccupied[checkY]
+            for i in xOrder:
+                checkX = (x - 1 + i) % self.cols
+                if checkX not in occupied:
+                    empty.append((checkX, checkY))
+        return empty
+
+    def watch(self):
+        """Start collecting the Cells that change: Agents arriving or leaving, sugar being set, Agents' sugar changing.
+        Returns the set the list indexes (x, y) of changed Cells are added to, the watcher empties it as it likes.
+        """
+        touched = set()
+        self.watchers.append(touched)
+        return touched
+
+    def touch(self, x, y):
+        """Mark the Cell at list indexes (x, y) changed for every watcher."""
+        for touched in self.watchers:
+            touched.add((x, y))
 
     def is_empty(self, x, y):
         """Check if Cell at (x, y) does not have agent."""
-        return self.get_cell(x, y).agent == None
+        return self.occupant[y % self.rows, x % self.cols] == EMPTY
+
+    def empty(self, cells):
+        """Check which of the given Cells do not have an agent.
+        cells - Array of flat Cell indexes, y * cols + x.
+        Returns bool array.
+        """
+        return self.occupant.ravel().take(cells) == EMPTY
 
     def next_open(self):
         """Return next random open coordinate.
@@ -77,27 +212,88 @@ class Landscape:
             if self.is_empty(x, y):
                 break
         return (x, y) if tries <= maxTries else (None, None)
-    
+
     def get_cell(self, x, y):
         """Get the cell at (x, y).
         Since the landscape is a torus, coordinate values "wrap" around. Similar to pacman.
         """
-        return self.landscape[y % self.rows][x % self.cols]
+        return Cell(self, x % self.cols, y % self.rows)
+
+    def get_agent(self, x, y):
+        """Get the Agent at (x, y), None if there is none."""
+        id = self.occupant[y % self.rows, x % self.cols]
+        return None if id == EMPTY else self.agents[id]
+
+    def get_sugar(self, x, y):
+        """Get the current sugar at (x, y)."""
+        x, y = self.convert_coords(x, y)
+        return self.sugar[y, x]
+
+    def get_sugars(self, cells):
+        """Get the current sugar of the given Cells as an array.
+        cells - Array of flat Cell indexes, y * cols + x.
+        """
+        return self.sugar.ravel().take(cells)
+
+    def set_sugar(self, x, y, value):
+        """Set the sugar at (x, y)."""
+        x, y = self.convert_coords(x, y)
+        self.sugar[y, x] = value
+        if self.lazy and value != self.capacity[y, x] and not self.isGrowing[y * self.cols + x]:
+            self.isGrowing[y * self.cols + x] = True
+            self.harvested.append(y * self.cols + x)
+        if self.watchers:
+            self.touch(x, y)
 
     def move(self, x0, y0, x1, y1):
         """Move Agent at (x0, y0) to (x1, y1)."""
-        oldCell = self.get_cell(x0, y0)
-        if oldCell.agent == None:
-            print(f"WARNING: Tried to move nonexistent Agent at {x0, y0}") # TODO Handle this better?
+        agent = self.get_agent(x0, y0)
+        if agent == None:
+            if self.log.enabled: # TODO Handle this better?
+                self.log.log(WARNING, self.t_lastSugarUpdate, x=x0, y=y0, message=f"Tried to move nonexistent Agent at {x0, y0}")
             return
-        self.put(oldCell.agent, x1, y1)
-        self.remove(x0, y0)
+        if self.put(agent, x1, y1):
+            x0, y0 = self.convert_coords(x0, y0)
+            self._vacate(x0, y0)
+
+    def track_growing(self):
+        """Find the Cells below capacity again, after the sugar array was changed other than through set_sugar()."""
+        self.isGrowing = (self.sugar != self.capacity).ravel()
+        self.growing = np.flatnonzero(self.isGrowing)
+        self.harvested = []
+        self.denseUpdates = 0
 
     def update_sugar(self, t):
-        """Update all the sugar. t is the current time."""
-        for y in range(self.rows):
-            for x in range(self.cols):
-                cell = self.get_cell(x, y)
-                if cell.capacity > 0:
-                    cell.update_sugar(self.t_lastSugarUpdate, t)
+        """Update all the sugar. t is the current time.
+        In lazy mode only the Cells below capacity are regrown: a Cell at capacity stays there bit-for-bit, so the
+        result is exactly that of eager mode, which regrows every Cell. Lazy mode costs the Cells harvested within
+        the last capacity / ALPHA rather than the whole Landscape per event, and with more than DENSE of the Cells
+        regrowing it updates them all as eager mode does. Per event it is within noise of eager mode up to 100x100,
+        where the rest of an event costs more, 1.5x faster at 200x200 and 10x at 500x500 (benchmark.py sugar_regrowth).
+        """
+        dt = (t - self.t_lastSugarUpdate) * self.config.ALPHA
         self.t_lastSugarUpdate = t
+        if not self.lazy:
+            np.minimum(self.sugar + dt, self.capacity, out=self.sugar)
+            return
+        if self.harvested:
+            self.growing = np.concatenate((self.growing, np.array(self.harvested, dtype=np.int64)))
+            self.harvested = []
+        if len(self.growing) == 0:
+            return
+        if len(self.growing) > DENSE * self.sugar.size:
+            # Picking out this many Cells costs more than updating them all, Cells at capacity stay there
+            np.minimum(self.sugar + dt, self.capacity, out=self.sugar)
+            self.denseUpdates += 1
+            if self.denseUpdates % PRUNE:
+                return
+            capacity = self.capacity.ravel().take(self.growing)
+            regrown = self.sugar.ravel().take(self.growing)
+        else:
+            capacity = self.capacity.ravel().take(self.growing)
+            regrown = np.minimum(self.sugar.ravel().take(self.growing) + dt, capacity)
+            self.sugar.ravel()[self.growing] = regrown
+        full = regrown == capacity
+        if full.any():
+            self.isGrowing[self.growing[full]] = False
+            self.growing = self.growing[~full]
@@ -0,0 +1,122 @@
+# Time series of population and wealth metrics, sampled during a run and streamed to CSV
+# Only the rows not yet written are kept in memory.
+# The plots are rendered from the CSV file after the run, see plot().
+from agent import AgentList
+import csv
+import math
+import numpy as np
+
+STATS = {"sugar": AgentList.SUGAR, "metabolism": AgentList.METABOLISM, "vision": AgentList.VISION}
+PLOTS = {
+    "population": ["population"],
+    "wealth": ["mean_sugar", "median_sugar"],
+    "gini": ["gini"],
+    "metabolism": ["mean_metabolism", "median_metabolism"],
+    "vision": ["mean_vision", "median_vision"]
+} # Plot name -> CSV columns it shows; "wealth" also shows the wealth histogram over time
+
+
+def gini(ordered):
+    """Gini coefficient of the given ascending values, None if they do not sum to a positive amount."""
+    n = len(ordered)
+    values = np.asarray(ordered, dtype=np.float64)
+    total = values.sum()
+    if n == 0 or total <= 0:
+        return None
+    ranks = np.arange(1, n + 1)
+    return float(2 * np.dot(ranks, values) / (n * total) - (n + 1) / n)
+
+
+def bin_label(low, high):
+    return f"wealth_{low:g}_{high:g}"
+
+
+class MetricsCollector:
+    """Samples an AgentList every so much simulation time and appends the samples to a CSV file in chunks."""
+    def __init__(self, agentList, path, every=1.0, bins=(0, 5, 10, 20, 50, 100), chunkSize=100, append=False):
+        """
+        agentList - AgentList to sample.
+        path - CSV file to write.
+        every - Simulation time between samples.
+        bins - Edges of the wealth histogram bins, sugar below the first and above the last edge get their own bins.
+        chunkSize - Samples buffered before they are written.
+        append - Add to the end of an existing file instead of overwriting it, e.g. when resuming a run.
+        """
+        self.agentList = agentList
+        self.every = every
+        self.edges = np.array(bins, dtype=np.float64)
+        self.chunkSize = chunkSize
+        self.t_nextSample = -math.inf
+        self.buffer = []
+        edges = [-math.inf] + list(bins) + [math.inf]
+        self.columns = ["t", "population"] + [f"{kind}_{name}" for name in STATS for kind in ("mean", "median")] + \
+            ["gini"] + [bin_label(low, high) for low, high in zip(edges[:-1], edges[1:])]
+        self.file = open(path, "a" if append else "w", newline="")
+        self.writer = csv.DictWriter(self.file, self.columns)
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def due(self, t):
+        """Whether a sample is due at time t."""
+        return t >= self.t_nextSample
+
+    def sample(self, t):
+        """Take a sample at time t and schedule the next one."""
+        agentList = self.agentList
+        row = {"t": t, "population": len(agentList.agentList)}
+        for name, stat in STATS.items():
+            row[f"mean_{name}"] = float(agentList.average(stat))
+            median = agentList.median(stat)
+            row[f"median_{name}"] = float(median) if median != None else None
+        wealth = agentList.statistics[AgentList.SUGAR].ordered
+        row["gini"] = gini(wealth)
+        # Sorted values, so every bin is a difference of two insertion points
+        cuts = np.searchsorted(wealth, self.edges, side="left") if wealth else np.zeros(len(self.edges), dtype=int)
+        counts = np.diff(np.concatenate(([0], cuts, [len(wealth)])))
+        for column, count in zip(self.columns[-len(counts):], counts):
+            row[column] = int(count)
+
+        self.buffer.append(row)
+        if len(self.buffer) >= self.chunkSize:
+            self.flush()
+        self.t_nextSample = self.every * (math.floor(t / self.every) + 1)
+
+    def flush(self):
+        self.writer.writerows(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read(path):
+    """Read a metrics CSV as a dict of column -> numpy array, empty cells as nan."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    columns = rows[0].keys() if rows else []
+    return {column: np.array([float(row[column]) if row[column] != "" else math.nan for row in rows]) for column in columns}
+
+
+def plot(path, plots=("wealth", "population")):
+    """Render the given plots of a metrics CSV with plotly, one figure each.
+    plots - Names from PLOTS.
+    """
+    import plotly.graph_objects as go # Only needed when plotting
+    data = read(path)
+    for name in plots:
+        if name not in PLOTS:
+            print(f"Unknown plot '{name}'; choose from {list(PLOTS.keys())}")
+            continue
+        figure = go.Figure()
+        for column in PLOTS[name]:
+            figure.add_trace(go.Scatter(x=data["t"], y=data[column], mode="lines", name=column))
+        figure.update_layout(title=name, xaxis_title="t")
+        figure.show()
+        if name == "wealth":
+            bins = [column for column in data if column.startswith("wealth_")]
+            histogram = go.Figure(go.Heatmap(x=data["t"], y=bins, z=np.array([data[column] for column in bins])))
+            histogram.update_layout(title="wealth histogram", xaxis_title="t", yaxis_title="sugar")
+            histogram.show()
@@ -0,0 +1,134 @@
+# Opt-in instrumentation of EventCalendar.run
+# Times every event by type and the pre/post-event hooks, and samples the event queue depth.
+# An EventCalendar without a Profiler runs its plain loop, so switched off it costs nothing per event.
+from array import array
+import json
+import time
+
+HOOK_PRE = "pre-event"
+HOOK_POST = "post-event"
+STEP = "step" # A whole backend step: event list bookkeeping plus the event itself
+BINS = 24 # Latency histogram bins: [0, 1) us, then [2^(i-1), 2^i) us, the last one open-ended
+
+
+class Timing:
+    """Count, cumulative time and latency histogram of one kind of call."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0 # Seconds
+        self.histogram = [0] * BINS
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.histogram[min(int(seconds * 1e6).bit_length(), BINS - 1)] += 1
+
+    def quantile(self, q):
+        """Upper bound in microseconds of the histogram bin holding the q-th quantile, None if empty."""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target:
+                return float(2 ** i)
+        return float(2 ** (BINS - 1))
+
+
+class Profiler:
+    """Collects timings of an EventCalendar run. Attach it with EventCalendar.set_profiler()."""
+    def __init__(self, trace=False, depthEvery=1):
+        """
+        trace - Also keep every timed call in order, for write_trace().
+        depthEvery - Sample the event queue depth every this many events.
+        """
+        self.timings = dict() # Name -> Timing
+        self.trace = [] if trace else None # (name, start, seconds, simulation time)
+        self.depthEvery = depthEvery
+        self.depthTimes = array("d") # Simulation time of every queue depth sample
+        self.depths = array("q")
+        self.events = 0
+        self.origin = time.perf_counter()
+        self.now = lambda: 0 # Simulation clock, set by EventCalendar.set_profiler()
+
+    def record(self, name, start, seconds):
+        timing = self.timings.get(name)
+        if timing == None:
+            timing = self.timings[name] = Timing()
+        timing.record(seconds)
+        if self.trace != None:
+            self.trace.append((name, start, seconds, self.now()))
+
+    def call(self, name, func, *args):
+        """Call func(*args) and record its time under name."""
+        start = time.perf_counter()
+        func(*args)
+        self.record(name, start, time.perf_counter() - start)
+
+    def wrap(self, name, func):
+        """Get func timed under name, e.g. an event callback timed under its event type."""
+        def timed():
+            self.call(name, func)
+        return timed
+
+    def sample_depth(self, t, depth):
+        self.events += 1
+        if self.events % self.depthEvery == 0:
+            self.depthTimes.append(t)
+            self.depths.append(depth)
+
+    def as_dict(self):
+        """Get the collected data as plain values."""
+        return {
+            "timings": {name: {"count": timing.count, "total_s": timing.total, "histogram_us_log2": timing.histogram}
+                for name, timing in self.timings.items()},
+            "queue_depth": {"t": list(self.depthTimes), "depth": list(self.depths)}
+        }
+
+    def summary(self):
+        """Get a table of every timed kind of call, slowest total first. The step, pre-event and post-event shares
+        are of the whole run; every event type runs inside a step, so its share is of the steps' time and is
+        listed under step.
+        """
+        lines = [f"{'name':<14} {'count':>8} {'total s':>9} {'share':>6} {'mean us':>9} {'p50 us':>7} {'p99 us':>7}"]
+        steps = self.timings.get(STEP)
+        outer = [name for name in (STEP, HOOK_PRE, HOOK_POST) if name in self.timings]
+        whole = sum(self.timings[name].total for name in outer) or 1
+        nested = sorted((name for name in self.timings if name not in outer), key=lambda name: -self.timings[name].total)
+        for name in sorted(outer, key=lambda name: -self.timings[name].total):
+            lines.append(self._row(name, whole))
+            if name == STEP:
+                lines.extend(self._row(event, steps.total or 1, indent="  ") for event in nested)
+        if steps == None:
+            lines.extend(self._row(event, whole) for event in nested)
+        if self.depths:
+            lines.append(f"Queue depth: mean {sum(self.depths) / len(self.depths):.1f}, max {max(self.depths)}"
+                f" over {len(self.depths)} samples")
+        if steps != None and steps.total > 0:
+            lines.append(f"Events/s (stepping only): {steps.count / steps.total:.0f}")
+        return "\n".join(lines)
+
+    def _row(self, name, whole, indent=""):
+        """Get the summary() line of name, its share of whole seconds."""
+        timing = self.timings[name]
+        return (f"{indent + name:<14} {timing.count:>8} {timing.total:>9.3f} {100 * timing.total / whole:>5.1f}% "
+            f"{1e6 * timing.total / max(timing.count, 1):>9.1f} {timing.quantile(.5):>7.0f} {timing.quantile(.99):>7.0f}")
+
+    def write_trace(self, path):
+        """Write the trace as Chrome trace event JSON (chrome://tracing, Perfetto), with the queue depth as a counter.
+        Raises ValueError if the Profiler was made without trace.
+        """
+        if self.trace == None:
+            raise ValueError("Profiler was created without trace=True")
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": 0, "ts": 1e6 * (start - self.origin), "dur": 1e6 * seconds,
+            "args": {"t": t}} for name, start, seconds, t in self.trace]
+        # The depth counter is placed on the wall clock of the matching step
+        stepStarts = [start for name, start, seconds, t in self.trace if name == STEP]
+        for i, (t, depth) in enumerate(zip(self.depthTimes, self.depths)):
+            step = (i + 1) * self.depthEvery - 1
+            if step < len(stepStarts):
+                events.append({"name": "queue depth", "ph": "C", "pid": 0, "ts": 1e6 * (stepStarts[step] - self.origin),
+                    "args": {"depth": depth}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,260 @@
+# Recording of a run's Cells and offline replay
+# Usage: python recording.py <recording> [--at T] [--compare T0 T1] [--play T0 T1 --every DT] [--sugar]
+# Without --at, --compare or --play, opens a prompt to scrub through the recording.
+#
+# A recording is a header, then zlib-compressed blocks that each start with a keyframe of every Cell followed by
+# the deltas of the Cells each event changed, then an index of the blocks so any time can be reached by
+# decompressing a single block.
+from config import Config
+from visual import str_map, compare_maps
+import argparse
+import bisect
+import json
+import numpy as np
+import struct
+import zlib
+
+MAGIC = b"SUGARSCAPE-RECORDING"
+VERSION = 1
+KEYFRAME = b"K"
+DELTA = b"D"
+FOOTER = struct.Struct("<QQ") # Offset of the index, number of blocks
+INDEX = np.dtype([("t", "<f8"), ("offset", "<u8"), ("size", "<u8")])
+CELLS = np.dtype([("occupant", "<i4"), ("agentSugar", "<f8"), ("metab", "<f8"), ("sugar", "<f8")]) # State of a Cell
+EMPTY = -1
+
+
+class Recorder:
+    """Writes the state of a Landscape's Cells after every event, as deltas between periodic keyframes."""
+    def __init__(self, landscape, path, keyframeEvery=500, level=6):
+        """
+        landscape - Landscape to record, its changed Cells are tracked from now on.
+        path - File to write.
+        keyframeEvery - Events between keyframes, a longer interval is smaller but slower to seek in.
+        level - zlib compression level.
+        """
+        self.landscape = landscape
+        self.keyframeEvery = keyframeEvery
+        self.level = level
+        self.touched = landscape.watch()
+        self.bare = set() # Empty Cells recorded without sugar that can still regrow, (x, y)
+        self.file = open(path, "wb")
+        self.index = []
+        self.block = [] # Uncompressed records of the current block
+        self.events = 0
+        header = json.dumps({
+            "rows": landscape.rows, "cols": landscape.cols, "alpha": landscape.config.ALPHA,
+            "config": landscape.config.as_dict()
+        }).encode()
+        self.file.write(MAGIC + struct.pack("<HI", VERSION, len(header)) + header)
+        self.file.write(landscape.capacity.astype("<i4").tobytes() + landscape.level.astype("<i4").tobytes())
+
+    def cells(self, flat):
+        """Get the states of the given Cells, as a CELLS array.
+        flat - Array of flat Cell indexes, y * cols + x.
+        """
+        land = self.landscape
+        states = np.zeros(len(flat), dtype=CELLS)
+        states["occupant"] = land.occupant.ravel().take(flat)
+        states["sugar"] = land.get_sugars(flat)
+        for i in np.flatnonzero(states["occupant"] != EMPTY):
+            agent = land.agents[states["occupant"][i]]
+            states["agentSugar"][i] = agent.sugar
+            states["metab"][i] = agent.metab
+        return states
+
+    def record(self, t):
+        """Record the Cells changed since the last call as of time t. Call after every event."""
+        land = self.landscape
+        if self.events % self.keyframeEvery == 0:
+            self.flush()
+            self.index.append((t, self.file.tell()))
+            flat = np.arange(land.rows * land.cols)
+            cells = self.cells(flat)
+            self.block.append(KEYFRAME + struct.pack("<d", t) + cells.tobytes())
+        elif self.touched or self.bare:
+            # Regrowth changes sugar without touching the Cell, only sugar appearing shows on a map
+            flat = np.array(sorted(y * land.cols + x for x, y in self.touched | self.bare), dtype=np.int64)
+            cells = self.cells(flat)
+            self.block.append(DELTA + struct.pack("<dI", t, len(flat)) + flat.astype("<i4").tobytes() + cells.tobytes())
+        else:
+            flat, cells = [], None
+        if len(flat):
+            bare = (cells["occupant"] == EMPTY) & (cells["sugar"] == 0) & (land.capacity.ravel().take(flat) > 0)
+            self.bare.difference_update(divmod(int(i), land.cols)[::-1] for i in flat[~bare])
+            self.bare.update(divmod(int(i), land.cols)[::-1] for i in flat[bare])
+        self.touched.clear()
+        self.events += 1
+
+    def flush(self):
+        """Compress and write the current block."""
+        if self.block:
+            data = zlib.compress(b"".join(self.block), self.level)
+            self.file.write(data)
+            self.block = []
+
+    def close(self):
+        """Write the last block and the index."""
+        if self.file.closed:
+            return
+        self.flush()
+        ends = [offset for t, offset in self.index[1:]] + [self.file.tell()]
+        index = np.array([(t, offset, end - offset) for (t, offset), end in zip(self.index, ends)], dtype=INDEX)
+        position = self.file.tell()
+        self.file.write(index.tobytes() + FOOTER.pack(position, len(index)))
+        self.file.close()
+
+
+class RecordedAgent:
+    """What a recording knows about the Agent on a Cell."""
+    def __init__(self, id, sugar, metab):
+        self.id = id
+        self.sugar = sugar
+        self.metab = metab
+
+
+class Frame:
+    """The Cells at one time of a recording. Reads like a Landscape to str_map()."""
+    def __init__(self, recording, t, cells):
+        self.rows = recording.rows
+        self.cols = recording.cols
+        self.config = recording.config
+        self.capacity = recording.capacity
+        self.level = recording.level
+        self.t = t
+        self.cells = cells.reshape(self.rows, self.cols)
+
+    def get_agent(self, x, y):
+        cell = self.cells[y % self.rows, x % self.cols]
+        if cell["occupant"] == EMPTY:
+            return None
+        return RecordedAgent(int(cell["occupant"]), float(cell["agentSugar"]), float(cell["metab"]))
+
+    def get_sugar(self, x, y):
+        return float(self.cells[y % self.rows, x % self.cols]["sugar"])
+
+
+class Recording:
+    """A recording opened for replay."""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a sugarscape recording")
+        version, size = struct.unpack("<HI", self.file.read(6))
+        if version != VERSION:
+            raise ValueError(f"{path} is recording version {version}, expected {VERSION}")
+        header = json.loads(self.file.read(size))
+        self.rows = header["rows"]
+        self.cols = header["cols"]
+        self.config = Config(**header["config"])
+        shape = (self.rows, self.cols)
+        self.capacity = np.frombuffer(self.file.read(4 * self.rows * self.cols), dtype="<i4").reshape(shape)
+        self.level = np.frombuffer(self.file.read(4 * self.rows * self.cols), dtype="<i4").reshape(shape)
+        self.file.seek(-FOOTER.size, 2)
+        position, blocks = FOOTER.unpack(self.file.read(FOOTER.size))
+        self.file.seek(position)
+        self.index = np.frombuffer(self.file.read(blocks * INDEX.itemsize), dtype=INDEX)
+        self.start = float(self.index["t"][0]) if blocks else 0.0
+        self._block = None # (block number, list of (t, flat indexes or None, cells)) of the last decompressed block
+
+    def _records(self, block):
+        """Decode a block into a list of (t, flat indexes, cells), flat indexes None for the keyframe."""
+        if self._block != None and self._block[0] == block:
+            return self._block[1]
+        entry = self.index[block]
+        self.file.seek(int(entry["offset"]))
+        data = zlib.decompress(self.file.read(int(entry["size"])))
+        records = []
+        position = 0
+        count = self.rows * self.cols
+        while position < len(data):
+            kind = data[position:position + 1]
+            if kind == KEYFRAME:
+                t, = struct.unpack_from("<d", data, position + 1)
+                position += 9
+                cells = np.frombuffer(data, dtype=CELLS, count=count, offset=position)
+                position += count * CELLS.itemsize
+                records.append((t, None, cells))
+            else:
+                t, n = struct.unpack_from("<dI", data, position + 1)
+                position += 13
+                flat = np.frombuffer(data, dtype="<i4", count=n, offset=position)
+                position += 4 * n
+                cells = np.frombuffer(data, dtype=CELLS, count=n, offset=position)
+                position += n * CELLS.itemsize
+                records.append((t, flat, cells))
+        self._block = (block, records)
+        return records
+
+    def end(self):
+        """Time of the last recorded event."""
+        return self._records(len(self.index) - 1)[-1][0]
+
+    def at(self, t):
+        """Get the Frame after the last event at or before time t (the first one if t is earlier)."""
+        block = max(bisect.bisect_right(self.index["t"].tolist(), t) - 1, 0)
+        records = self._records(block)
+        cells = records[0][2].copy()
+        time = records[0][0]
+        for recorded, flat, changed in records[1:]:
+            if recorded > t:
+                break
+            cells[flat] = changed
+            time = recorded
+        return Frame(self, time, cells)
+
+    def close(self):
+        self.file.close()
+
+
+def show(frame, sugar):
+    return f"t = {frame.t}\n{str_map(frame, showSugar=sugar)}"
+
+
+def scrub(recording, sugar):
+    """Prompt for times to show: a time, +dt or -dt from the current one, empty to step 1, q to quit."""
+    t = recording.start
+    end = recording.end()
+    print(f"Recording from t = {recording.start} to t = {end}; enter t, +dt, -dt, or q")
+    while True:
+        frame = recording.at(t)
+        print(show(frame, sugar))
+        command = input(f"Replay t={frame.t}> ").strip()
+        if command == "q":
+            return
+        try:
+            if command == "":
+                t += 1
+            elif command[0] in "+-":
+                t += float(command)
+            else:
+                t = float(command)
+        except ValueError:
+            print(f"Unknown command '{command}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a sugarscape recording.")
+    parser.add_argument("recording", help="File written with RECORD")
+    parser.add_argument("--at", type=float, help="Show the map at time T")
+    parser.add_argument("--compare", type=float, nargs=2, metavar=("T0", "T1"), help="Show the maps at T0 and T1 side by side")
+    parser.add_argument("--play", type=float, nargs=2, metavar=("T0", "T1"), help="Show the maps from T0 to T1")
+    parser.add_argument("--every", type=float, default=1.0, help="Time between the maps of --play")
+    parser.add_argument("--sugar", action="store_true", help="Show sugar")
+    args = parser.parse_args()
+    recording = Recording(args.recording)
+    if args.at != None:
+        print(show(recording.at(args.at), args.sugar))
+    elif args.compare != None:
+        before, after = (recording.at(t) for t in args.compare)
+        print(f"Comparison of maps at t={before.t} and t={after.t}, respectively:")
+        print(compare_maps(str_map(before, showSugar=args.sugar), str_map(after, showSugar=args.sugar),
+            recording.rows + 1, recording.cols + 1))
+    elif args.play != None:
+        t, end = args.play
+        while t <= end:
+            print(show(recording.at(t), args.sugar))
+            t += args.every
+    else:
+        scrub(recording, args.sugar)
+    recording.close()
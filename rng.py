@@ -1,12 +1,113 @@
 # Random number generator
+# Every named stream is its own Generator, jumped off one Philox bit generator in the order the names are first used.
+#
+# With batch > 0, get() returns a BufferedStream instead, which draws blocks of batch variates per distribution and
+# hands them out one at a time. Each distribution of a buffered stream draws from its own Generator ("name/kind"),
+# so what a run draws only depends on the seed and never on the batch size or on when blocks are refilled.
+# A buffered run is as reproducible as an unbuffered one, but it draws different numbers, so the two do not match.
 from numpy.random import Generator, Philox, SeedSequence
+import itertools
+import numpy as np
+import operator
+
+MAX_PERMUTED = 6 # Longest sequence shuffled by picking one of its orders
+PERMUTATIONS = dict() # Length -> getters of every order of that many items, made when first shuffled
+KINDS = {"exponential": "standard_exponential", "normal": "standard_normal", "random": "random"} # Buffered kind -> Generator method
+
+
+class BufferedStream:
+    """A named stream handing out pre-drawn variates, for the scalar draws of Generator the simulation makes.
+    Every variate is a Python float made from a standard one, e.g. exponential(scale) is scale * a standard exponential.
+    """
+    def __init__(self, rng, name, batch):
+        """
+        rng - RNG the stream's Generators come from.
+        name - Name of the stream.
+        batch - Variates drawn per block.
+        """
+        self.rng = rng
+        self.name = name
+        self.batch = batch
+        # Blocks still to hand out, reversed so the next variate is popped off the end
+        self._exponential = []
+        self._normal = []
+        self._random = []
+
+    def _draw(self, kind):
+        generator = self.rng.get_generator(f"{self.name}/{kind}")
+        return getattr(generator, KINDS[kind])(size=self.batch).tolist()[::-1]
+
+    def exponential(self, scale=1.0):
+        if not self._exponential:
+            self._exponential = self._draw("exponential")
+        return scale * self._exponential.pop()
+
+    def normal(self, loc=0.0, scale=1.0):
+        if not self._normal:
+            self._normal = self._draw("normal")
+        return loc + scale * self._normal.pop()
+
+    def random(self):
+        """Uniform in [0, 1)."""
+        if not self._random:
+            self._random = self._draw("random")
+        return self._random.pop()
+
+    def uniform(self, low=0.0, high=1.0):
+        return low + (high - low) * self.random()
+
+    def integers(self, low, high=None, size=None):
+        """Integer in [low, high), or [0, low) without high.
+        With size, an array drawn at once from the stream's own Generator, as Generator.integers().
+        """
+        if size != None:
+            return self.rng.get_generator(f"{self.name}/integers").integers(low, high, size=size)
+        if high == None:
+            low, high = 0, low
+        return low + int(self.random() * (high - low))
+
+    def choice(self, options):
+        """Pick one of a sequence."""
+        return options[int(self.random() * len(options))]
+
+    def shuffle(self, x):
+        """Shuffle a mutable sequence in place: short ones with one draw picking among all their orders,
+        longer ones Fisher-Yates.
+        """
+        n = len(x)
+        if n < 2:
+            return
+        if n <= MAX_PERMUTED:
+            orders = PERMUTATIONS.get(n)
+            if orders == None:
+                orders = PERMUTATIONS[n] = [operator.itemgetter(*order) for order in itertools.permutations(range(n))]
+            x[:] = orders[int(self.random() * len(orders))](x)
+            return
+        for i in range(n - 1, 0, -1):
+            j = int(self.random() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+    def state(self):
+        """Get the variates not handed out yet, to restore with set_state()."""
+        return {kind: list(getattr(self, f"_{kind}")) for kind in KINDS}
+
+    def set_state(self, state):
+        for kind, values in state.items():
+            setattr(self, f"_{kind}", list(values))
+
 
 class RNG:
-    def __init__(self, seed):
+    def __init__(self, seed, batch=0):
+        """
+        seed - Seed of every stream.
+        batch - Variates buffered per distribution of every stream, 0 hands out the Generators themselves.
+        """
         self.seed = seed
+        self.batch = batch
         self.seed_seq = SeedSequence(seed)
         self.big_gen = Philox(seed)
         self.generators = dict()
+        self.streams = dict() # Name -> BufferedStream, when batching
 
     def expand(self, name):
         """Add a Generator to the RNG Generator list.
@@ -17,9 +118,39 @@ class RNG:
             self.big_gen = self.big_gen.jumped()
 
     def get(self, name):
+        """Get a stream: the Generator, or its BufferedStream when batching.
+        name - Name of the stream, if doesn't exist, will create it.
+        """
+        if self.batch:
+            stream = self.streams.get(name)
+            if stream == None:
+                stream = self.streams[name] = BufferedStream(self, name, self.batch)
+            return stream
+        return self.get_generator(name)
+
+    def get_generator(self, name):
         """Get Generator.
         name - Name of Generator, if doesn't exist, will create it.
         """
         if name not in self.generators:
             self.expand(name)
         return self.generators[name]
+
+    def reseed(self, seed):
+        """Restart every stream from seed, keeping the stream names, e.g. for a branch of a running simulation.
+        The streams are recreated in the order they were first used, like a fresh RNG(seed) would make them.
+        """
+        names = list(self.generators.keys())
+        self.seed = seed
+        self.seed_seq = SeedSequence(seed)
+        self.big_gen = Philox(seed)
+        self.generators = dict()
+        self.streams = dict()
+        for name in names:
+            self.expand(name)
+
+    def spawn_seeds(self, n):
+        """Get seeds for n independent streams derived from this RNG's SeedSequence, e.g. one per replication.
+        The i-th seed only depends on the seed of this RNG and i.
+        """
+        return [int(child.generate_state(1, dtype=np.uint64)[0]) for child in SeedSequence(self.seed).spawn(n)]
@@ -0,0 +1,43 @@
+# Numpy arrays in shared memory, for state several processes read or write in place
+# The arrays of a SharedArrays are laid out one after the other in a single multiprocessing.shared_memory block.
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+
+class SharedArrays:
+    """Numpy arrays in one block of shared memory. Pickles as the name of the block, so a spawned process attaches
+    to it; a forked one simply inherits it.
+    """
+    def __init__(self, layout, name=None):
+        """
+        layout - List of (name, shape, dtype) of the arrays.
+        name - Shared memory block to attach to, if None a new one is created.
+        """
+        self.layout = layout
+        offsets = []
+        size = 0
+        for array, shape, dtype in layout:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+        self.memory = SharedMemory(name=name, create=name == None, size=max(size, 8))
+        self.arrays = dict((array, np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset))
+            for (array, shape, dtype), offset in zip(layout, offsets))
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __getstate__(self):
+        return {"layout": self.layout, "name": self.memory.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["layout"], name=state["name"])
+
+    def close(self):
+        """Detach, the arrays must not be used any more."""
+        self.arrays.clear()
+        self.memory.close()
+
+    def unlink(self):
+        """Detach and free the block."""
+        self.close()
+        self.memory.unlink()
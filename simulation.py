@@ -0,0 +1,230 @@
+# A single, self-contained sugarscape run
+# Every Simulation owns its state and Config, so many can run in one interpreter.
+# Rendering, the pause REPL, checkpoints and forking are imported when first used, to keep headless startup fast.
+from agent import AgentList
+from config import Config
+from event import EventCalendar
+from landscape import Landscape
+from metrics import MetricsCollector
+from profiler import Profiler
+from rng import RNG
+from sink import open_sink
+import math
+import sys
+
+
+class Results:
+    """Summary of a Simulation at the time it was taken."""
+    STATS = {
+        "sugar": AgentList.SUGAR,
+        "metabolism": AgentList.METABOLISM,
+        "vision": AgentList.VISION
+    }
+
+    def __init__(self, simulation):
+        agentList = simulation.agentList
+        self.config = simulation.config
+        self.t = simulation.now()
+        self.population = len(agentList.agentList)
+        self.averages = {name: agentList.average(stat) for name, stat in Results.STATS.items()}
+        self.medians = {name: agentList.median(stat) for name, stat in Results.STATS.items()}
+
+    def summary(self):
+        """Get the results as a flat dict of plain values, e.g. for writing a table row."""
+        summary = {"seed": self.config.SEED, "t": self.t, "population": self.population}
+        for name in Results.STATS:
+            summary[f"average_{name}"] = float(self.averages[name])
+            median = self.medians[name]
+            summary[f"median_{name}"] = float(median) if median != None else None
+        return summary
+
+
+class Simulation:
+    """A sugarscape run: the RNG, Landscape, AgentList and EventCalendar built from one Config."""
+    ENGINES = ["events", "ticks", "tiles"]
+    TICKLESS = ["PAUSE", "RECORD", "TRACE", "PROFILE", "PROFILE_TRACE", "CHECKPOINT_EVERY", "RESUME", "SHOW_ANIMATION"] # Options only the events engine has
+
+    def __init__(self, config=None, populate=True, terrain=None):
+        """
+        config - Config, if None the defaults (environment variables) are used.
+        populate - Create the initial Agents. False leaves the AgentList empty and appends to a log file,
+            to restore a checkpoint into.
+        terrain - Terrain of the Landscape, e.g. a SharedTerrain of replications, if None it is generated.
+        """
+        self.config = config if config != None else Config()
+        if self.config.ENGINE not in Simulation.ENGINES:
+            raise ValueError(f"Unknown engine '{self.config.ENGINE}', choose from {Simulation.ENGINES}")
+        if self.config.ENGINE != "events" and any(getattr(self.config, name) for name in Simulation.TICKLESS):
+            raise ValueError(f"ENGINE={self.config.ENGINE} does not support {[name for name in Simulation.TICKLESS if getattr(self.config, name)]}")
+        self.rng = RNG(self.config.SEED, batch=self.config.RNG_BATCH)
+        self.log = open_sink(self.config.LOG, flushSize=self.config.LOG_FLUSH, ringSize=self.config.LOG_RING,
+            append=not populate)
+        self.calendar = EventCalendar(self.config.CALENDAR, log=self.log)
+        self.profiler = None
+        if self.config.PROFILE or self.config.PROFILE_TRACE:
+            self.profiler = Profiler(trace=bool(self.config.PROFILE_TRACE))
+            self.calendar.set_profiler(self.profiler)
+        self.tracer = None
+        if self.config.TRACE:
+            from eventtrace import TraceWriter
+            self.tracer = TraceWriter(self.config.TRACE, seed=self.config.SEED)
+            self.calendar.set_tracer(self.tracer)
+        self.landscape = Landscape(self.config.ROWS, self.config.COLUMNS, rng=self.rng, config=self.config, log=self.log,
+            terrain=terrain)
+        self.agentList = AgentList(self.config.AGENTS if populate else 0, self.landscape, self.calendar, rng=self.rng)
+        self.engine = None
+        if self.config.ENGINE == "ticks":
+            from ticks import TickEngine
+            self.engine = TickEngine(self, dt=self.config.TICK)
+        elif self.config.ENGINE == "tiles":
+            from tiles import TiledEngine
+            self.engine = TiledEngine(self, dt=self.config.TICK, workers=self.config.TILE_WORKERS or None,
+                every=self.config.METRICS_EVERY if self.config.METRICS or self.config.SHOW_PLOTS else 0)
+        self.t_nextCheckpoint = self.next_checkpoint()
+        self.metrics = None
+        if self.config.METRICS or self.config.SHOW_PLOTS:
+            self.metrics = MetricsCollector(self.agentList, self.metrics_path(), every=self.config.METRICS_EVERY,
+                bins=[float(edge) for edge in self.config.WEALTH_BINS.split(",")], chunkSize=self.config.METRICS_CHUNK,
+                append=not populate)
+            if populate:
+                self.metrics.sample(self.calendar.now())
+        self.renderer = None
+        if self.config.SHOW_ANIMATION and self.animation() == "ansi":
+            from terminal import TerminalRenderer
+            self.renderer = TerminalRenderer(self.landscape, self.agentList, showSugar=self.config.SHOW_SUGAR,
+                fps=self.config.ANIMATION_FPS)
+        self.recorder = None
+        if self.config.RECORD:
+            from recording import Recorder
+            self.recorder = Recorder(self.landscape, self.config.RECORD, keyframeEvery=self.config.RECORD_KEYFRAME)
+            self.recorder.record(self.calendar.now())
+        self.calendar.set_preevent(self.preoperation)
+        self.calendar.set_postevent(self.postoperation)
+
+    def preoperation(self):
+        self.landscape.update_sugar(self.calendar.now())
+
+    def postoperation(self):
+        config = self.config
+        t = self.calendar.now()
+        if self.renderer != None:
+            self.renderer.frame(t)
+        elif config.SHOW_ANIMATION:
+            from visual import str_map
+            bMap = str_map(self.landscape, showSugar=config.SHOW_SUGAR)
+            print(f"t = {t:4.32}, alive = {len(self.agentList.agentList)}\n{bMap}")
+
+        if config.PAUSE:
+            # Print nice statistics and await input
+            # Empty input == continue to next event
+            from pause import interpret
+            from visual import nice_statistics
+            print(nice_statistics(self.agentList, t))
+            repeatInput = True
+            while repeatInput:
+                uInput = input(f"Input t={t}> ")
+                repeatInput = interpret(uInput, self.agentList, self.calendar, self.landscape, self.calendar.now())
+
+        if self.recorder != None:
+            self.recorder.record(t)
+
+        if self.metrics != None and self.metrics.due(t):
+            self.metrics.sample(t)
+
+        if t >= self.t_nextCheckpoint:
+            self.save(config.CHECKPOINT_PATH)
+            self.t_nextCheckpoint = self.next_checkpoint()
+
+    def tick(self, t):
+        """After every tick of the ticks engine, or every return from the tiles engine's workers."""
+        if self.metrics != None and self.metrics.due(t):
+            self.engine.sync()
+            self.metrics.sample(t)
+
+    def now(self):
+        """Get the current simulation time."""
+        return self.engine.t if self.engine != None else self.calendar.now()
+
+    def run(self, until=None):
+        """Run the simulation.
+        until - Time to run until, if None config.MAX_T.
+        Returns Results at the end of the run.
+        """
+        until = until if until != None else self.config.MAX_T
+        if self.engine != None:
+            self.engine.run(until, post=self.tick)
+            self.engine.sync()
+        else:
+            self.calendar.run(until)
+        if self.renderer != None:
+            self.renderer.finish(self.calendar.now())
+        self.log.flush()
+        if self.metrics != None:
+            self.metrics.flush()
+        if self.tracer != None:
+            self.tracer.flush()
+        return self.results()
+
+    def animation(self):
+        """Get how SHOW_ANIMATION is drawn: "ansi" or "frames"."""
+        if self.config.ANIMATION == "auto":
+            return "ansi" if sys.stdout.isatty() else "frames"
+        return self.config.ANIMATION
+
+    def metrics_path(self):
+        """Get the file the metrics time series is written to."""
+        return self.config.METRICS or "metrics.csv"
+
+    def fork(self, variants, until=None, workers=None, collect=None):
+        """Branch the current state into one what-if run per variant, each in a forked process.
+        This Simulation is left as it is and can keep running. See branch.branch() for the parameters.
+        Returns list of each branch's result (by default its summary dict), in the order of variants.
+        """
+        if self.engine != None:
+            raise ValueError("fork() requires ENGINE=events")
+        import branch
+        return branch.branch(self, variants, until=until, workers=workers, collect=collect)
+
+    def save(self, path):
+        """Checkpoint the complete state to path, between events. Restore it with Simulation.load()."""
+        if self.engine != None:
+            raise ValueError("save() requires ENGINE=events")
+        import checkpoint
+        self.log.flush()
+        checkpoint.write(checkpoint.snapshot(self), path)
+
+    @classmethod
+    def load(cls, path, **params):
+        """Restore a Simulation from a checkpoint written by save().
+        Running it continues exactly where the checkpointed run was.
+        params - Config parameters to change, e.g. MAX_T to run longer. A new ALPHA only applies from the checkpoint on.
+        """
+        import checkpoint
+        state = checkpoint.read(path)
+        config = Config(**state["config"])
+        config.update(**params)
+        simulation = cls(config, populate=False)
+        checkpoint.restore(simulation, state)
+        simulation.t_nextCheckpoint = simulation.next_checkpoint()
+        return simulation
+
+    def next_checkpoint(self):
+        """Get the time of the next automatic checkpoint after now, inf if CHECKPOINT_EVERY is off."""
+        every = self.config.CHECKPOINT_EVERY
+        if every <= 0:
+            return math.inf
+        return every * (math.floor(self.calendar.now() / every) + 1)
+
+    def close(self):
+        """Write out and close the log, metrics, recording and trace."""
+        self.log.close()
+        if self.tracer != None:
+            self.tracer.close()
+        if self.recorder != None:
+            self.recorder.close()
+        if self.metrics != None:
+            self.metrics.close()
+
+    def results(self):
+        """Get Results of the current state."""
+        return Results(self)
@@ -0,0 +1,132 @@
+# Structured log records of what happens during a run, and the sinks that receive them
+# Callers check sink.enabled before building a record, so a NullSink costs nothing per event.
+from collections import deque
+import csv
+import json
+import sys
+
+DEATH = "death"
+BIRTH = "birth"
+MOVE = "move"
+WARNING = "warning"
+END = "end"
+
+FIELDS = ["kind", "t", "agent", "x", "y", "sugar", "max_age", "message"] # CSV columns, every record field is one of these
+
+
+class NullSink:
+    """Discards every record."""
+    enabled = False
+
+    def log(self, kind, t, **fields):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StdoutSink(NullSink):
+    """Prints records of the given kinds as readable lines, the same lines the simulation always printed."""
+    enabled = True
+    FORMATS = {
+        DEATH: "Agent {agent} is now DEAD!!!!!!!!!! RIP at {t} w/ {sugar} sugar max_age = {max_age}",
+        BIRTH: "Agent {agent} born at {t} at ({x}, {y})",
+        MOVE: "Agent {agent} moved at {t} to ({x}, {y})",
+        WARNING: "WARNING: {message}",
+        END: "{message}"
+    }
+
+    def __init__(self, kinds=(DEATH, WARNING, END), stream=None):
+        """
+        kinds - Kinds of records to print, the others are discarded.
+        stream - File to print to, if None sys.stdout at the time of logging.
+        """
+        self.kinds = set(kinds)
+        self.stream = stream
+
+    def log(self, kind, t, **fields):
+        if kind in self.kinds:
+            print(StdoutSink.FORMATS[kind].format(t=t, **fields), file=self.stream or sys.stdout)
+
+
+class RingSink(NullSink):
+    """Keeps the last size records in memory as dicts, e.g. for inspecting a run afterwards."""
+    enabled = True
+
+    def __init__(self, size=10000):
+        self.records = deque(maxlen=size)
+
+    def log(self, kind, t, **fields):
+        fields["kind"] = kind
+        fields["t"] = t
+        self.records.append(fields)
+
+
+class FileSink(NullSink):
+    """Buffers records and writes them to a file in batches, as NDJSON or CSV."""
+    enabled = True
+    FORMATS = ("ndjson", "csv")
+
+    def __init__(self, path, format=None, flushSize=1000, append=False):
+        """
+        path - File to write.
+        format - "ndjson" or "csv", if None taken from the path's extension.
+        flushSize - Number of records buffered before they are written.
+        append - Add to the end of an existing file instead of overwriting it, e.g. when resuming a run.
+        """
+        format = format if format != None else path.rsplit(".", 1)[-1].lower()
+        if format not in FileSink.FORMATS:
+            raise ValueError(f"Unknown log format '{format}', choose from {list(FileSink.FORMATS)}")
+        self.format = format
+        self.flushSize = flushSize
+        self.buffer = []
+        self.file = open(path, "a" if append else "w", newline="")
+        if format == "csv":
+            self.writer = csv.DictWriter(self.file, FIELDS)
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+
+    def log(self, kind, t, **fields):
+        fields["kind"] = kind
+        fields["t"] = t
+        self.buffer.append(fields)
+        if len(self.buffer) >= self.flushSize:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            if self.format == "csv":
+                self.writer.writerows(self.buffer)
+            else:
+                self.file.write("".join(json.dumps(record, default=plain) + "\n" for record in self.buffer))
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def plain(value):
+    """Convert a numpy scalar to the plain Python value for JSON."""
+    return value.item()
+
+
+def open_sink(spec, flushSize=1000, ringSize=10000, append=False):
+    """Make a sink from its config name.
+    spec - "null", "stdout", "ring", or a path ending in .ndjson or .csv.
+    flushSize - Records per batch of a FileSink.
+    ringSize - Records kept by a RingSink.
+    append - Whether a FileSink adds to an existing file.
+    """
+    if spec == "null":
+        return NullSink()
+    if spec == "stdout":
+        return StdoutSink()
+    if spec == "ring":
+        return RingSink(ringSize)
+    return FileSink(spec, flushSize=flushSize, append=append)
@@ -0,0 +1,168 @@
+# Parameter sweeps and replications across a process pool
+# Usage: python sweep.py <output.ndjson> [--grid NAME=v1,v2 ...] [--replications N] [--workers N] [--chunksize N]
+# Every other parameter comes from the usual environment variables.
+# With --share-terrain, a terrain several points have in common (see terrain.py) is generated once and shared.
+# Files a run writes (METRICS, RECORD, TRACE, PROFILE_TRACE, CHECKPOINT_PATH) get the point's index appended,
+# e.g. metrics.csv becomes metrics.3.csv, and nothing is shown or plotted.
+# ENGINE=tiles cannot be swept: pool workers are daemon processes, which cannot start the tiles engine's own workers.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import Config, sbool
+from rng import RNG
+from simulation import Simulation
+from terrain import Terrain, terrain_key
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+
+POINT_FILES = ["METRICS", "RECORD", "TRACE", "PROFILE_TRACE", "CHECKPOINT_PATH"] # Options naming a file a run writes
+RESERVED = ["SEED", "SHOW_ANIMATION", "SHOW_PLOTS", "PROFILE", "PAUSE", "LOG"] # Options every sweep point sets itself
+
+
+def expand(grid, seeds):
+    """Expand a parameter grid x seed list into sweep points.
+    grid - Dict of parameter name -> list of values.
+    seeds - List of seeds, every parameter combination is run once per seed.
+    Returns list of (index, params, replication, seed) tuples.
+    """
+    names = list(grid.keys())
+    points = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        for replication, seed in enumerate(seeds):
+            points.append((len(points), params, replication, seed))
+    return points
+
+
+def point_path(path, index):
+    """Get the file name of path for the sweep point index: path.csv -> path.<index>.csv."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{index}{extension}"
+
+
+def point_config(base, point):
+    """Get the Config of a sweep point. Every file it writes is its own, see point_path(), and nothing is shown."""
+    index, params, replication, seed = point
+    fixed = {"SEED": seed, "SHOW_ANIMATION": False, "SHOW_PLOTS": False, "PROFILE": False, "PAUSE": False, "LOG": "null"}
+    config = base.copy(**{**params, **fixed})
+    config.update(**dict((name, point_path(getattr(config, name), index)) for name in POINT_FILES if getattr(config, name)))
+    return config
+
+
+def run_point(base, point, terrains=None):
+    """Run a single sweep point on top of the base Config. Returns the run's summary dict.
+    terrains - Dict of terrain key -> Terrain of the points that share one.
+    """
+    index, params, replication, seed = point
+    config = point_config(base, point)
+    terrain = terrains.get(terrain_key(config)) if terrains else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = Simulation(config, terrain=terrain).run()
+    summary = {"point": index, "replication": replication}
+    summary.update(params)
+    summary.update(results.summary())
+    return summary
+
+
+def run_chunk(base, chunk, terrains=None):
+    """Run a chunk of sweep points in a worker. Returns list of summary dicts."""
+    return [run_point(base, point, terrains) for point in chunk]
+
+
+def share_terrains(base, points):
+    """Make every terrain more than one of points has once, in shared memory. Terrains loaded from files are left
+    out, every worker memory-maps the same pages of them anyway.
+    Returns dict of terrain key -> SharedTerrain, unlink them when the sweep is done.
+    """
+    configs = [point_config(base, point) for point in points]
+    keys = [terrain_key(config) for config in configs]
+    terrains = dict()
+    for key, config in zip(keys, configs):
+        if key not in terrains and keys.count(key) > 1 and not (config.TERRAIN_CAPACITY and config.TERRAIN_LEVEL):
+            terrains[key] = Terrain.from_config(config.ROWS, config.COLUMNS, config).share()
+    return terrains
+
+
+def sweep(grid, output, base=None, replications=1, seeds=None, workers=None, chunksize=1, shareTerrain=False):
+    """Run every point of grid x seeds across a process pool, appending each summary to output as NDJSON.
+    grid - Dict of parameter name -> list of values.
+    output - Path of the NDJSON file to write, one summary per line in completion order.
+    base - Config the grid parameters are applied on, if None the defaults.
+    replications - Number of seeds derived from base.SEED, ignored when seeds is given.
+    seeds - Explicit list of seeds.
+    workers - Number of worker processes, if None one per core.
+    chunksize - Number of points dispatched to a worker at once.
+    shareTerrain - Generate the terrains points have in common once and let the workers read them from shared
+        memory, instead of every run generating its own. Fixing TERRAIN_SEED gives every point the same one.
+    Returns number of points run.
+    """
+    base = base if base != None else Config()
+    check_grid(grid, base)
+    if seeds == None:
+        seeds = RNG(base.SEED).spawn_seeds(replications)
+    points = expand(grid, seeds)
+    chunks = [points[i:i + chunksize] for i in range(0, len(points), chunksize)]
+    terrains = share_terrains(base, points) if shareTerrain else dict()
+    try:
+        with open(output, "w") as out, ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = [executor.submit(run_chunk, base, chunk, terrains) for chunk in chunks]
+            for future in as_completed(futures):
+                for summary in future.result():
+                    out.write(json.dumps(summary) + "\n")
+                out.flush()
+    finally:
+        for terrain in terrains.values():
+            terrain.unlink()
+    return len(points)
+
+
+def check_grid(grid, base):
+    """Raise ValueError if grid sweeps an option every point sets itself, or a point would run ENGINE=tiles."""
+    reserved = [name for name in grid if name in RESERVED]
+    if reserved:
+        raise ValueError(f"Cannot sweep {reserved}, every sweep point sets them itself (use --seeds for SEED)")
+    if "tiles" in grid.get("ENGINE", [base.ENGINE]):
+        raise ValueError("ENGINE=tiles cannot run in a sweep, its worker processes cannot start from the sweep's")
+    return grid
+
+
+def parse_value(text):
+    """Parse a command line parameter value as int, float or boolean, falling back to the string itself."""
+    for parse in (int, float, sbool):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(specs):
+    """Parse NAME=v1,v2,... specs into a grid dict, check it with check_grid()."""
+    grid = dict()
+    for spec in specs:
+        name, values = spec.split("=", 1)
+        grid[name] = [parse_value(value) for value in values.split(",")]
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of sugarscape simulations. "
+        "ENGINE=tiles is not supported, sweep points run single-process with ENGINE=events or ticks.")
+    parser.add_argument("output", help="NDJSON file to write run summaries to")
+    parser.add_argument("--grid", nargs="*", default=[], metavar="NAME=v1,v2",
+        help=f"Parameter values to sweep, except {', '.join(RESERVED)}")
+    parser.add_argument("--replications", type=int, default=1, help="Seeds per parameter combination")
+    parser.add_argument("--seeds", type=int, nargs="*", help="Explicit seeds instead of derived ones")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to one per core")
+    parser.add_argument("--chunksize", type=int, default=1, help="Points dispatched to a worker at once")
+    parser.add_argument("--share-terrain", action="store_true", help="Generate terrains points share once, in shared memory")
+    args = parser.parse_args()
+    try:
+        grid = check_grid(parse_grid(args.grid), Config())
+    except ValueError as error:
+        parser.error(str(error))
+    count = sweep(grid, args.output, replications=args.replications, seeds=args.seeds,
+        workers=args.workers, chunksize=args.chunksize, shareTerrain=args.share_terrain)
+    print(f"Wrote {count} runs to {args.output}")
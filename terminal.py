@@ -0,0 +1,94 @@
+# Incremental terminal animation of a Landscape
+# The map is drawn once, after that only the characters of Cells that changed are redrawn with ANSI cursor moves.
+# The Landscape reports the Cells an event touched (Agents arriving, leaving or eating, sugar changing).
+from visual import cell_char
+import sys
+import time
+
+CLEAR = "\x1b[2J\x1b[H"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+CLEAR_LINE = "\x1b[K"
+
+
+def goto(row, col):
+    """ANSI escape moving the cursor to 0-based (row, col)."""
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+class TerminalRenderer:
+    """Keeps the characters on screen and redraws only the ones that changed since the last frame."""
+    def __init__(self, landscape, agentList, showSugar=False, fps=0, stream=None):
+        """
+        landscape - Landscape to draw, its touched Cells are tracked from now on.
+        agentList - AgentList, for the status line.
+        showSugar - Show sugar, as str_map().
+        fps - Most frames per second of wall time, events in between are merged into the next frame. 0 draws every event.
+        stream - File to write to, if None sys.stdout at the time of drawing.
+        """
+        self.landscape = landscape
+        self.agentList = agentList
+        self.showSugar = showSugar
+        self.interval = 1 / fps if fps > 0 else 0
+        self.stream = stream
+        self.screen = None # Characters on screen, [y][x]; None until the first full draw
+        self.t_lastFrame = -float("inf") # Wall time of the last frame
+        self.bare = set() # Drawn as bare ground with sugar that can still regrow, (x, y)
+        self.touched = landscape.watch()
+        self.statusRow = landscape.rows + 1 # Below the map and its column numbers
+
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def _char(self, x, y):
+        character = cell_char(self.landscape, x, y, self.showSugar)
+        if character == " " and self.showSugar and self.landscape.capacity[y, x] > 0:
+            self.bare.add((x, y))
+        else:
+            self.bare.discard((x, y))
+        return character
+
+    def _status(self, t):
+        return f"{goto(self.statusRow, 0)}t = {t:4.32}, alive = {len(self.agentList.agentList)}{CLEAR_LINE}"
+
+    def draw(self, t):
+        """Draw the whole frame at time t."""
+        land = self.landscape
+        self.touched.clear()
+        self.bare.clear()
+        self.screen = [[self._char(x, y) for x in range(land.cols)] for y in range(land.rows)]
+        self._write(HIDE_CURSOR + CLEAR + self._full() + self._status(t))
+        self.t_lastFrame = time.perf_counter()
+
+    def _full(self):
+        """The whole map with line numbers as on screen, like str_map()."""
+        land = self.landscape
+        lines = ["".join(row) + str(y)[-1] for y, row in enumerate(self.screen)]
+        lines.append("".join(str(x)[-1] for x in range(land.cols)))
+        return "\r\n".join(lines)
+
+    def frame(self, t):
+        """Redraw what changed since the last frame, unless the frame rate says to wait. Call after every event."""
+        if self.screen == None:
+            self.draw(t)
+            return
+        if self.interval and time.perf_counter() - self.t_lastFrame < self.interval:
+            return
+        cells = self.touched | self.bare
+        self.touched.clear()
+        diff = []
+        for x, y in cells:
+            character = self._char(x, y)
+            if self.screen[y][x] != character:
+                self.screen[y][x] = character
+                diff.append(goto(y, x) + character)
+        self._write("".join(diff) + self._status(t))
+        self.t_lastFrame = time.perf_counter()
+
+    def finish(self, t):
+        """Draw the last frame and leave the cursor below the animation."""
+        self.interval = 0
+        self.frame(t)
+        self._write(f"{goto(self.statusRow + 1, 0)}{SHOW_CURSOR}")
@@ -0,0 +1,182 @@
+# The static layers of a Landscape: the sugar capacity and the level of every Cell
+# Usage: python terrain.py export <capacity> <level> [--dtype DTYPE]
+#        python terrain.py peaks <capacity> [--dtype DTYPE]
+# export writes the terrain the current Config (ROWS, COLUMNS, SEED or TERRAIN_SEED, ...) generates, peaks the
+# capacity map of the classic two-peak sugarscape; both as .npy files, or raw grids for any other extension.
+#
+# A Terrain is generated from the "cell" RNG stream, or loaded from the TERRAIN_CAPACITY and TERRAIN_LEVEL files.
+# Loaded grids are memory-mapped read-only rather than read, so runs on the same large map share its pages.
+#
+# A Terrain only depends on the size, MAX_POSSIBLE_SUGAR, MAX_HEIGHT and the "cell" RNG stream of TERRAIN_SEED (or
+# SEED), never on what happens during a run. Replications that keep it, e.g. a sweep over Agent seeds with a fixed
+# TERRAIN_SEED, can generate it once and share it: a SharedTerrain is published to shared memory, and every process
+# it is passed to attaches to the same read-only arrays instead of generating or copying them, so its Landscapes
+# only allocate the sugar and occupancy layers.
+from config import Config
+from rng import RNG
+import argparse
+import numpy as np
+import os
+
+ATTACHED = dict() # Shared memory block name -> SharedArrays this process attached to, kept until the process exits
+RAW_DTYPE = "<i4" # Default type of the values of a raw grid file
+
+
+def terrain_seed(config):
+    """Get the seed the terrain of config is generated from."""
+    return config.TERRAIN_SEED or config.SEED
+
+
+def terrain_key(config):
+    """Get what the terrain of config depends on: runs with equal keys have equal terrains."""
+    return (config.ROWS, config.COLUMNS, config.MAX_POSSIBLE_SUGAR, config.MAX_HEIGHT, terrain_seed(config), config.RNG_BATCH,
+        config.TERRAIN_CAPACITY, config.TERRAIN_LEVEL, config.TERRAIN_DTYPE)
+
+
+def load_grid(path, rows, cols, dtype=RAW_DTYPE):
+    """Memory-map a grid file read-only: a .npy file, or any other file as raw values of dtype in row order.
+    Raises ValueError when the grid is not rows x cols, not integers or floats, or has negative (or nan) values.
+    """
+    if path.endswith(".npy"):
+        grid = np.load(path, mmap_mode="r")
+        if grid.shape != (rows, cols):
+            raise ValueError(f"{path} is a {' x '.join(str(n) for n in grid.shape)} grid, expected {rows} x {cols} (ROWS x COLUMNS)")
+    else:
+        dtype = np.dtype(dtype)
+        size = os.path.getsize(path)
+        if size != rows * cols * dtype.itemsize:
+            raise ValueError(f"{path} has {size} bytes, a {rows} x {cols} (ROWS x COLUMNS) grid of {dtype} has {rows * cols * dtype.itemsize}")
+        grid = np.memmap(path, dtype=dtype, mode="r", shape=(rows, cols))
+    if grid.dtype.kind not in "iuf":
+        raise ValueError(f"{path} holds {grid.dtype} values, expected integers or floats")
+    if not np.all(grid >= 0):
+        raise ValueError(f"{path} has negative or nan values, sugar levels and capacities can't be below 0")
+    return grid
+
+
+def save_grid(path, grid, dtype=RAW_DTYPE):
+    """Write a grid the way load_grid() reads it: a .npy file, or raw values of dtype for any other extension."""
+    if path.endswith(".npy"):
+        np.save(path, np.asarray(grid))
+    else:
+        np.asarray(grid, dtype=dtype).tofile(path)
+
+
+def two_peaks(rows, cols, maxSugar):
+    """Get the capacity map of the classic sugarscape: two hills of maxSugar in the north-east and south-west
+    quarters, falling off in rings to bare ground.
+    """
+    y, x = np.mgrid[0:rows, 0:cols]
+    radius = min(rows, cols) / 2
+    distance = np.minimum(np.hypot((y - 0.3 * rows) / radius, (x - 0.7 * cols) / radius),
+        np.hypot((y - 0.7 * rows) / radius, (x - 0.3 * cols) / radius))
+    return np.clip(np.ceil(maxSugar * (1 - distance)), 0, maxSugar).astype(np.int64)
+
+
+def reserve(rng):
+    """Make the Generator that terrain is drawn from without drawing, so the streams made after it are the same
+    as those of a run that generated its terrain.
+    """
+    rng.get_generator("cell/integers" if rng.batch else "cell")
+
+
+class Terrain:
+    """Sugar capacity and level of every Cell, rows x cols arrays indexed [y, x]."""
+    def __init__(self, capacity, level):
+        self.capacity = capacity
+        self.level = level
+
+    @property
+    def shape(self):
+        return self.capacity.shape
+
+    @classmethod
+    def generate(cls, rows, cols, config, rng=None):
+        """Generate a Terrain from config's parameters, as a Landscape does.
+        rng - RNG to draw from, if None a new one seeded with the terrain's seed. A Simulation's RNG gives the
+            terrain of its seed, not of TERRAIN_SEED.
+        """
+        rng = rng if rng != None else RNG(terrain_seed(config), batch=config.RNG_BATCH)
+        shape = (rows, cols)
+        capacity = rng.get("cell").integers(0, config.MAX_POSSIBLE_SUGAR + 1, size=shape)
+        level = rng.get("cell").integers(1, config.MAX_HEIGHT + 1, size=shape)
+        return cls(capacity, level)
+
+    @classmethod
+    def load(cls, capacityPath, levelPath, rows, cols, dtype=RAW_DTYPE):
+        """Memory-map a Terrain saved by save(), see load_grid()."""
+        return cls(load_grid(capacityPath, rows, cols, dtype), load_grid(levelPath, rows, cols, dtype))
+
+    @classmethod
+    def from_config(cls, rows, cols, config):
+        """Get the Terrain config describes: its TERRAIN_CAPACITY and TERRAIN_LEVEL files, memory-mapped, and
+        generated from TERRAIN_SEED (or SEED) where there is no file.
+        """
+        generated = None
+        if not (config.TERRAIN_CAPACITY and config.TERRAIN_LEVEL):
+            generated = cls.generate(rows, cols, config)
+        capacity = load_grid(config.TERRAIN_CAPACITY, rows, cols, config.TERRAIN_DTYPE) if config.TERRAIN_CAPACITY else generated.capacity
+        level = load_grid(config.TERRAIN_LEVEL, rows, cols, config.TERRAIN_DTYPE) if config.TERRAIN_LEVEL else generated.level
+        return cls(capacity, level)
+
+    def save(self, capacityPath, levelPath, dtype=RAW_DTYPE):
+        """Write the capacity and level grids for load(), TERRAIN_CAPACITY and TERRAIN_LEVEL, see save_grid()."""
+        save_grid(capacityPath, self.capacity, dtype)
+        save_grid(levelPath, self.level, dtype)
+
+    def share(self):
+        """Publish a copy of this Terrain to shared memory. Returns SharedTerrain, unlink() it when done."""
+        return SharedTerrain(self)
+
+
+class SharedTerrain(Terrain):
+    """A Terrain in shared memory. Pickles as the name of its block: passed to another process, e.g. as an argument
+    of a process pool task, it attaches to the block read-only, once per process, without copying the arrays.
+    """
+    def __init__(self, terrain):
+        from shared import SharedArrays # Only needed when sharing
+        self.shared = SharedArrays([("capacity", terrain.shape, terrain.capacity.dtype), ("level", terrain.shape, terrain.level.dtype)])
+        self.shared["capacity"][:] = terrain.capacity
+        self.shared["level"][:] = terrain.level
+        self._attach()
+
+    def _attach(self):
+        Terrain.__init__(self, self.shared["capacity"].view(), self.shared["level"].view())
+        self.capacity.flags.writeable = False
+        self.level.flags.writeable = False
+
+    def __getstate__(self):
+        return {"name": self.shared.memory.name, "layout": self.shared.layout}
+
+    def __setstate__(self, state):
+        from shared import SharedArrays
+        if state["name"] not in ATTACHED:
+            ATTACHED[state["name"]] = SharedArrays(state["layout"], name=state["name"])
+        self.shared = ATTACHED[state["name"]]
+        self._attach()
+
+    def unlink(self):
+        """Free the shared memory. Only the process that published the Terrain does, after every run using it."""
+        self.capacity = self.level = None
+        self.shared.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write sugarscape terrain maps.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    exportParser = commands.add_parser("export", help="Write the capacity and level the current Config generates")
+    exportParser.add_argument("capacity")
+    exportParser.add_argument("level")
+    exportParser.add_argument("--dtype", default=RAW_DTYPE, help="Value type of raw grid files")
+    peaksParser = commands.add_parser("peaks", help="Write the capacity map of the classic two-peak sugarscape")
+    peaksParser.add_argument("capacity")
+    peaksParser.add_argument("--dtype", default=RAW_DTYPE, help="Value type of raw grid files")
+    args = parser.parse_args()
+
+    config = Config()
+    if args.command == "export":
+        Terrain.from_config(config.ROWS, config.COLUMNS, config).save(args.capacity, args.level, args.dtype)
+        print(f"Wrote the {config.ROWS} x {config.COLUMNS} terrain of seed {terrain_seed(config)} to {args.capacity} and {args.level}")
+    else:
+        save_grid(args.capacity, two_peaks(config.ROWS, config.COLUMNS, config.MAX_POSSIBLE_SUGAR), args.dtype)
+        print(f"Wrote a {config.ROWS} x {config.COLUMNS} two-peak capacity map to {args.capacity}")
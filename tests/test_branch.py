@@ -0,0 +1,49 @@
+from config import Config
+from simulation import Simulation
+import pytest
+
+SMALL = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+
+
+def assert_same_run(lazy, eager):
+    """Lazy and eager sugar are the same bit-for-bit, so are the runs."""
+    assert lazy == eager
+
+
+@pytest.mark.parametrize("alpha", [2.0, 0.1])
+def test_branch_alpha_lazy_matches_eager(alpha):
+    """A branch's new ALPHA only regrows sugar from the branch point on, however stale the lazy Cells are."""
+    results = []
+    for lazy in (True, False):
+        simulation = Simulation(Config(LAZY_SUGAR=lazy, **SMALL))
+        simulation.run(4)
+        results.append(simulation.fork([{"ALPHA": alpha, "SEED": 7}], workers=1)[0])
+    assert_same_run(*results)
+
+
+def test_load_alpha_lazy_matches_eager(tmp_path):
+    results = []
+    for lazy in (True, False):
+        path = str(tmp_path / f"{lazy}.ckpt")
+        simulation = Simulation(Config(LAZY_SUGAR=lazy, **SMALL))
+        simulation.run(4)
+        simulation.save(path)
+        results.append(Simulation.load(path, ALPHA=2.0).run().summary())
+    assert_same_run(*results)
+
+
+def test_branch_leaves_parent_outputs(tmp_path, monkeypatch):
+    """Branches write none of the parent's metrics, recording or trace, which end up as those of an unbranched run."""
+    files = {name: f"run.{name.lower()}" for name in ("METRICS", "RECORD", "TRACE")} # Recordings hold their Config
+    outputs = []
+    for branched in (False, True):
+        (tmp_path / str(branched)).mkdir()
+        monkeypatch.chdir(tmp_path / str(branched))
+        simulation = Simulation(Config(METRICS_CHUNK=1000, **files, **SMALL))
+        simulation.run(4)
+        if branched:
+            simulation.fork([{"ALPHA": 2.0}, {}], workers=2)
+        simulation.run()
+        simulation.close()
+        outputs.append([open(path, "rb").read() for path in files.values()])
+    assert outputs[0] == outputs[1]
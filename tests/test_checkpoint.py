@@ -0,0 +1,25 @@
+from config import Config
+from simulation import Simulation
+from visual import str_map
+import numpy as np
+
+SMALL = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+
+
+def state(simulation):
+    """Everything a run leaves behind: its summary, map, sugar and pending events."""
+    land = simulation.landscape
+    return (simulation.results().summary(), str_map(land), land.sugar.tobytes(), len(simulation.calendar.sim))
+
+
+def test_resume_is_bit_exact(tmp_path):
+    """A run saved halfway and resumed ends exactly as the run that never stopped."""
+    path = str(tmp_path / "run.ckpt")
+    straight = Simulation(Config(**SMALL))
+    straight.run()
+    halfway = Simulation(Config(**SMALL))
+    halfway.run(4)
+    halfway.save(path)
+    resumed = Simulation.load(path)
+    resumed.run()
+    assert state(resumed) == state(straight)
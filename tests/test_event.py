@@ -0,0 +1,22 @@
+from config import Config
+from eventtrace import open_records
+from simulation import Simulation
+from visual import str_map
+import numpy as np
+
+SMALL = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+
+
+def test_heap_matches_simulus(tmp_path):
+    """Both calendar backends run the same events to the same end. Only events sharing a time may run in another
+    order, simulus does not keep the order they were queued in.
+    """
+    runs = []
+    for backend in ("heap", "simulus"):
+        trace = str(tmp_path / f"{backend}.trace")
+        simulation = Simulation(Config(CALENDAR=backend, TRACE=trace, **SMALL))
+        results = simulation.run()
+        simulation.close()
+        events = np.sort(open_records(trace), order=["t", "agent", "type"])
+        runs.append((results.summary(), str_map(simulation.landscape), simulation.landscape.sugar.tobytes(), events.tobytes()))
+    assert runs[0] == runs[1]
@@ -0,0 +1,41 @@
+from config import Config
+from eventtrace import diff, open_records
+from simulation import Simulation
+import pytest
+
+SMALL = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+
+
+def trace(tmp_path, name, **params):
+    """Run a traced SMALL run with params. Returns the trace's path."""
+    path = str(tmp_path / f"{name}.trace")
+    simulation = Simulation(Config(**dict(SMALL, TRACE=path, **params)))
+    simulation.run()
+    simulation.close()
+    return path
+
+
+def test_same_runs_have_no_diff(tmp_path):
+    assert diff(trace(tmp_path, "a"), trace(tmp_path, "b")) == None
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 16])
+def test_diff_finds_first_divergence(tmp_path, chunk):
+    """Runs with another ALPHA are equal up to the first event it changes, wherever the chunks split them."""
+    a, b = trace(tmp_path, "a"), trace(tmp_path, "b", ALPHA=1.5)
+    first = diff(a, b, chunk=chunk)
+    recordsA, recordsB = open_records(a), open_records(b)
+    assert first != None and first > 0
+    assert recordsA[:first].tobytes() == recordsB[:first].tobytes()
+    assert recordsA[first].tobytes() != recordsB[first].tobytes()
+
+
+def test_diff_of_prefix_is_its_length(tmp_path):
+    """A trace cut short, e.g. by a crash, differs where it ends."""
+    a = trace(tmp_path, "a")
+    with open(a, "rb") as f:
+        data = f.read()
+    b = str(tmp_path / "cut.trace")
+    with open(b, "wb") as f:
+        f.write(data[:len(data) - 100]) # Leaves a partial last record, which is not read
+    assert diff(a, b) == len(open_records(b)) < len(open_records(a))
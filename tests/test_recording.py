@@ -0,0 +1,21 @@
+from config import Config
+from recording import Recording
+from simulation import Simulation
+from visual import str_map
+import pytest
+
+SMALL = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+
+
+@pytest.mark.parametrize("keyframe", [100, 100000])
+def test_replay_ends_on_final_map(tmp_path, keyframe):
+    """Replaying to the end of a recording, from its last keyframe or its only one, draws the run's final map."""
+    path = str(tmp_path / "run.rec")
+    simulation = Simulation(Config(RECORD=path, RECORD_KEYFRAME=keyframe, **SMALL))
+    simulation.run()
+    simulation.close()
+    recording = Recording(path)
+    frame = recording.at(recording.end())
+    assert frame.t == simulation.now()
+    assert str_map(frame) == str_map(simulation.landscape)
+    recording.close()
@@ -0,0 +1,35 @@
+from config import Config
+import json
+import pytest
+import sweep
+
+
+@pytest.mark.parametrize("name", sweep.RESERVED)
+def test_grid_rejects_reserved(name):
+    """Options every point sets itself can't be swept, instead of clashing with them."""
+    with pytest.raises(ValueError, match=name):
+        sweep.check_grid(sweep.parse_grid([f"{name}=1,2"]), Config())
+
+
+def test_point_config_keeps_its_own_options():
+    config = sweep.point_config(Config(), (0, {"LOG": "stdout", "ALPHA": 2.0}, 0, 5))
+    assert (config.SEED, config.LOG, config.ALPHA) == (5, "null", 2.0)
+
+
+def test_grid_rejects_tiles():
+    with pytest.raises(ValueError, match="tiles"):
+        sweep.check_grid({"ENGINE": ["events", "tiles"]}, Config())
+    with pytest.raises(ValueError, match="tiles"):
+        sweep.check_grid({}, Config(ENGINE="tiles"))
+
+
+def test_results_do_not_depend_on_workers(tmp_path):
+    """Every point runs from its own seed, so a sweep gives the same summaries however many workers run it."""
+    base = Config(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=5)
+    runs = []
+    for workers in (1, 3):
+        output = tmp_path / f"{workers}.ndjson"
+        sweep.sweep({"ALPHA": [1.0, 2.0]}, str(output), base=base, replications=2, workers=workers)
+        runs.append(sorted(output.read_text().splitlines(), key=lambda line: json.loads(line)["point"]))
+    assert len(runs[0]) == 4
+    assert runs[0] == runs[1]
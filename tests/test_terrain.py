@@ -0,0 +1,31 @@
+from config import Config
+from simulation import Simulation
+from terrain import Terrain, load_grid, save_grid
+from visual import str_map
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("grid", [np.full((4, 5), -1), np.full((4, 5), np.nan), np.full((4, 5), True)])
+@pytest.mark.parametrize("name", ["grid.npy", "grid.raw"])
+def test_load_grid_rejects_bad_values(tmp_path, grid, name):
+    """Negative, nan or non-numeric grids are refused with the name of their file."""
+    path = str(tmp_path / name)
+    save_grid(path, grid, dtype=grid.dtype)
+    with pytest.raises(ValueError, match=name):
+        load_grid(path, 4, 5, dtype=grid.dtype)
+
+
+@pytest.mark.parametrize("names", [("capacity.npy", "level.npy"), ("capacity.raw", "level.raw")])
+def test_exported_terrain_runs_the_same(tmp_path, names):
+    """A run on the exported terrain of its seed is the run that generated it."""
+    small = dict(ROWS=20, COLUMNS=20, AGENTS=60, MAX_T=8, LOG="null", SEED=42)
+    capacity, level = (str(tmp_path / name) for name in names)
+    config = Config(**small)
+    Terrain.from_config(config.ROWS, config.COLUMNS, config).save(capacity, level)
+    runs = []
+    for files in ({}, {"TERRAIN_CAPACITY": capacity, "TERRAIN_LEVEL": level}):
+        simulation = Simulation(Config(**small, **files))
+        results = simulation.run()
+        runs.append((results.summary(), str_map(simulation.landscape), simulation.landscape.sugar.tobytes()))
+    assert runs[0] == runs[1]
@@ -0,0 +1,25 @@
+from config import Config
+from simulation import Simulation
+import pytest
+import tiles
+
+
+def final_state(simulation):
+    agents = sorted(simulation.agentList.agentList, key=lambda agent: agent.id)
+    return ([(agent.id, agent.col, agent.row, agent.sugar, agent.t_move, agent.mate.id if agent.mate else None) for agent in agents],
+        simulation.landscape.sugar.tobytes(), simulation.agentList.current_id)
+
+
+@pytest.mark.parametrize("capacity", [tiles.MIN_CAPACITY, 8])
+def test_metrics_do_not_change_run(tmp_path, monkeypatch, capacity):
+    """Sampling metrics returns to the coordinating process every METRICS_EVERY, the run must stay the same.
+    A tiny table also makes the workers return early to grow it.
+    """
+    monkeypatch.setattr(tiles, "MIN_CAPACITY", capacity)
+    states = []
+    for metrics in ("", str(tmp_path / "metrics.csv")):
+        simulation = Simulation(Config(ROWS=48, COLUMNS=48, AGENTS=300, LOG="null", ENGINE="tiles", TILE_WORKERS=2,
+            SEED=3, MAX_T=8, METRICS=metrics, METRICS_EVERY=0.4))
+        simulation.run()
+        states.append(final_state(simulation))
+    assert states[0] == states[1]
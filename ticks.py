@@ -0,0 +1,423 @@
+# Time-stepped engine: the model advanced in ticks of fixed length, every rule applied to all Agents at once
+# Selected with ENGINE=ticks instead of running the EventCalendar. The Agents live in arrays while it runs and are
+# written back to the AgentList and Landscape by sync(), so statistics, maps and metrics read them as usual.
+#
+# Every tick, in order: sugar regrows, Agents metabolize, Agents out of sugar or past their max age die, Agents whose
+# move is due move, mothers whose reproduction is due look for a mate, and mothers whose gestation is over give birth.
+# The rules are those of Agent.move(), reproduce() and birth(); what changes is that everything due within a tick
+# happens at its end, at most once per Agent, seeing the Landscape as the tick left it so far.
+# When several Agents want the same Cell, the one whose action was due first gets it and the others choose again
+# among the Cells still empty, for up to ROUNDS rounds; whoever is left over tries again next tick, first in line.
+from agent import Agent, DIRECTIONS, fov_offset, fov_steps
+from landscape import EMPTY
+from sink import DEATH, BIRTH, MOVE, END
+import math
+import numpy as np
+
+ROUNDS = 4 # Conflict resolution rounds per tick
+NO_MATE = -1
+FIELDS = [
+    ("id", np.int64), ("x", np.int64), ("y", np.int64), ("sugar", np.float64), ("metab", np.float64),
+    ("vision", np.int64), ("mother", bool), ("max_age", np.float64), ("birthdate", np.float64),
+    ("t_move", np.float64), ("t_reproduce", np.float64), ("t_birth", np.float64), ("period_g", np.float64),
+    ("mate", np.int64), ("alive", bool)
+] # One array per field, one row per Agent; mate is the row of the mate
+
+
+def view_table(vision):
+    """Get the field of view of every vision up to vision as arrays over entries, same Cells as fov_table().
+    Returns dx, dy, dist, direction arrays.
+    """
+    visits = dict() # Offset -> dist, direction
+    for d, direction in enumerate(DIRECTIONS):
+        for dist in range(vision):
+            offset = fov_offset(direction, dist)
+            if offset not in visits or dist < visits[offset][0]:
+                visits[offset] = (dist, d)
+    offsets = list(visits.items())
+    return (np.array([offset[0] for offset, visit in offsets]), np.array([offset[1] for offset, visit in offsets]),
+        np.array([visit[0] for offset, visit in offsets]), np.array([visit[1] for offset, visit in offsets]))
+
+
+def mate_table(vision):
+    """Get the Cells find_mate() visits for every vision up to vision.
+    Returns dx, dy, step, direction arrays over entries and a (vision + 1) x entries bool array of which
+    entries each vision sees.
+    """
+    steps = sorted(set(step for v in range(vision + 1) for step in fov_steps(v)))
+    entries = [(d, step) for d in range(len(DIRECTIONS)) for step in steps]
+    seen = np.array([[step in fov_steps(v) for d, step in entries] for v in range(vision + 1)], dtype=bool)
+    return (np.array([DIRECTIONS[d][0] * step for d, step in entries]), np.array([DIRECTIONS[d][1] * step for d, step in entries]),
+        np.array([step for d, step in entries]), np.array([d for d, step in entries]), seen)
+
+
+def first_claims(priority, *keys):
+    """Get which claims go through: a claim goes through when it is the first, in priority order, to use each of
+    its keys, e.g. its target Cell. The first claim always goes through.
+    priority - Priority of every claim, lower first.
+    keys - Arrays of ints, one value per claim.
+    Returns bool array.
+    """
+    accepted = np.ones(len(priority), dtype=bool)
+    order = np.argsort(priority, kind="stable")
+    ranked = priority[order]
+    for key in keys:
+        # Only the claims are sorted, no array as large as the range of the keys (e.g. every Cell) is made
+        used, first = np.unique(key[order], return_index=True)
+        accepted &= ranked[first][np.searchsorted(used, key)] == priority
+    return accepted
+
+
+class TickEngine:
+    """Runs a Simulation's Agents in fixed ticks as array operations. Made by Simulation with ENGINE=ticks."""
+    def __init__(self, simulation, dt=1.0):
+        """
+        simulation - Simulation whose AgentList and Landscape to take over. Their pending events are cancelled.
+        dt - Tick length in simulation time.
+        """
+        self.simulation = simulation
+        self.config = simulation.config
+        self.landscape = simulation.landscape
+        self.agentList = simulation.agentList
+        self.dt = dt
+        self.generator = simulation.rng.get_generator("ticks")
+        self.t = self.t_start = simulation.calendar.now()
+        self.ticks = 0
+
+        land = self.landscape
+        # Every Cell regrows every tick, update them all from now on
+        land.lazy = False
+        land.t_lastSugarUpdate = self.t
+
+        agents = self.agentList.agentList
+        for agent in agents:
+            simulation.calendar.cancels(agent.move_event, agent.die_event, agent.reproduce_event, agent.birth_event)
+        rows = dict((agent.id, i) for i, agent in enumerate(agents))
+        for name, dtype in FIELDS:
+            if name == "mate":
+                values = [rows.get(agent.mate.id, NO_MATE) if agent.mate != None else NO_MATE for agent in agents]
+            elif name == "x":
+                values = [agent.col % land.cols for agent in agents]
+            elif name == "y":
+                values = [agent.row % land.rows for agent in agents]
+            else:
+                values = [getattr(agent, name) for agent in agents]
+            setattr(self, name, np.array(values, dtype=dtype))
+        self.nextId = self.agentList.current_id
+        self.rowOf = np.full(max(self.nextId, 1), -1, dtype=np.int64) # Agent id -> row
+        self.rowOf[self.id] = np.arange(len(self.id))
+
+        self._views(int(self.vision.max(initial=1)))
+
+    def _views(self, vision):
+        """Build the field of view tables up to vision."""
+        self.maxVision = vision
+        self.view = view_table(vision)
+        self.mates = mate_table(vision)
+
+    def __len__(self):
+        """Number of Agents alive."""
+        return int(self.alive.sum())
+
+    def run(self, until, post=None):
+        """Run ticks until the next one would end after until.
+        post - Callable taking the time, called after every tick.
+        """
+        while self.t_start + (self.ticks + 1) * self.dt <= until:
+            self.step()
+            if post != None:
+                post(self.t)
+            if not self.alive.any():
+                log = self.landscape.log
+                if log.enabled:
+                    log.log(END, self.t, message="No more agents. Simulation completed before max time.")
+                break
+
+    def step(self):
+        """Advance one tick."""
+        self.ticks += 1
+        t = self.t = self.t_start + self.ticks * self.dt
+        self.landscape.update_sugar(t)
+        self._metabolize(t)
+        self._move(t)
+        self._reproduce(t)
+        self._give_birth(t)
+        dead = len(self.alive) - len(self)
+        if dead > 1024 and dead > len(self.alive) // 2:
+            self._compact()
+
+    def _acting(self, mask):
+        """Restrict a mask over rows to the Agents this engine acts for, all of them here."""
+        return mask
+
+    def _rows(self, keys):
+        """Get the rows of the Agents whose keys are on the Landscape's occupant array, ids here."""
+        return self.rowOf[keys]
+
+    def _key(self, rows):
+        """Get what the occupant array holds for the Agents in rows, their ids here."""
+        return self.id[rows]
+
+    def _allocate(self, n):
+        """Add n rows for newborn Agents. Returns their rows and ids."""
+        first = len(self.id)
+        for name, dtype in FIELDS:
+            setattr(self, name, np.concatenate((getattr(self, name), np.zeros(n, dtype=dtype))))
+        ids = self.nextId + np.arange(n)
+        self.nextId += n
+        if self.nextId > len(self.rowOf):
+            self.rowOf = np.concatenate((self.rowOf, np.full(max(self.nextId, 2 * len(self.rowOf)) - len(self.rowOf), -1)))
+        rows = first + np.arange(n)
+        self.rowOf[ids] = rows
+        return rows, ids
+
+    def _mate_sugar(self, rows):
+        """Get the sugar of mates at the time of their births' inheritance."""
+        return self.sugar[rows]
+
+    def _debit(self, rows, amounts, babies):
+        """Take the inheritance of births from their mates.
+        babies - Rows of the newborns, who already have it.
+        """
+        self.sugar[rows] -= amounts
+
+    def _metabolize(self, t):
+        alive = self._acting(self.alive)
+        self.sugar[alive] -= self.metab[alive] * self.dt
+        self._die(alive & ((self.sugar <= 0) | (t >= self.birthdate + self.max_age)), t)
+
+    def _die(self, dying, t):
+        rows = np.flatnonzero(dying)
+        self.alive[rows] = False
+        self.landscape.occupant[self.y[rows], self.x[rows]] = EMPTY
+        log = self.landscape.log
+        if log.enabled:
+            for i in rows.tolist():
+                log.log(DEATH, t, agent=int(self.id[i]), x=int(self.x[i]), y=int(self.y[i]), sugar=float(self.sugar[i]),
+                    max_age=float(self.max_age[i]))
+
+    def _ranks(self, n, size):
+        """Get n random orders of size items, as the rank of every item: rank[i, item] = position in order i."""
+        return np.argsort(np.argsort(self.generator.random((n, size)), axis=1), axis=1)
+
+    def _best_visible(self, rows):
+        """Get the empty Cell in the field of view of each Agent with the most sugar, then nearest, then first in a
+        random direction order, as best_visible_cell(). Returns flat Cell indexes, -1 where none is visible.
+        """
+        land = self.landscape
+        dx, dy, dist, direction = self.view
+        x, y, vision = self.x[rows], self.y[rows], self.vision[rows]
+        cells = ((y[:, None] + dy) % land.rows) * land.cols + (x[:, None] + dx) % land.cols
+        level = land.level.ravel()
+        # Cells that are too high are not part of the FOV
+        visible = (dist < vision[:, None]) & (level[cells] <= vision[:, None] + level[y * land.cols + x][:, None])
+        visible &= land.occupant.ravel()[cells] == EMPTY
+        sugar = np.where(visible, land.sugar.ravel()[cells], -np.inf)
+        best = sugar.max(axis=1, initial=-np.inf)
+        order = dist * len(DIRECTIONS) + np.take_along_axis(self._ranks(len(rows), len(DIRECTIONS)), np.broadcast_to(direction, cells.shape), axis=1)
+        choice = np.where(sugar == best[:, None], order, np.iinfo(np.int64).max).argmin(axis=1)
+        return np.where(best > -np.inf, cells[np.arange(len(rows)), choice], -1)
+
+    def _move(self, t):
+        land = self.landscape
+        due = np.flatnonzero(self._acting(self.alive & (self.t_move <= t)))
+        pending = due[np.argsort(self.t_move[due], kind="stable")]
+        for round in range(ROUNDS):
+            if len(pending) == 0:
+                break
+            targets = self._best_visible(pending)
+            # Without an empty Cell in sight the Agent stays, as Agent.move() does
+            pending, targets = pending[targets >= 0], targets[targets >= 0]
+            if len(pending) == 0:
+                break
+            won = first_claims(np.arange(len(pending)), targets)
+            movers, cells = pending[won], targets[won]
+            land.occupant[self.y[movers], self.x[movers]] = EMPTY
+            self.y[movers], self.x[movers] = np.divmod(cells, land.cols)
+            land.occupant.ravel()[cells] = self._key(movers)
+            # Eat
+            self.sugar[movers] += land.sugar.ravel()[cells]
+            land.sugar.ravel()[cells] = 0
+            if land.log.enabled:
+                for i in movers.tolist():
+                    land.log.log(MOVE, t, agent=int(self.id[i]), x=int(self.x[i]), y=int(self.y[i]), sugar=float(self.sugar[i]))
+            pending = pending[~won]
+        # Agents that lost every round keep their due time, so they move next tick ahead of those due later
+        done = np.setdiff1d(due, pending, assume_unique=True)
+        self.t_move[done] += self.generator.exponential(1.0, len(done))
+
+    def _is_gestating(self, rows, t):
+        """As Agent.is_gestating(), for every row."""
+        period = self.period_g[rows]
+        return np.isfinite(period) & (t <= self.t_reproduce[rows] + period)
+
+    def _reproduce(self, t):
+        land = self.landscape
+        config = self.config
+        rows = np.flatnonzero(self._acting(self.alive & self.mother & (self.mate == NO_MATE) & (self.t_reproduce <= t) & np.isinf(self.t_birth)))
+        if len(rows) == 0:
+            return
+        dx, dy, step, direction, seen = self.mates
+        x, y, vision = self.x[rows], self.y[rows], self.vision[rows]
+        cells = ((y[:, None] + dy) % land.rows) * land.cols + (x[:, None] + dx) % land.cols
+        ids = land.occupant.ravel()[cells]
+        candidates = (ids != EMPTY) & seen[vision]
+        level = land.level.ravel()
+        candidates &= level[cells] <= vision[:, None] + level[y * land.cols + x][:, None]
+        mates = np.where(candidates, self._rows(np.where(candidates, ids, 0)), NO_MATE)
+        candidates[candidates] = ~self._is_gestating(mates[candidates], t)
+        # The wealthiest Cell, then the first found in a random direction order, then nearest
+        sugar = np.where(candidates, land.sugar.ravel()[cells], -np.inf)
+        best = sugar.max(axis=1, initial=-np.inf)
+        order = np.take_along_axis(self._ranks(len(rows), len(DIRECTIONS)), np.broadcast_to(direction, cells.shape), axis=1) * (self.maxVision + 1) + step
+        choice = np.where(sugar == best[:, None], order, np.iinfo(np.int64).max).argmin(axis=1)
+        found = best > -np.inf
+
+        # Follow-up events are timed from when the reproduction was due, so a tick keeps the event engine's pace
+        due = self.t_reproduce[rows]
+        mothers = rows[found]
+        self.mate[mothers] = mates[found, choice[found]]
+        self.period_g[mothers] = np.abs(self.generator.normal(config.GESTATION_MU, config.GESTATION_SIGMA, len(mothers)))
+        self.t_birth[mothers] = due[found] + self.period_g[mothers]
+        self.t_reproduce[mothers] = math.inf
+        lonely = rows[~found]
+        self.t_reproduce[lonely] = due[~found] + self.generator.exponential(config.REPRODUCTION_LAMBDA, len(lonely))
+
+    def _best_birth_cell(self, rows):
+        """Get the empty Cell of the Moore neighborhood of each Agent with the most sugar, first in random row and
+        column orders on ties, as get_best_birth_cell(). Returns flat Cell indexes, -1 where none is empty.
+        """
+        land = self.landscape
+        offsets = np.arange(3) - 1
+        dy, dx = np.repeat(offsets, 3), np.tile(offsets, 3)
+        cells = ((self.y[rows][:, None] + dy) % land.rows) * land.cols + (self.x[rows][:, None] + dx) % land.cols
+        empty = land.occupant.ravel()[cells] == EMPTY
+        sugar = np.where(empty, land.sugar.ravel()[cells], -np.inf)
+        best = sugar.max(axis=1, initial=-np.inf)
+        yRank, xRank = self._ranks(len(rows), 3), self._ranks(len(rows), 3)
+        order = yRank[:, dy + 1] * 3 + xRank[:, dx + 1]
+        choice = np.where(sugar == best[:, None], order, np.iinfo(np.int64).max).argmin(axis=1)
+        return np.where(best > -np.inf, cells[np.arange(len(rows)), choice], -1)
+
+    def _give_birth(self, t):
+        land = self.landscape
+        due = np.flatnonzero(self._acting(self.alive & (self.t_birth <= t)))
+        pending = due[np.argsort(self.t_birth[due], kind="stable")]
+        for round in range(ROUNDS):
+            if len(pending) == 0:
+                break
+            targets = self._best_birth_cell(pending)
+            # Without an empty Cell the birth is cancelled, the mother keeps her mate and stops reproducing
+            self.t_birth[pending[targets < 0]] = math.inf
+            pending, targets = pending[targets >= 0], targets[targets >= 0]
+            if len(pending) == 0:
+                break
+            # A parent's sugar is halved once per birth, so a parent is in one birth per round
+            priority = np.arange(len(pending))
+            parents = np.concatenate((pending, self.mate[pending]))
+            involved = first_claims(np.concatenate((priority, priority)), parents)
+            born = first_claims(priority, targets) & involved[:len(pending)] & involved[len(pending):]
+            self._births(pending[born], targets[born], t)
+            pending = pending[~born]
+
+    def _births(self, mothers, cells, t):
+        """Give birth to one Agent per mother in the given Cells."""
+        land = self.landscape
+        config = self.config
+        n = len(mothers)
+        mates = self.mate[mothers]
+        born = self.t_birth[mothers] # When the births were due, the babies' and mothers' next events are timed from it
+        # Randomly choose inherited traits
+        inherit = self.generator.random((n, 3)) < 0.5
+        baby = {
+            "metab": np.where(inherit[:, 0], self.metab[mothers], self.metab[mates]),
+            "vision": np.where(inherit[:, 1], self.vision[mothers], self.vision[mates]),
+            "max_age": np.where(inherit[:, 2], self.max_age[mothers], self.max_age[mates]),
+            "mother": self.generator.random(n) < 0.5,
+            "x": cells % land.cols,
+            "y": cells // land.cols,
+            "birthdate": born,
+            "t_move": born + self.generator.exponential(1.0, n),
+            "t_birth": np.full(n, math.inf),
+            "period_g": np.full(n, math.inf),
+            "mate": np.full(n, NO_MATE),
+            "alive": np.ones(n, dtype=bool)
+        }
+        baby["t_reproduce"] = np.where(baby["mother"], born + config.FERTILE_AGE + self.generator.exponential(config.REPRODUCTION_LAMBDA, n), math.inf)
+        # Inheritance, then the baby eats its Cell
+        selfInherit, mateInherit = self.sugar[mothers] / 2, self._mate_sugar(mates) / 2
+        self.sugar[mothers] -= selfInherit
+        baby["sugar"] = selfInherit + mateInherit + land.sugar.ravel()[cells]
+        land.sugar.ravel()[cells] = 0
+        # Next reproduction
+        self.mate[mothers] = NO_MATE
+        self.t_birth[mothers] = math.inf
+        self.t_reproduce[mothers] = born + self.generator.exponential(config.REPRODUCTION_LAMBDA, n)
+
+        rows, baby["id"] = self._allocate(n)
+        for name, dtype in FIELDS:
+            getattr(self, name)[rows] = baby[name]
+        self._debit(mates, mateInherit, rows)
+        land.occupant.ravel()[cells] = self._key(rows)
+        if int(baby["vision"].max(initial=0)) > self.maxVision:
+            self._views(int(baby["vision"].max()))
+        if land.log.enabled:
+            for i in rows.tolist():
+                land.log.log(BIRTH, t, agent=int(self.id[i]), x=int(self.x[i]), y=int(self.y[i]), sugar=float(self.sugar[i]))
+
+    def _compact(self):
+        """Drop the rows of dead Agents that are nobody's mate any more."""
+        keep = self.alive.copy()
+        mates = self.mate[self.alive]
+        keep[mates[mates != NO_MATE]] = True
+        rows = np.cumsum(keep) - 1
+        self.mate = np.where(self.mate != NO_MATE, rows[self.mate], NO_MATE)
+        for name, dtype in FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.rowOf[:] = -1
+        self.rowOf[self.id] = np.arange(len(self.id))
+
+    def sync(self):
+        """Write the Agents back into the AgentList and Landscape as Agent objects, as of the current tick."""
+        land = self.landscape
+        agentList = self.agentList
+        rows = np.flatnonzero(self.alive)
+        agents = []
+        for i in rows.tolist():
+            agent = Agent.__new__(Agent)
+            agent.id = int(self.id[i])
+            agent.context = agentList.context
+            agent.listed = True
+            agent._sugar = float(self.sugar[i])
+            agent.t_lastNextSugar = self.t
+            agent.alive = True
+            agent.birthdate = float(self.birthdate[i])
+            agent.col, agent.row = int(self.x[i]), int(self.y[i])
+            agent.metab = float(self.metab[i])
+            agent.vision = int(self.vision[i])
+            agent.mother = bool(self.mother[i])
+            agent.max_age = float(self.max_age[i])
+            agent.t_nextEventTime, agent.t_nextEventType, agent.nextCallback = math.inf, None, None
+            agent.t_move, agent.t_die = float(self.t_move[i]), math.inf
+            agent.t_reproduce, agent.t_birth = float(self.t_reproduce[i]), float(self.t_birth[i])
+            agent.period_g = float(self.period_g[i])
+            agent.move_event = agent.die_event = agent.reproduce_event = agent.birth_event = None
+            agents.append(agent)
+        for agent, i in zip(agents, rows.tolist()):
+            mate = int(self.mate[i])
+            agent.mate = agents[int(np.searchsorted(rows, mate))] if mate != NO_MATE and self.alive[mate] else None
+        agentList.agentList = agents
+        agentList.slots = dict((agent.id, i) for i, agent in enumerate(agents))
+        agentList.current_id = self.nextId
+        for stat, statistic in agentList.statistics.items():
+            values = sorted(stat(agent) for agent in agents)
+            statistic.count = len(values)
+            statistic.total = math.fsum(values)
+            statistic.compensation = 0
+            statistic.ordered = values
+        land.agents = dict((agent.id, agent) for agent in agents)
+        for occupied in land.rowOccupied + land.colOccupied:
+            occupied.clear()
+        for agent in agents:
+            land.rowOccupied[agent.row].add(agent.col)
+            land.colOccupied[agent.col].add(agent.row)
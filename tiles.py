@@ -0,0 +1,363 @@
+# Domain decomposition of the ticks engine: one large Landscape advanced by several worker processes
+# Selected with ENGINE=tiles. The rules and the tick are those of ticks.py, what changes is who applies them.
+#
+# The Landscape is cut into 2 tiles per worker, bands of whole rows that are alternately even and odd, and every
+# worker owns an even and an odd tile. An Agent belongs to the tile it stands in. The Landscape and a table of every
+# Agent live in shared memory, so the halo of a tile, the rows of its neighbours its Agents can reach, is read in
+# place, and an Agent that moves or is born across a tile edge has migrated: from then on the owner of the tile it
+# stands in acts for it. Cells keep their global coordinates, so wrapping around the torus across tile edges is the
+# same modulo arithmetic as Landscape.get_cell().
+#
+# A tick is a sequence of conservative time windows, each closed by a barrier no worker passes before every worker
+# finished the window:
+#   1. every worker regrows the sugar of its tiles, and its Agents metabolize and die,
+#   2. every worker takes its share of the free rows of the Agent table for newborns,
+#   3. the even tiles move, reproduce and give birth, reaching at most a halo into the odd tiles around them,
+#   4. every worker settles the births of window 3 its Agents were the mates of: the mate can be anywhere on the
+#      Landscape by then, so only its owner takes its half for the newborn, one birth after the other (a newborn's
+#      BIRTH record shows its sugar before this share),
+#   5. the odd tiles move, reproduce and give birth, as the even ones did,
+#   6. every worker settles the births of window 5. A newborn of window 3 can be a mate in window 5, so it has
+#      been given its share in window 4 before it gives one.
+# Tiles are at least 2 halos high, so two tiles acting at once never touch the same Cell or Agent, and a run only
+# depends on its seed and its number of workers, not on how the processes are scheduled nor how often they return
+# to this process (see TiledEngine): an Agent keeps its row of the table and every worker its random stream and
+# its count of ids handed out.
+from queue import Empty
+from shared import SharedArrays
+from sink import NullSink, RingSink, END
+from ticks import TickEngine, FIELDS, NO_MATE, view_table, mate_table
+from landscape import EMPTY
+import math
+import multiprocessing
+import numpy as np
+import os
+import traceback
+
+MIN_CAPACITY = 4096 # Fewest rows of the shared Agent table
+
+
+def reach(vision):
+    """Get the halo: how many rows away from its own Cell an Agent with up to vision acts, moving, mating or giving
+    birth. As wide as the field of view, which currently only looks at the adjacent Cells (see fov_offset()).
+    """
+    dx, dy, dist, direction = view_table(vision)
+    mateDx, mateDy, step, mateDirection, seen = mate_table(vision)
+    return int(max(np.abs(dy).max(initial=0), np.abs(mateDy).max(initial=0), 1))
+
+
+def tile_bounds(rows, tiles):
+    """Cut rows into tiles bands of as equal heights as possible. Returns list of (first row, end row)."""
+    edges = [rows * i // tiles for i in range(tiles + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class TileLandscape:
+    """What a worker sees of the Landscape: its arrays in shared memory, read and written in place."""
+    def __init__(self, shared, rows, cols, log):
+        self.rows = rows
+        self.cols = cols
+        self.capacity = shared["cellCapacity"]
+        self.level = shared["level"]
+        self.sugar = shared["cellSugar"]
+        self.occupant = shared["occupant"] # Row of the Agent in each Cell
+        self.log = log
+
+
+class TileWorker(TickEngine):
+    """Acts for the Agents in one worker's tiles, on the shared Agent table. Run by run_worker() in its process."""
+    def __init__(self, shared, spec, worker, barrier):
+        """
+        shared - SharedArrays of the Landscape and the Agents.
+        spec - Dict of the run, see TiledEngine._spec().
+        worker - Number of this worker.
+        barrier - Barrier of every worker, closing the time windows.
+        """
+        self.config = spec["config"]
+        self.dt = spec["dt"]
+        self.t_start = spec["t_start"]
+        self.ticks = spec["ticks"]
+        self.t = self.t_start + self.ticks * self.dt
+        self.worker = worker
+        self.workers = spec["workers"]
+        self.barrier = barrier
+        self.landscape = TileLandscape(shared, spec["rows"], spec["cols"], RingSink(None) if spec["log"] else NullSink())
+        for name, dtype in FIELDS:
+            setattr(self, name, shared[name])
+        self.outMates, self.outBabies, self.outCount = shared["outMates"], shared["outBabies"], shared["outCount"]
+        self.full = shared["full"] # Set when a worker ran out of free rows for births
+        self.generator = np.random.Generator(np.random.Philox())
+        self.generator.bit_generator.state = spec["states"][worker]
+        self.nextId = spec["nextId"]
+        self.born = spec["born"][worker] # Ids this worker handed out since the engine started
+        self.tiles = spec["tiles"][2 * worker:2 * worker + 2] # (first row, end row) of the even and the odd tile
+        self.free = np.zeros(0, dtype=np.int64) # Rows this worker gives to newborns this tick
+        self.used = None # Rows that were not free this tick, of Agents alive or still someone's mate
+        self.active = None
+        self._views(spec["vision"])
+
+    def _inside(self, tiles):
+        """Get which rows of the Agent table stand in the given tiles."""
+        inside = np.zeros(self.landscape.rows, dtype=bool)
+        for first, end in tiles:
+            inside[first:end] = True
+        return inside[self.y]
+
+    def _own(self, tiles):
+        """Act for the Agents standing in the given tiles from now on. Only between windows, when no worker writes."""
+        self.active = self._inside(tiles)
+
+    def _acting(self, mask):
+        return mask & self.active
+
+    def _rows(self, keys):
+        return keys
+
+    def _key(self, rows):
+        return rows
+
+    def _allocate(self, n):
+        rows, self.free = self.free[:n], self.free[n:]
+        ids = self.nextId + (self.born + np.arange(n)) * self.workers + self.worker
+        self.born += n
+        return rows, ids
+
+    def _mate_sugar(self, rows):
+        # A mate can stand in a tile acting at the same time, its share is only known when its owner settles the birth
+        return np.zeros(len(rows))
+
+    def _debit(self, rows, amounts, babies):
+        count = int(self.outCount[self.worker])
+        self.outMates[self.worker, count:count + len(rows)] = rows
+        self.outBabies[self.worker, count:count + len(rows)] = babies
+        self.outCount[self.worker] = count + len(rows)
+
+    def _settle(self):
+        """Give the newborns of the window half the sugar of their mates that this worker owns. A mate in several
+        births gives half of what it has left to each in turn, in the order of the workers and of their births.
+        """
+        counts = self.outCount.tolist()
+        mates = np.concatenate([self.outMates[worker, :count] for worker, count in enumerate(counts)])
+        babies = np.concatenate([self.outBabies[worker, :count] for worker, count in enumerate(counts)])
+        mine = self.active[mates]
+        mates, babies = mates[mine], babies[mine]
+        # The k-th birth of a mate (from 0) gets sugar / 2^(k + 1): halving is exact, so this is giving half in turn
+        order = np.argsort(mates, kind="stable")
+        turn = np.empty(len(mates), dtype=np.int64)
+        turn[order] = np.arange(len(mates)) - np.searchsorted(mates[order], mates[order])
+        amounts = self.sugar[mates] / 2.0 ** (turn + 1)
+        np.subtract.at(self.sugar, mates, amounts)
+        self.sugar[babies] += amounts
+
+    def _births(self, mothers, cells, t):
+        # Out of rows the remaining mothers are left due, they give birth next tick in a bigger table
+        if len(mothers) > len(self.free):
+            self.full[0] = True
+            mothers, cells = mothers[:len(self.free)], cells[:len(self.free)]
+        if len(mothers):
+            TickEngine._births(self, mothers, cells, t)
+
+    def _share_rows(self):
+        """Take this worker's share of the rows that are free: dead and nobody's mate."""
+        self.used = self.alive.copy()
+        mates = self.mate[self.alive]
+        self.used[mates[mates != NO_MATE]] = True
+        self.free = np.array_split(np.flatnonzero(~self.used), self.workers)[self.worker]
+
+    def run(self, ticks):
+        """Run ticks ticks in step with the other workers, fewer if a worker ran out of rows.
+        Returns the number of ticks run.
+        """
+        land = self.landscape
+        for tick in range(ticks):
+            if self.full[0]:
+                return tick
+            self.ticks += 1
+            t = self.t = self.t_start + self.ticks * self.dt
+            for first, end in self.tiles:
+                np.minimum(land.sugar[first:end] + self.dt * self.config.ALPHA, land.capacity[first:end], out=land.sugar[first:end])
+            self._own(self.tiles)
+            self._metabolize(t)
+            self.barrier.wait()
+            self._share_rows()
+            self.barrier.wait()
+            for tile in self.tiles:
+                self.outCount[self.worker] = 0
+                # The other workers fill free rows with newborns meanwhile, row by row and field by field: only
+                # the rows that were not free act, newborns act from the next tick on as in the ticks engine
+                self._own([tile])
+                self.active &= self.used & self.alive
+                self._move(t)
+                # Agents that moved out of the tile act with their new one, rows are dropped but never taken on
+                self.active &= self._inside([tile])
+                self._reproduce(t)
+                self._give_birth(t)
+                self.barrier.wait()
+                self._own(self.tiles)
+                self._settle()
+                self.barrier.wait()
+        return ticks
+
+
+def run_worker(shared, spec, worker, barrier, queue):
+    """Process target: run one TileWorker and put ("ok", result) or ("error", traceback) on queue."""
+    try:
+        engine = TileWorker(shared, spec, worker, barrier)
+        ticks = engine.run(spec["run"])
+        records = list(engine.landscape.log.records) if spec["log"] else []
+        queue.put((worker, "ok", {"ticks": ticks, "born": engine.born, "state": engine.generator.bit_generator.state,
+            "records": records}))
+    except BaseException:
+        barrier.abort()
+        queue.put((worker, "error", traceback.format_exc()))
+
+
+class TiledEngine(TickEngine):
+    """Runs the ticks engine with the Landscape split into tiles over worker processes. Made by Simulation with
+    ENGINE=tiles. Between runs the Agents live in this process' arrays like a TickEngine's, every run publishes them
+    and the Landscape to shared memory, starts the workers and takes the result back.
+    """
+    def __init__(self, simulation, dt=1.0, workers=None, every=0):
+        """
+        simulation - Simulation whose AgentList and Landscape to take over. Their pending events are cancelled.
+        dt - Tick length in simulation time.
+        workers - Number of worker processes, if None one per core. Fewer are used when the Landscape has too few
+            rows for 2 tiles of 2 halos each per worker.
+        every - Simulation time between the returns to this process, e.g. to sample metrics; 0 runs at once until the end.
+        """
+        TickEngine.__init__(self, simulation, dt=dt)
+        land = self.landscape
+        self.halo = reach(self.maxVision)
+        self.workers = max(1, min(workers or os.cpu_count(), land.rows // (4 * self.halo)))
+        self.tiles = tile_bounds(land.rows, 2 * self.workers)
+        self.every = every
+        self.capacity = max(MIN_CAPACITY, 2 * len(self.id))
+        self.firstId = self.nextId # Worker w gives its k-th newborn the id firstId + k * workers + w
+        self.born = [0] * self.workers
+        self.states = [simulation.rng.get_generator(f"tiles/{worker}").bit_generator.state for worker in range(self.workers)]
+
+    def run(self, until, post=None):
+        """Run ticks until the next one would end after until.
+        post - Callable taking the time, called after every return from the workers.
+        """
+        segment = max(1, round(self.every / self.dt)) if self.every else math.inf
+        while True:
+            ticks = 0
+            while ticks < segment and self.t_start + (self.ticks + ticks + 1) * self.dt <= until:
+                ticks += 1
+            if ticks == 0:
+                break
+            self._run_workers(ticks)
+            if post != None:
+                post(self.t)
+            if not self.alive.any():
+                log = self.landscape.log
+                if log.enabled:
+                    log.log(END, self.t, message="No more agents. Simulation completed before max time.")
+                break
+
+    def _layout(self):
+        land = self.landscape
+        shape = (land.rows, land.cols)
+        share = -(-self.capacity // self.workers)
+        return [(name, (self.capacity,), dtype) for name, dtype in FIELDS] + [
+            ("outMates", (self.workers, share), np.int64), ("outBabies", (self.workers, share), np.int64),
+            ("outCount", (self.workers,), np.int64),
+            ("full", (1,), bool), ("cellCapacity", shape, land.capacity.dtype), ("level", shape, land.level.dtype),
+            ("cellSugar", shape, np.float64), ("occupant", shape, np.int64)
+        ]
+
+    def _spec(self, ticks):
+        land = self.landscape
+        return {
+            "config": self.config, "dt": self.dt, "t_start": self.t_start, "ticks": self.ticks, "run": ticks,
+            "rows": land.rows, "cols": land.cols, "workers": self.workers, "tiles": self.tiles,
+            "states": self.states, "nextId": self.firstId, "born": self.born, "vision": self.maxVision, "log": land.log.enabled
+        }
+
+    def _publish(self):
+        """Copy the Agents and the Landscape to a new SharedArrays, the Agents in the same rows."""
+        land = self.landscape
+        n = len(self.id)
+        self.capacity = max(self.capacity, n)
+        shared = SharedArrays(self._layout())
+        for name, dtype in FIELDS:
+            shared[name][:n] = getattr(self, name)
+            shared[name][n:] = NO_MATE if name == "mate" else 0
+        shared["outCount"][:] = 0
+        shared["full"][:] = False
+        shared["cellCapacity"][:] = land.capacity
+        shared["level"][:] = land.level
+        shared["cellSugar"][:] = land.sugar
+        occupied = land.occupant != EMPTY
+        shared["occupant"][:] = EMPTY
+        shared["occupant"][occupied] = self.rowOf[land.occupant[occupied]]
+        return shared
+
+    def _collect(self, shared, results):
+        """Take the Agents and the Landscape back from shared.
+        The whole table is kept as it is, rows of the dead included: the order of the rows decides the order of
+        random draws and who gets a contested Cell, so rearranging it would make a run depend on its returns.
+        """
+        land = self.landscape
+        self.ticks += results[0]["ticks"]
+        self.t = self.t_start + self.ticks * self.dt
+        self.states = [result["state"] for result in results]
+        occupant = shared["occupant"]
+        occupied = occupant != EMPTY
+        land.occupant[:] = EMPTY
+        land.occupant[occupied] = shared["id"][occupant[occupied]]
+        land.sugar[:] = shared["cellSugar"]
+        land.t_lastSugarUpdate = self.t
+        for name, dtype in FIELDS:
+            setattr(self, name, shared[name].copy())
+        self.born = [result["born"] for result in results]
+        self.nextId = self.firstId + max(self.born) * self.workers
+        self.rowOf = np.full(max(self.nextId, 1), -1, dtype=np.int64)
+        alive = np.flatnonzero(self.alive)
+        self.rowOf[self.id[alive]] = alive
+        if shared["full"][0]:
+            self.capacity *= 2
+        if land.log.enabled:
+            records = [record for result in results for record in result["records"]]
+            records.sort(key=lambda record: record["t"])
+            for record in records:
+                land.log.log(record.pop("kind"), record.pop("t"), **record)
+
+    def _run_workers(self, ticks):
+        """Run ticks ticks on the workers, in several goes if the shared Agent table fills up."""
+        context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+        while ticks > 0:
+            shared = self._publish()
+            try:
+                barrier = context.Barrier(self.workers)
+                queue = context.Queue()
+                spec = self._spec(ticks)
+                processes = [context.Process(target=run_worker, args=(shared, spec, worker, barrier, queue))
+                    for worker in range(self.workers)]
+                for process in processes:
+                    process.start()
+                results = dict()
+                errors = []
+                while len(results) + len(errors) < self.workers:
+                    try:
+                        worker, status, value = queue.get(timeout=1)
+                    except Empty:
+                        if any(process.exitcode not in (None, 0) for process in processes):
+                            barrier.abort()
+                            errors.append("A worker process exited without a result")
+                            break
+                        continue
+                    if status == "error":
+                        errors.append(value)
+                    else:
+                        results[worker] = value
+                for process in processes:
+                    process.join()
+                if errors:
+                    raise RuntimeError("Tile worker failed:\n" + "\n".join(errors))
+                done = results[0]["ticks"]
+                self._collect(shared, [results[worker] for worker in range(self.workers)])
+            finally:
+                shared.unlink()
+            ticks -= done
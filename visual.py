@@ -1,54 +1,54 @@
 from agent import AgentList
-import config as cfg
 import math
 
+def cell_char(land, x, y, showSugar=True, terrain=False):
+    """Get the character of the Cell at list indexes (x, y) in a str_map()."""
+    cfg = land.config
+    character = " " # Space = empty cell if not terrain map
+    if not terrain:
+        agent = land.get_agent(x, y)
+        if agent != None: # Agent prioritized over sugar
+            if agent.sugar > agent.metab:
+                character = cfg.AGENT_HEALTHY_CHAR
+            else:
+                character = cfg.AGENT_CRITICAL_CHAR
+        elif showSugar and land.get_sugar(x, y) > 0:
+            percentage = math.ceil(100 * (land.level[y, x] / land.capacity[y, x]))
+            if percentage < 25:
+                character = cfg.SUGAR_0_CHAR
+            elif percentage >= 25 and percentage < 50:
+                character = cfg.SUGAR_1_CHAR
+            elif percentage >= 50 and percentage < 75:
+                character = cfg.SUGAR_2_CHAR
+            elif percentage >= 75:
+                character = cfg.SUGAR_3_CHAR
+    else: # Terrain-only map
+        percentage = math.ceil(100 * (land.level[y, x] / cfg.MAX_HEIGHT))
+        if percentage < 25:
+            character = cfg.TERR_0_CHAR
+        elif percentage >= 25 and percentage < 50:
+            character = cfg.TERR_1_CHAR
+        elif percentage >= 50 and percentage < 75:
+            character = cfg.TERR_2_CHAR
+        elif percentage >= 75:
+            character = cfg.TERR_3_CHAR
+    return character
+
+
 def str_map(land, numberLines=True, showSugar=True, terrain=False):
     """Stringify the given landscape.
     If terrain = True, will give a map of terrain ONLY (no agents, sugar).
     """
-    strMap = ""
-
+    lines = []
     for row in range(land.rows):
-        for col in range(land.cols):
-            cell = land.get_cell(col, row)
-            character = " " # Space = empty cell if not terrain map
-            if not terrain:
-                if cell.agent != None: # Agent prioritized over sugar
-                    if cell.agent.sugar > cell.agent.metab:
-                        character = cfg.AGENT_HEALTHY_CHAR
-                    else:
-                        character = cfg.AGENT_CRITICAL_CHAR
-                elif cell.sugar > 0 and showSugar:
-                    percentage = math.ceil(100 * (cell.level / cell.capacity))
-                    if percentage < 25:
-                        character = cfg.SUGAR_0_CHAR
-                    elif percentage >= 25 and percentage < 50:
-                        character = cfg.SUGAR_1_CHAR
-                    elif percentage >= 50 and percentage < 75:
-                        character = cfg.SUGAR_2_CHAR
-                    elif percentage >= 75:
-                        character = cfg.SUGAR_3_CHAR
-            else: # Terrain-only map
-                percentage = math.ceil(100 * (cell.level / cfg.MAX_HEIGHT))
-                if percentage < 25:
-                    character = cfg.TERR_0_CHAR
-                elif percentage >= 25 and percentage < 50:
-                    character = cfg.TERR_1_CHAR
-                elif percentage >= 50 and percentage < 75:
-                    character = cfg.TERR_2_CHAR
-                elif percentage >= 75:
-                    character = cfg.TERR_3_CHAR
-            strMap += character
-
+        line = "".join(cell_char(land, col, row, showSugar, terrain) for col in range(land.cols))
         if numberLines:
-            strMap += str(row)[-1]
-        strMap += "\n"
-    
+            line += str(row)[-1]
+        lines.append(line + "\n")
+
     if numberLines:
-        for x in range(land.cols):
-            strMap += str(x)[-1]
-        strMap += " "
-    return strMap
+        lines.append("".join(str(x)[-1] for x in range(land.cols)) + " ")
+    return "".join(lines)
 
 
 def compare_maps(sMap0, sMap1, rows, cols):